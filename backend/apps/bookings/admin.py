@@ -44,10 +44,13 @@ class BookingAdmin(admin.ModelAdmin):
         return obj.service.title if obj.service else '-'
     service_title.short_description = 'Service'
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_amounts()
+    
     def total_amount(self, obj):
         return f"₹{obj.total_amount}"
     total_amount.short_description = 'Total'
-    total_amount.admin_order_field = 'quoted_price'
+    total_amount.admin_order_field = 'effective_total'
     
     def view_payments_link(self, obj):
         url = reverse('admin:payments_payment_changelist') + f'?booking__id__exact={obj.id}'
@@ -91,14 +94,14 @@ class BookingAdmin(admin.ModelAdmin):
     actions = ['mark_as_completed', 'mark_as_cancelled']
     
     def mark_as_completed(self, request, queryset):
-        from django.utils import timezone
-        updated = queryset.update(status='completed', completed_at=timezone.now())
+        from .transitions import bulk_transition
+        updated = bulk_transition(queryset, 'completed', changed_by=request.user)
         self.message_user(request, f'{updated} bookings marked as completed.')
     mark_as_completed.short_description = "Mark selected bookings as completed"
     
     def mark_as_cancelled(self, request, queryset):
-        from django.utils import timezone
-        updated = queryset.update(status='cancelled', cancelled_at=timezone.now())
+        from .transitions import bulk_transition
+        updated = bulk_transition(queryset, 'cancelled', changed_by=request.user)
         self.message_user(request, f'{updated} bookings marked as cancelled.')
     mark_as_cancelled.short_description = "Mark selected bookings as cancelled"
 
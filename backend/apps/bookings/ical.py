@@ -0,0 +1,173 @@
+"""
+iCalendar feeds of a user's bookings.
+
+Calendar apps cannot send the API's auth header, so every user gets a feed
+URL carrying a signed token. A feed covers the bookings scheduled from
+BOOKING_CALENDAR_PAST_DAYS ago on. Its version (the latest updated_at and
+the number of those bookings) is read with one aggregate query, so a
+poll whose If-Modified-Since or If-None-Match still matches gets a 304
+without anything else being read. The rendered feed is cached per user
+with each booking's VEVENT; when the version moves only the bookings whose
+updated_at changed are loaded and rendered again.
+"""
+import datetime
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+TOKEN_SALT = 'bookings.ical'
+CACHE_KEY = 'bookings:ical:{user_id}'
+PRODID = '-//Service Marketplace//Bookings//EN'
+# Octets per content line before it is folded, see RFC 5545 3.1
+LINE_OCTETS = 75
+
+EVENT_STATUSES = {
+    'pending': 'TENTATIVE',
+    'rescheduled': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'accepted': 'CONFIRMED',
+    'in_progress': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'rejected': 'CANCELLED',
+    'cancelled': 'CANCELLED',
+    'no_show': 'CANCELLED',
+}
+
+
+def get_past_days():
+    return getattr(settings, 'BOOKING_CALENDAR_PAST_DAYS', 90)
+
+
+def get_cache_timeout():
+    return getattr(settings, 'BOOKING_CALENDAR_CACHE_TIMEOUT', 86400)
+
+
+def make_token(user):
+    return signing.dumps(user.pk, salt=TOKEN_SALT)
+
+
+def get_user(token):
+    """The active user a feed token was made for, or None."""
+    User = apps.get_model('users', 'User')
+    try:
+        user_id = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+def feed_bookings(user):
+    Booking = apps.get_model('bookings', 'Booking')
+    if user.role == 'customer':
+        owner = Q(customer=user)
+    elif user.role == 'provider' and hasattr(user, 'provider_profile'):
+        owner = Q(provider=user.provider_profile)
+    else:
+        return Booking.objects.none()
+    since = timezone.localdate() - datetime.timedelta(days=get_past_days())
+    return Booking.objects.filter(owner, scheduled_date__gte=since)
+
+
+def get_version(bookings):
+    """(latest updated_at or None, number of bookings) of a feed."""
+    version = bookings.order_by().aggregate(updated=Max('updated_at'), count=Count('pk'))
+    return version['updated'], version['count']
+
+
+def get_etag(user, version):
+    updated, count = version
+    digest = hashlib.sha1(f'{user.pk}|{updated.isoformat() if updated else ""}|{count}'.encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Split a content line into CRLF-terminated lines of at most LINE_OCTETS octets."""
+    lines = []
+    current, size = '', 0
+    for char in line:
+        octets = len(char.encode())
+        if size + octets > LINE_OCTETS:
+            lines.append(current)
+            # Continuation lines start with a space, which counts
+            current, size = ' ', 1
+        current += char
+        size += octets
+    lines.append(current)
+    return ''.join(f'{part}\r\n' for part in lines)
+
+
+def format_utc(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_event(booking):
+    starts = timezone.make_aware(datetime.datetime.combine(booking.scheduled_date, booking.scheduled_time))
+    ends = starts + datetime.timedelta(minutes=booking.estimated_duration_minutes)
+    description = f'Booking #{booking.booking_number}\n{booking.problem_description}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{booking.pk}@bookings',
+        f'DTSTAMP:{format_utc(booking.updated_at)}',
+        f'LAST-MODIFIED:{format_utc(booking.updated_at)}',
+        f'DTSTART:{format_utc(starts)}',
+        f'DTEND:{format_utc(ends)}',
+        f'SUMMARY:{escape(booking.service.title)} - {escape(booking.provider.business_name)}',
+        f'LOCATION:{escape(booking.service_address)}\\, {escape(booking.city)}',
+        f'DESCRIPTION:{escape(description)}',
+        f'STATUS:{EVENT_STATUSES.get(booking.status, "CONFIRMED")}',
+        'END:VEVENT',
+    ]
+    return ''.join(fold(line) for line in lines)
+
+
+def render_feed(events):
+    header = ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+    ])
+    body = ''.join(text for _, _, text in sorted(events.values(), key=lambda event: event[1]))
+    return header + body + fold('END:VCALENDAR')
+
+
+def get_feed(user, bookings, version):
+    """
+    The feed's text for a version, re-rendering only the bookings changed
+    since the cached copy.
+    """
+    key = CACHE_KEY.format(user_id=user.pk)
+    cached = cache.get(key) or {'version': None, 'events': {}, 'body': None}
+    if cached['version'] == version:
+        return cached['body']
+
+    # {booking pk: (updated_at, sort key, VEVENT)}
+    events = {}
+    stale = []
+    for pk, updated_at in bookings.order_by().values_list('pk', 'updated_at'):
+        event = cached['events'].get(pk)
+        if event is not None and event[0] == updated_at:
+            events[pk] = event
+        else:
+            stale.append(pk)
+    changed = bookings.filter(pk__in=stale).select_related('service', 'provider').only(
+        'booking_number', 'scheduled_date', 'scheduled_time', 'estimated_duration_minutes',
+        'service_address', 'city', 'problem_description', 'status', 'updated_at',
+        'service__title', 'provider__business_name',
+    )
+    for booking in changed:
+        sort_key = (booking.scheduled_date, booking.scheduled_time, str(booking.pk))
+        events[booking.pk] = (booking.updated_at, sort_key, render_event(booking))
+
+    body = render_feed(events)
+    cache.set(key, {'version': version, 'events': events, 'body': body}, timeout=get_cache_timeout())
+    return body
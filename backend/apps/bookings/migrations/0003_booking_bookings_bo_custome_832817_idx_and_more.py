@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-17 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['customer', 'scheduled_date', 'scheduled_time'], name='bookings_bo_custome_832817_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['provider', 'scheduled_date', 'scheduled_time'], name='bookings_bo_provide_7c3b6a_idx'),
+        ),
+    ]
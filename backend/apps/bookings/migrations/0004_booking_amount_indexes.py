@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 21:26
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_booking_bookings_bo_custome_832817_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['customer', 'created_at'], name='bookings_bo_custome_f17938_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['provider', 'created_at'], name='bookings_bo_provide_0f3a44_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Coalesce('final_price', 'quoted_price'), '+', models.F('additional_charges')), '-', models.F('discount_amount')), name='bookings_total_amount_idx'),
+        ),
+    ]
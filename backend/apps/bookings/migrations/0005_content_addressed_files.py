@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 21:54
+
+import apps.common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_amount_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookingattachment',
+            name='file',
+            field=models.FileField(storage=apps.common.storage.get_blob_storage, upload_to='booking_attachments/'),
+        ),
+    ]
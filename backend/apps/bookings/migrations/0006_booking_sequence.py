@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 21:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_content_addressed_files'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Booking Sequence',
+                'verbose_name_plural': 'Booking Sequences',
+            },
+        ),
+    ]
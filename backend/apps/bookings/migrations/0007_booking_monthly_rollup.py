@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-17 22:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    from apps.bookings import stats
+
+    stats.rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0011_content_addressed_files'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0006_booking_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='booking_rollups', to=settings.AUTH_USER_MODEL)),
+                ('provider', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='booking_rollups', to='providers.serviceprovider')),
+            ],
+            options={
+                'verbose_name': 'Booking Monthly Rollup',
+                'verbose_name_plural': 'Booking Monthly Rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bookingmonthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('provider__isnull', True)), fields=('customer', 'month', 'status'), name='bookings_rollup_customer_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookingmonthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('customer__isnull', True)), fields=('provider', 'month', 'status'), name='bookings_rollup_provider_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookingmonthlyrollup',
+            constraint=models.CheckConstraint(check=models.Q(('customer__isnull', True), ('provider__isnull', True), _connector='XOR'), name='bookings_rollup_one_owner'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
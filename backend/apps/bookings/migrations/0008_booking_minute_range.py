@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-17 22:10
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+
+def populate_minute_range(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    start = ExtractHour('scheduled_time') * 60 + ExtractMinute('scheduled_time')
+    Booking.objects.update(start_minute=start, end_minute=start + F('estimated_duration_minutes'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_monthly_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='end_minute',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='start_minute',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['provider', 'scheduled_date', 'start_minute', 'end_minute'], name='bookings_provider_overlap_idx'),
+        ),
+        migrations.RunPython(populate_minute_range, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,40 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from apps.common.models import BaseModel
+from apps.common.storage import get_blob_storage
+from apps.providers.slots import BLOCKING_STATUSES, to_minutes
 from apps.users.models import User  # Keep this import
 # REMOVE: from apps.services.models import Service  # This causes circular import
 
+# SQL versions of Booking.total_amount and Booking.balance_amount
+TOTAL_AMOUNT = Coalesce('final_price', 'quoted_price') + F('additional_charges') - F('discount_amount')
+AMOUNT_FIELDS = ('quoted_price', 'final_price', 'additional_charges', 'discount_amount')
+BALANCE_AMOUNT = TOTAL_AMOUNT - F('advance_paid')
+# Booking fields start_minute and end_minute are computed from
+TIME_FIELDS = ('scheduled_time', 'estimated_duration_minutes')
+
+
+class BookingQuerySet(models.QuerySet):
+    
+    def with_amounts(self):
+        """Annotate effective_total and effective_balance computed in the database."""
+        return self.annotate(effective_total=TOTAL_AMOUNT, effective_balance=BALANCE_AMOUNT)
+    
+    def overlapping(self, provider, date, start_minute, end_minute):
+        """Bookings taking up a provider's time within [start_minute, end_minute) of a day."""
+        return self.filter(
+            provider=provider,
+            scheduled_date=date,
+            start_minute__lt=end_minute,
+            end_minute__gt=start_minute,
+            status__in=BLOCKING_STATUSES,
+        )
+
+
 class Booking(BaseModel):
     """Booking/Appointment model."""
     
@@ -55,6 +86,9 @@ class Booking(BaseModel):
         default=60,
         help_text="Estimated service duration in minutes"
     )
+    # Minutes since midnight the booking starts and ends at, for overlap checks
+    start_minute = models.PositiveIntegerField(default=0, editable=False)
+    end_minute = models.PositiveIntegerField(default=0, editable=False)
     
     # Location
     service_address = models.TextField()
@@ -108,12 +142,12 @@ class Booking(BaseModel):
     additional_charges = models.DecimalField(
         max_digits=10,
         decimal_places=2,
-        default=0.00
+        default=Decimal('0.00')
     )
     discount_amount = models.DecimalField(
         max_digits=10,
         decimal_places=2,
-        default=0.00
+        default=Decimal('0.00')
     )
     
     # Payment
@@ -131,7 +165,7 @@ class Booking(BaseModel):
     advance_paid = models.DecimalField(
         max_digits=10,
         decimal_places=2,
-        default=0.00
+        default=Decimal('0.00')
     )
     
     # Tracking
@@ -156,33 +190,71 @@ class Booking(BaseModel):
             models.Index(fields=['scheduled_date', 'status']),
             models.Index(fields=['status', 'payment_status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['customer', 'scheduled_date', 'scheduled_time']),
+            models.Index(fields=['provider', 'scheduled_date', 'scheduled_time']),
+            models.Index(fields=['customer', 'created_at']),
+            models.Index(fields=['provider', 'created_at']),
+            models.Index(TOTAL_AMOUNT, name='bookings_total_amount_idx'),
+            models.Index(
+                fields=['provider', 'scheduled_date', 'start_minute', 'end_minute'],
+                name='bookings_provider_overlap_idx'
+            ),
         ]
         ordering = ['-scheduled_date', '-scheduled_time']
     
+    objects = BookingQuerySet.as_manager()
+    
+    # Status as last loaded or saved, used by the provider rollups
+    loaded_status = None
+    # Date as last loaded or saved, used by the availability bitmaps
+    loaded_scheduled_date = None
+    # total_amount as last loaded or saved, used by the monthly rollups
+    loaded_amount = None
+    
     def __str__(self):
         return f"Booking #{self.booking_number}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names:
+            instance.loaded_status = values[field_names.index('status')]
+        if 'scheduled_date' in field_names:
+            instance.loaded_scheduled_date = values[field_names.index('scheduled_date')]
+        if all(name in field_names for name in AMOUNT_FIELDS):
+            instance.loaded_amount = instance.total_amount
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.booking_number:
-            import datetime
-            date_str = datetime.datetime.now().strftime('%y%m%d')
-            last_booking = Booking.objects.filter(
-                booking_number__startswith=f'BK{date_str}'
-            ).order_by('booking_number').last()
-            
-            if last_booking:
-                last_num = int(last_booking.booking_number[-4:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-            
-            self.booking_number = f"BK{date_str}{new_num:04d}"
+            from .sequences import next_booking_number
+            self.booking_number = next_booking_number()
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(TIME_FIELDS) & set(update_fields):
+            self.start_minute, self.end_minute = self.minute_range(
+                self.scheduled_time, self.estimated_duration_minutes
+            )
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, 'start_minute', 'end_minute'}
         
         super().save(*args, **kwargs)
+        if update_fields is None or 'status' in update_fields:
+            self.loaded_status = self.status
+        if update_fields is None or 'scheduled_date' in update_fields:
+            self.loaded_scheduled_date = self.scheduled_date
+        if update_fields is None or set(AMOUNT_FIELDS) & set(update_fields):
+            self.loaded_amount = self.total_amount
+    
+    @staticmethod
+    def minute_range(scheduled_time, duration):
+        start = to_minutes(scheduled_time)
+        return start, start + duration
     
     @property
     def total_amount(self):
-        base = self.final_price or self.quoted_price
+        # As TOTAL_AMOUNT: a final price, even of 0, replaces the quote
+        base = self.quoted_price if self.final_price is None else self.final_price
         return base + self.additional_charges - self.discount_amount
     
     @property
@@ -200,6 +272,68 @@ class Booking(BaseModel):
         return False
 
 
+class BookingSequence(models.Model):
+    """Last booking number issued on a date, see sequences.py."""
+    date = models.DateField(unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Booking Sequence'
+        verbose_name_plural = 'Booking Sequences'
+    
+    def __str__(self):
+        return f"{self.date}: {self.last_value}"
+
+
+class BookingMonthlyRollup(models.Model):
+    """
+    Bookings of one customer or one provider created in a month, by
+    current status, maintained by stats.py. Exactly one of customer and
+    provider is set.
+    """
+    customer = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='booking_rollups'
+    )
+    provider = models.ForeignKey(
+        'providers.ServiceProvider',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='booking_rollups'
+    )
+    month = models.DateField(help_text="First day of the month")
+    status = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = 'Booking Monthly Rollup'
+        verbose_name_plural = 'Booking Monthly Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['customer', 'month', 'status'],
+                condition=models.Q(provider__isnull=True),
+                name='bookings_rollup_customer_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['provider', 'month', 'status'],
+                condition=models.Q(customer__isnull=True),
+                name='bookings_rollup_provider_uniq'
+            ),
+            models.CheckConstraint(
+                check=models.Q(customer__isnull=True) ^ models.Q(provider__isnull=True),
+                name='bookings_rollup_one_owner'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.customer_id or self.provider_id} {self.month:%Y-%m} {self.status}: {self.count}"
+
+
 class BookingStatusHistory(BaseModel):
     """Track status changes of bookings."""
     booking = models.ForeignKey(
@@ -243,7 +377,7 @@ class BookingAttachment(BaseModel):
             ('other', 'Other'),
         ]
     )
-    file = models.FileField(upload_to='booking_attachments/')
+    file = models.FileField(upload_to='booking_attachments/', storage=get_blob_storage)
     uploaded_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -6,4 +6,9 @@ class IsBookingOwner(permissions.BasePermission):
 
 class IsBookingProvider(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return hasattr(request.user, 'provider_profile') and obj.provider == request.user.provider_profile
\ No newline at end of file
+        return hasattr(request.user, 'provider_profile') and obj.provider == request.user.provider_profile
+
+class IsCancellingBookingOwner(permissions.BasePermission):
+    """The booking's customer, when cancelling it."""
+    def has_object_permission(self, request, view, obj):
+        return obj.customer == request.user and request.data.get('status') == 'cancelled'
\ No newline at end of file
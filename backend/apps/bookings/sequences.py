@@ -0,0 +1,87 @@
+"""
+Booking number allocation.
+
+Booking numbers are ``BK<yymmdd><n>`` with a per-day counter. The counter
+lives in one BookingSequence row per date, bumped with a single UPDATE, so
+concurrent bookings never compute the same number. With
+BOOKING_NUMBER_BLOCK_SIZE above 1 each process reserves a block of numbers
+at a time and hands them out from memory; numbers of a block a process
+does not use before the day ends or the process exits are skipped.
+"""
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.utils import timezone
+
+PREFIX = 'BK'
+
+# date -> [next number, end of block) reserved by this process
+_blocks = {}
+_lock = threading.Lock()
+
+
+def get_block_size():
+    return max(1, getattr(settings, 'BOOKING_NUMBER_BLOCK_SIZE', 1))
+
+
+def format_number(date, number):
+    return f'{PREFIX}{date:%y%m%d}{number:04d}'
+
+
+def _last_issued(date):
+    """Highest number already used on a date, for days started before the sequence."""
+    Booking = apps.get_model('bookings', 'Booking')
+    prefix = format_number(date, 0)[:-4]
+    last = Booking.objects.filter(booking_number__startswith=prefix).annotate(
+        length=Length('booking_number')
+    ).order_by('-length', '-booking_number').values_list('booking_number', flat=True).first()
+    return int(last[len(prefix):]) if last else 0
+
+
+def reserve(date, count=1):
+    """Reserve count consecutive numbers for a date; returns the first."""
+    BookingSequence = apps.get_model('bookings', 'BookingSequence')
+    rows = BookingSequence.objects.filter(date=date)
+    with transaction.atomic():
+        if not rows.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    BookingSequence.objects.create(date=date, last_value=_last_issued(date) + count)
+            except IntegrityError:
+                # Another process created the row first
+                rows.update(last_value=F('last_value') + count)
+        # The UPDATE holds the row lock, so this reads our own increment
+        return rows.values_list('last_value', flat=True).get() - count + 1
+
+
+def _publish_block(date, start, end):
+    with _lock:
+        # Blocks of earlier days are dropped
+        _blocks.clear()
+        _blocks[date] = [start, end]
+
+
+def next_number(date=None):
+    date = date or timezone.localdate()
+    with _lock:
+        block = _blocks.get(date)
+        if block and block[0] < block[1]:
+            number = block[0]
+            block[0] += 1
+            return number
+    size = get_block_size()
+    first = reserve(date, size)
+    if size > 1:
+        # Only hand out the rest once the reservation is committed; a rollback
+        # also rolls the counter back
+        transaction.on_commit(lambda: _publish_block(date, first + 1, first + size))
+    return first
+
+
+def next_booking_number(date=None):
+    date = date or timezone.localdate()
+    return format_number(date, next_number(date))
@@ -1,6 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
+from apps.common.serializers import DynamicFieldsModelSerializer
 from .models import Booking, BookingStatusHistory, BookingAttachment
 from apps.services.serializers import ServiceSerializer
+from apps.providers.models import ServiceProvider
+from apps.providers.slots import MINUTES_PER_DAY
 from apps.providers.serializers import ServiceProviderSerializer
 from apps.users.serializers import UserSerializer
 
@@ -22,7 +26,7 @@ class BookingStatusHistorySerializer(serializers.ModelSerializer):
                  'notes', 'created_at']
         read_only_fields = ['id', 'created_at']
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(DynamicFieldsModelSerializer):
     customer_details = UserSerializer(source='customer', read_only=True)
     provider_details = ServiceProviderSerializer(source='provider', read_only=True)
     service_details = ServiceSerializer(source='service', read_only=True)
@@ -54,6 +58,22 @@ class BookingSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'booking_number', 'status_changed_at',
                            'total_amount', 'balance_amount', 'is_past_due',
                            'created_at', 'updated_at']
+        expandable_fields = ['customer_details', 'provider_details', 'service_details',
+                            'attachments', 'status_history']
+
+class UpcomingBookingSerializer(DynamicFieldsModelSerializer):
+    """Compact booking for the upcoming bookings feed."""
+    service_title = serializers.CharField(source='service.title', read_only=True)
+    provider_name = serializers.CharField(source='provider.business_name', read_only=True)
+    customer_name = serializers.CharField(source='customer.get_full_name', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = Booking
+        fields = ['id', 'booking_number', 'status', 'status_display', 'scheduled_date',
+                 'scheduled_time', 'estimated_duration_minutes', 'service_title',
+                 'provider_name', 'customer_name', 'city']
+        read_only_fields = fields
 
 class BookingCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -78,11 +98,36 @@ class BookingCreateSerializer(serializers.ModelSerializer):
                 {"service": "This service is currently not available."}
             )
         
+        # The booking takes as long as its service, for the check and once saved
+        attrs['estimated_duration_minutes'] = service.estimated_duration_minutes
+        self.check_overlap(attrs)
         return attrs
+    
+    def check_overlap(self, attrs):
+        """Reject a booking running past midnight or overlapping one the provider already has."""
+        start, end = Booking.minute_range(attrs['scheduled_time'], attrs['estimated_duration_minutes'])
+        if end > MINUTES_PER_DAY:
+            # Days are checked (and their free time computed) one at a time
+            raise serializers.ValidationError(
+                {"scheduled_time": "A booking must end by midnight."}
+            )
+        if Booking.objects.overlapping(attrs['provider'], attrs['scheduled_date'], start, end).exists():
+            raise serializers.ValidationError(
+                {"scheduled_time": "The provider already has a booking at this time."}
+            )
+    
+    def create(self, validated_data):
+        # Bookings of a provider are created one at a time behind a lock on
+        # its row, so two overlapping requests cannot both pass the check
+        with transaction.atomic():
+            ServiceProvider.objects.select_for_update().get(pk=validated_data['provider'].pk)
+            self.check_overlap(validated_data)
+            return super().create(validated_data)
 
 class BookingUpdateSerializer(serializers.ModelSerializer):
+    # The status only changes through BookingStatusUpdateView, which checks
+    # the transition (see transitions.py)
     class Meta:
         model = Booking
-        fields = ['status', 'provider_notes', 'final_price', 'additional_charges',
-                 'discount_amount', 'payment_status', 'advance_paid',
-                 'cancellation_reason']
\ No newline at end of file
+        fields = ['payment_status', 'provider_notes', 'final_price', 'additional_charges',
+                 'discount_amount', 'advance_paid', 'cancellation_reason']
\ No newline at end of file
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AMOUNT_FIELDS, Booking
+from . import stats
+
+# Booking fields that move its monthly rollup contribution
+ROLLUP_FIELDS = {'status', *AMOUNT_FIELDS}
+
+
+@receiver(post_save, sender=Booking)
+def update_monthly_rollups(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not ROLLUP_FIELDS & set(update_fields):
+        return
+    new = (instance.status, instance.total_amount)
+    if created:
+        stats.record_change(instance, None, new)
+        return
+    if instance.loaded_status is None or instance.loaded_amount is None:
+        # Loaded with deferred columns; the rollups cannot tell what changed
+        return
+    old = (instance.loaded_status, instance.loaded_amount)
+    if old != new:
+        stats.record_change(instance, old, new)
+
+
+@receiver(post_delete, sender=Booking)
+def remove_monthly_rollups(sender, instance, **kwargs):
+    amount = instance.total_amount if instance.loaded_amount is None else instance.loaded_amount
+    stats.record_change(instance, (instance.loaded_status or instance.status, amount), None)
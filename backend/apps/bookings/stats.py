@@ -0,0 +1,130 @@
+"""
+Monthly booking rollups.
+
+BookingMonthlyRollup keeps, for every customer and every provider, the
+number of bookings created in each month by their current status and the
+sum of their total_amount. A booking write moves the booking's
+contribution between rows with one UPDATE of F() expressions per row (see
+signals.py), so the stats endpoint reads a few rows whatever the size of
+the booking history. rebuild() recomputes the table from the bookings.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Greatest, TruncMonth
+from django.utils import timezone
+
+STATUSES = ['pending', 'confirmed', 'accepted', 'in_progress', 'completed', 'cancelled']
+
+
+def month_of(created_at):
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def _owners(customer_id, provider_id):
+    return [
+        {'customer_id': customer_id, 'provider_id': None},
+        {'customer_id': None, 'provider_id': provider_id},
+    ]
+
+
+def _apply(owner, month, status, count, revenue):
+    RollUp = django_apps.get_model('bookings', 'BookingMonthlyRollup')
+    rows = RollUp.objects.filter(month=month, status=status, **owner)
+    if rows.update(count=Greatest(F('count') + count, 0), revenue=F('revenue') + revenue):
+        return
+    if count <= 0:
+        # Nothing recorded to take away from
+        return
+    try:
+        with transaction.atomic():
+            RollUp.objects.create(month=month, status=status, count=count, revenue=revenue, **owner)
+    except IntegrityError:
+        # Created concurrently
+        rows.update(count=F('count') + count, revenue=F('revenue') + revenue)
+
+
+def record_changes(changes):
+    """
+    Roll up (customer_id, provider_id, created_at, old, new) rows, where old
+    and new are (status, amount) or None for a booking created or deleted.
+    """
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    for customer_id, provider_id, created_at, old, new in changes:
+        month = month_of(created_at)
+        for part, sign in ((old, -1), (new, 1)):
+            if part is None:
+                continue
+            status, amount = part
+            for owner in _owners(customer_id, provider_id):
+                key = (tuple(sorted(owner.items())), month, status)
+                deltas[key][0] += sign
+                deltas[key][1] += sign * Decimal(amount or 0)
+    with transaction.atomic():
+        for (owner, month, status), (count, revenue) in deltas.items():
+            if count or revenue:
+                _apply(dict(owner), month, status, count, revenue)
+
+
+def record_change(booking, old, new):
+    record_changes([(booking.customer_id, booking.provider_id, booking.created_at, old, new)])
+
+
+def get_stats(customer=None, provider=None, months=6):
+    """Status counts over all time and count/revenue of the last few months, from one query."""
+    RollUp = django_apps.get_model('bookings', 'BookingMonthlyRollup')
+    if customer is not None:
+        rows = RollUp.objects.filter(customer=customer)
+    elif provider is not None:
+        rows = RollUp.objects.filter(provider=provider)
+    else:
+        rows = RollUp.objects.none()
+
+    recent = [timezone.localdate().replace(day=1)]
+    for _ in range(months - 1):
+        previous = recent[0] - timezone.timedelta(days=1)
+        recent.insert(0, previous.replace(day=1))
+    by_month = {month: {'count': 0, 'revenue': Decimal('0')} for month in recent}
+
+    stats = {'total': 0, **dict.fromkeys(STATUSES, 0)}
+    for month, status, count, revenue in rows.values_list('month', 'status', 'count', 'revenue'):
+        stats['total'] += count
+        if status in stats:
+            stats[status] += count
+        if month in by_month:
+            by_month[month]['count'] += count
+            by_month[month]['revenue'] += revenue
+    stats['monthly_stats'] = [
+        {'month': month.strftime('%b %Y'), **values} for month, values in by_month.items()
+    ]
+    return stats
+
+
+def rebuild(registry=django_apps, chunk_size=500):
+    """Recompute every rollup from the bookings; returns the number of rows written."""
+    from apps.bookings.models import TOTAL_AMOUNT
+
+    Booking = registry.get_model('bookings', 'Booking')
+    RollUp = registry.get_model('bookings', 'BookingMonthlyRollup')
+    rows = []
+    for owner in ('customer', 'provider'):
+        grouped = Booking.objects.annotate(
+            month=TruncMonth('created_at', output_field=DateField())
+        ).values(owner, 'month', 'status').annotate(
+            count=Count('id'), revenue=Sum(TOTAL_AMOUNT)
+        ).order_by()
+        for row in grouped.iterator(chunk_size=chunk_size):
+            rows.append(RollUp(
+                **{f'{owner}_id': row[owner]},
+                month=row['month'],
+                status=row['status'],
+                count=row['count'],
+                revenue=row['revenue'] or 0,
+            ))
+    with transaction.atomic():
+        RollUp.objects.all().delete()
+        RollUp.objects.bulk_create(rows, batch_size=chunk_size)
+    return len(rows)
@@ -1,3 +1,354 @@
-from django.test import TestCase
+import datetime
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from apps.bookings import sequences, stats, transitions
+from apps.bookings.models import Booking, BookingMonthlyRollup, BookingSequence, BookingStatusHistory
+from apps.bookings.serializers import BookingCreateSerializer
+from apps.common import testing
+
+
+class OverlapTests(TestCase):
+    
+    def setUp(self):
+        self.day = datetime.date.today() + datetime.timedelta(days=2)
+        self.service = testing.service(estimated_duration_minutes=90)
+        self.customer = testing.user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+    
+    def data(self, scheduled_time, service=None):
+        service = service or self.service
+        return {
+            'customer': self.customer.pk,
+            'provider': service.provider_id,
+            'service': service.pk,
+            'scheduled_date': self.day,
+            'scheduled_time': scheduled_time,
+            'service_address': '1 Main Street',
+            'city': 'Pune',
+            'state': 'MH',
+            'postal_code': '411001',
+            'problem_description': 'Leaking tap',
+            'quoted_price': '500',
+        }
+    
+    def test_booking_takes_the_service_duration(self):
+        response = self.client.post('/api/bookings/bookings/', self.data('10:00'))
+        self.assertEqual(response.status_code, 201, response.content)
+        booking = Booking.objects.get(customer=self.customer)
+        self.assertEqual(booking.estimated_duration_minutes, 90)
+        self.assertEqual((booking.start_minute, booking.end_minute), (600, 690))
+    
+    def test_overlapping_bookings_are_rejected(self):
+        self.assertEqual(self.client.post('/api/bookings/bookings/', self.data('10:00')).status_code, 201)
+        # 11:00 falls inside the first booking's 90 minutes
+        response = self.client.post('/api/bookings/bookings/', self.data('11:00'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('scheduled_time', response.data)
+        # A 90 minute job from 08:45 would run into it too
+        self.assertEqual(self.client.post('/api/bookings/bookings/', self.data('08:45')).status_code, 400)
+        self.assertEqual(self.client.post('/api/bookings/bookings/', self.data('11:30')).status_code, 201)
+        self.assertEqual(self.client.post('/api/bookings/bookings/', self.data('08:30')).status_code, 201)
+        
+        # Another provider is free at the same time
+        other = testing.service()
+        self.assertEqual(self.client.post('/api/bookings/bookings/', self.data('10:00', other)).status_code, 201)
+    
+    def test_cancelled_bookings_free_their_time(self):
+        booking = testing.booking(service=self.service, scheduled_date=self.day, scheduled_time=datetime.time(10))
+        self.assertEqual(self.client.post('/api/bookings/bookings/', self.data('10:30')).status_code, 400)
+        Booking.objects.filter(pk=booking.pk).update(status='cancelled')
+        self.assertEqual(self.client.post('/api/bookings/bookings/', self.data('10:30')).status_code, 201)
+    
+    def test_create_checks_again_under_the_provider_lock(self):
+        serializer = BookingCreateSerializer(data=self.data('12:00'))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        # Another request takes the slot between validation and save
+        testing.booking(service=self.service, scheduled_date=self.day, scheduled_time=datetime.time(12, 30))
+        with self.assertRaises(serializers.ValidationError):
+            serializer.save(customer=self.customer)
+        self.assertEqual(Booking.objects.filter(customer=self.customer).count(), 0)
+
+
+class TransitionTests(TestCase):
+    
+    def setUp(self):
+        self.booking = testing.booking()
+        self.url = f'/api/bookings/bookings/{self.booking.pk}/status/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.booking.provider.user)
+    
+    def test_status_view(self):
+        other = APIClient()
+        other.force_authenticate(testing.provider().user)
+        self.assertEqual(other.post(self.url, {'status': 'accepted'}).status_code, 403)
+        
+        response = self.client.post(self.url, {'status': 'completed'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.data)
+        for new_status in ['accepted', 'in_progress', 'completed']:
+            response = self.client.post(self.url, {'status': new_status})
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(response.data['status'], new_status)
+        
+        self.booking.refresh_from_db()
+        self.assertIsNotNone(self.booking.assigned_at)
+        self.assertIsNotNone(self.booking.completed_at)
+        history = BookingStatusHistory.objects.filter(booking=self.booking).order_by('created_at')
+        self.assertEqual(list(history.values_list('new_status', flat=True)), ['accepted', 'in_progress', 'completed'])
+        provider = self.booking.provider
+        provider.refresh_from_db()
+        self.assertEqual((provider.total_jobs_completed, provider.active_bookings), (1, 0))
+    
+    def test_stale_status_conflicts(self):
+        stale = Booking.objects.get(pk=self.booking.pk)
+        transitions.transition(self.booking, 'accepted')
+        # Read as pending, but the booking moved on meanwhile
+        with self.assertRaises(transitions.StatusConflict):
+            transitions.transition(stale, 'rejected')
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'accepted')
+        self.assertEqual(BookingStatusHistory.objects.filter(booking=self.booking).count(), 1)
+    
+    def test_update_cannot_change_status(self):
+        response = self.client.patch(
+            f'/api/bookings/bookings/{self.booking.pk}/',
+            {'status': 'completed', 'payment_status': 'paid', 'provider_notes': 'Bring a spanner'},
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.status, self.booking.payment_status), ('pending', 'paid'))
+        self.assertEqual(self.booking.provider_notes, 'Bring a spanner')
+        self.assertFalse(BookingStatusHistory.objects.exists())
+    
+    def test_customer_can_only_cancel(self):
+        customer = APIClient()
+        customer.force_authenticate(self.booking.customer)
+        self.assertEqual(customer.post(self.url, {'status': 'accepted'}).status_code, 403)
+        
+        response = customer.post(self.url, {'status': 'cancelled', 'cancellation_reason': 'Fixed it myself'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.status, self.booking.cancellation_reason), ('cancelled', 'Fixed it myself'))
+        self.assertIsNotNone(self.booking.cancelled_at)
+        history = BookingStatusHistory.objects.get(booking=self.booking)
+        self.assertEqual((history.old_status, history.new_status), ('pending', 'cancelled'))
+        self.assertEqual(history.changed_by, self.booking.customer)
+        # Another customer cannot cancel it
+        other = APIClient()
+        other.force_authenticate(testing.booking().customer)
+        self.assertEqual(other.post(self.url, {'status': 'cancelled'}).status_code, 403)
+    
+    def test_bulk_transition(self):
+        bookings = [self.booking] + [testing.booking(provider=self.booking.provider) for _ in range(2)]
+        transitions.transition(bookings[1], 'rejected')
+        # The rejected booking cannot be cancelled and is left alone
+        self.assertEqual(transitions.bulk_transition(Booking.objects.all(), 'cancelled'), 2)
+        self.assertEqual(
+            sorted(Booking.objects.values_list('status', flat=True)), ['cancelled', 'cancelled', 'rejected']
+        )
+        self.assertFalse(Booking.objects.filter(status='cancelled', cancelled_at__isnull=True).exists())
+        self.assertEqual(BookingStatusHistory.objects.filter(new_status='cancelled').count(), 2)
+        provider = self.booking.provider
+        provider.refresh_from_db()
+        self.assertEqual(provider.active_bookings, 0)
+
+
+class AmountTests(TestCase):
+    
+    def test_sql_amounts_match_the_properties(self):
+        customer = testing.user()
+        service = testing.service()
+        bookings = [
+            testing.booking(customer=customer, service=service, additional_charges=Decimal('50'),
+                            discount_amount=Decimal('20'), advance_paid=Decimal('100')),
+            testing.booking(customer=customer, service=service, final_price=Decimal('700')),
+            # Waived: a final price of 0 replaces the quote
+            testing.booking(customer=customer, service=service, final_price=Decimal('0')),
+        ]
+        amounts = {booking.pk: booking for booking in Booking.objects.with_amounts()}
+        for booking in bookings:
+            booking.refresh_from_db()
+            self.assertEqual(amounts[booking.pk].effective_total, booking.total_amount)
+            self.assertEqual(amounts[booking.pk].effective_balance, booking.balance_amount)
+        self.assertEqual([booking.total_amount for booking in bookings], [530, 700, 0])
+        
+        client = APIClient()
+        client.force_authenticate(customer)
+        response = client.get('/api/bookings/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['monthly_stats'][-1]['revenue'], Decimal('1230'))
+
+
+class StatsTests(TestCase):
+    
+    def rollups(self):
+        return sorted(
+            (str(row.customer_id), str(row.provider_id), row.month, row.status, row.count, row.revenue)
+            for row in BookingMonthlyRollup.objects.all() if row.count or row.revenue
+        )
+    
+    def test_incremental_rollups_match_rebuild(self):
+        customer = testing.user()
+        service = testing.service()
+        first = testing.booking(customer=customer, service=service)
+        second = testing.booking(customer=customer, service=service)
+        testing.booking(service=service).delete()
+        customer_stats = stats.get_stats(customer=customer)
+        self.assertEqual((customer_stats['total'], customer_stats['pending']), (2, 2))
+        self.assertEqual(customer_stats['monthly_stats'][-1]['revenue'], Decimal('1000'))
+        
+        second.final_price = Decimal('700')
+        second.save()
+        transitions.transition(second, 'accepted')
+        transitions.bulk_transition(Booking.objects.filter(pk=first.pk), 'cancelled')
+        incremental = self.rollups()
+        stats.rebuild()
+        self.assertEqual(self.rollups(), incremental)
+        
+        provider_stats = stats.get_stats(provider=service.provider)
+        self.assertEqual(
+            (provider_stats['total'], provider_stats['cancelled'], provider_stats['accepted']), (2, 1, 1)
+        )
+        self.assertEqual(provider_stats['monthly_stats'][-1]['revenue'], Decimal('1200'))
+        self.assertEqual(len(provider_stats['monthly_stats']), 6)
+    
+    def test_endpoint_reads_the_rollups(self):
+        booking = testing.booking()
+        client = APIClient()
+        client.force_authenticate(booking.customer)
+        with self.assertNumQueries(1):
+            response = client.get('/api/bookings/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 1)
+
+
+class SequenceTests(TestCase):
+    
+    def test_numbers_count_up_per_day(self):
+        today = timezone.localdate()
+        first, second = testing.booking(), testing.booking()
+        self.assertEqual(first.booking_number, sequences.format_number(today, 1))
+        self.assertEqual(second.booking_number, sequences.format_number(today, 2))
+        self.assertEqual(BookingSequence.objects.get(date=today).last_value, 2)
+        
+        tomorrow = today + datetime.timedelta(days=1)
+        self.assertEqual(sequences.next_booking_number(tomorrow), sequences.format_number(tomorrow, 1))
+    
+    def test_sequence_starts_after_existing_numbers(self):
+        today = timezone.localdate()
+        booking = testing.booking()
+        BookingSequence.objects.all().delete()
+        Booking.objects.filter(pk=booking.pk).update(booking_number=sequences.format_number(today, 10000))
+        self.assertEqual(testing.booking().booking_number, sequences.format_number(today, 10001))
+    
+    @override_settings(BOOKING_NUMBER_BLOCK_SIZE=10)
+    def test_blocks(self):
+        date = datetime.date(2030, 1, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = sequences.next_number(date)
+        # The rest of the block is handed out from memory
+        with self.assertNumQueries(0):
+            numbers = [sequences.next_number(date), sequences.next_number(date)]
+        self.assertEqual([first] + numbers, [1, 2, 3])
+        self.assertEqual(BookingSequence.objects.get(date=date).last_value, 10)
+        
+        # A block whose reservation does not commit is never handed out
+        other = datetime.date(2030, 1, 2)
+        with self.captureOnCommitCallbacks(execute=False):
+            self.assertEqual(sequences.next_number(other), 1)
+        self.assertEqual(sequences.next_number(other), 11)
+
+
+class ConcurrentSequenceTests(TransactionTestCase):
+    
+    @override_settings(BOOKING_NUMBER_BLOCK_SIZE=5)
+    def test_concurrent_reservations_do_not_overlap(self):
+        if connection.vendor == 'sqlite':
+            self.skipTest("SQLite's shared in-memory test database locks tables across threads")
+        date = datetime.date(2030, 1, 1)
+        firsts = []
+        
+        def reserve():
+            try:
+                firsts.append(sequences.reserve(date, 5))
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=reserve) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(firsts), list(range(1, 41, 5)))
+
+
+class UpcomingTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.customer = testing.user()
+        self.service = testing.service()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+    
+    def test_cursor_pages_through_the_feed(self):
+        for days in range(1, 6):
+            testing.booking(customer=self.customer, service=self.service,
+                            scheduled_date=datetime.date.today() + datetime.timedelta(days=days))
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/bookings/upcoming/', {'cursor': '', 'page_size': 2})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['service_title'], self.service.title)
+        self.assertNotIn('customer_details', response.data['results'][0])
+        
+        seen = [booking['id'] for booking in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [booking['id'] for booking in response.data['results']]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        
+        self.client.force_authenticate(self.service.provider.user)
+        self.assertEqual(len(self.client.get('/api/bookings/upcoming/').data['results']), 5)
+    
+    def test_calendar_feed(self):
+        service = testing.service(title='Fix, pipes; now')
+        first = testing.booking(customer=self.customer, service=service, problem_description='x' * 200)
+        second = testing.booking(customer=self.customer, service=service)
+        url = self.client.get('/api/bookings/calendar/').data['url']
+        
+        # The token in the URL is the only credential
+        anonymous = APIClient()
+        response = anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn(r'Fix\, pipes\; now', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+        
+        with self.assertNumQueries(2):
+            response = anonymous.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        etag = anonymous.get(url)['ETag']
+        self.assertEqual(anonymous.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.assertNumQueries(2):
+            self.assertEqual(anonymous.get(url).content.decode(), body)
+        
+        transitions.transition(first, 'cancelled')
+        response = anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('STATUS:CANCELLED', response.content.decode())
+        Booking.objects.filter(pk=second.pk).delete()
+        self.assertEqual(anonymous.get(url).content.decode().count('BEGIN:VEVENT'), 1)
+        self.assertEqual(anonymous.get(url[:-10] + 'xx.ics').status_code, 404)
@@ -0,0 +1,162 @@
+"""
+Booking status transitions.
+
+TRANSITIONS lists the statuses a booking may move to from each status.
+transition() applies one with a single conditional UPDATE that only
+matches while the booking still has the status it was read with, and
+writes just the status, its timestamp and any fields passed in, in one
+transaction with the BookingStatusHistory row. Of two concurrent changes
+the second finds the status gone and fails instead of overwriting the
+first. bulk_transition() does the same for a queryset, as the admin
+actions do. Queryset updates send no signals, so both roll the change up
+into the provider counters, monthly stats and availability bitmaps
+themselves.
+"""
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status as http_status
+from rest_framework.exceptions import APIException, ValidationError
+
+TRANSITIONS = {
+    'pending': {'confirmed', 'accepted', 'rejected', 'cancelled', 'rescheduled'},
+    'confirmed': {'accepted', 'rejected', 'in_progress', 'cancelled', 'rescheduled', 'no_show'},
+    'accepted': {'in_progress', 'completed', 'cancelled', 'rescheduled', 'no_show'},
+    'in_progress': {'completed', 'cancelled'},
+    'rescheduled': {'confirmed', 'accepted', 'rejected', 'cancelled'},
+    'rejected': set(),
+    'completed': set(),
+    'cancelled': set(),
+    'no_show': set(),
+}
+# Field stamped with the time a booking enters a status
+TIMESTAMP_FIELDS = {
+    'accepted': 'assigned_at',
+    'in_progress': 'started_at',
+    'completed': 'completed_at',
+    'cancelled': 'cancelled_at',
+}
+
+
+class StatusConflict(APIException):
+    status_code = http_status.HTTP_409_CONFLICT
+    default_detail = 'The booking status was changed by someone else; reload and try again.'
+    default_code = 'status_conflict'
+
+
+def sources(new_status):
+    """Statuses a booking can move to new_status from."""
+    return {old_status for old_status, targets in TRANSITIONS.items() if new_status in targets}
+
+
+def check(old_status, new_status):
+    if new_status not in TRANSITIONS.get(old_status, ()):
+        raise ValidationError({'status': f'Cannot change status from "{old_status}" to "{new_status}".'})
+
+
+def _changed_values(new_status, now, values):
+    changed = {'status': new_status, 'status_changed_at': now, 'updated_at': now}
+    if new_status in TIMESTAMP_FIELDS:
+        changed[TIMESTAMP_FIELDS[new_status]] = now
+    changed.update(values)
+    return changed
+
+
+def _record(changes, new_status, changed_at):
+    """
+    Roll up (booking_id, provider_id, customer_id, created_at,
+    scheduled_date, old_status, amount) rows moved to new_status, after
+    their history rows are written.
+    """
+    from apps.providers import bitmaps, leaderboard, rollups
+    from . import stats
+
+    rollups.record_status_changes(
+        ((booking_id, provider_id, old_status, new_status, created_at)
+         for booking_id, provider_id, _, created_at, _, old_status, _ in changes),
+        changed_at,
+    )
+    stats.record_changes(
+        (customer_id, provider_id, created_at, (old_status, amount), (new_status, amount))
+        for _, provider_id, customer_id, created_at, _, old_status, amount in changes
+    )
+    dates = defaultdict(set)
+    for _, provider_id, _, _, scheduled_date, _, _ in changes:
+        dates[provider_id].add(scheduled_date)
+    for provider_id, provider_dates in dates.items():
+        bitmaps.sync(provider_id, provider_dates)
+    leaderboard.refresh_providers({
+        provider_id for _, provider_id, _, _, _, old_status, _ in changes
+        if 'completed' in (old_status, new_status)
+    })
+
+
+def transition(booking, new_status, changed_by=None, notes='', **values):
+    """
+    Move a booking from the status it was read with to new_status, setting
+    its fields to match. Raises ValidationError for a transition
+    TRANSITIONS does not allow and StatusConflict when the booking's status
+    changed meanwhile. Returns the history row.
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    BookingStatusHistory = apps.get_model('bookings', 'BookingStatusHistory')
+    old_status = booking.status
+    check(old_status, new_status)
+    now = timezone.now()
+    changed = _changed_values(new_status, now, values)
+    amount = booking.total_amount if booking.loaded_amount is None else booking.loaded_amount
+    with transaction.atomic():
+        if not Booking.objects.filter(pk=booking.pk, status=old_status).update(**changed):
+            raise StatusConflict()
+        history = BookingStatusHistory.objects.create(
+            booking=booking,
+            old_status=old_status,
+            new_status=new_status,
+            changed_by=changed_by,
+            notes=notes,
+        )
+        _record(
+            [(booking.pk, booking.provider_id, booking.customer_id, booking.created_at,
+              booking.scheduled_date, old_status, amount)],
+            new_status,
+            now,
+        )
+    for field, value in changed.items():
+        setattr(booking, field, value)
+    booking.loaded_status = new_status
+    return history
+
+
+def bulk_transition(queryset, new_status, changed_by=None, notes='', **values):
+    """
+    Move the bookings of a queryset that TRANSITIONS allows to new_status,
+    with one UPDATE and one history INSERT. Returns the number moved.
+    """
+    from .models import TOTAL_AMOUNT
+
+    BookingStatusHistory = apps.get_model('bookings', 'BookingStatusHistory')
+    now = timezone.now()
+    with transaction.atomic():
+        movable = queryset.filter(status__in=sources(new_status)).select_for_update()
+        rows = list(movable.annotate(amount=TOTAL_AMOUNT).values_list(
+            'pk', 'provider_id', 'customer_id', 'created_at', 'scheduled_date', 'status', 'amount'
+        ))
+        if not rows:
+            return 0
+        queryset.model.objects.filter(pk__in=[row[0] for row in rows]).update(
+            **_changed_values(new_status, now, values)
+        )
+        BookingStatusHistory.objects.bulk_create([
+            BookingStatusHistory(
+                booking_id=pk,
+                old_status=old_status,
+                new_status=new_status,
+                changed_by=changed_by,
+                notes=notes,
+            )
+            for pk, _, _, _, _, old_status, _ in rows
+        ])
+        _record(rows, new_status, now)
+    return len(rows)
@@ -4,8 +4,8 @@ from . import views
 urlpatterns = [
     # Bookings
     path('bookings/', views.BookingListView.as_view(), name='booking-list'),
-    path('bookings/<int:pk>/', views.BookingDetailView.as_view(), name='booking-detail'),
-    path('bookings/<int:pk>/status/', views.BookingStatusUpdateView.as_view(), name='booking-status-update'),
+    path('bookings/<uuid:pk>/', views.BookingDetailView.as_view(), name='booking-detail'),
+    path('bookings/<uuid:pk>/status/', views.BookingStatusUpdateView.as_view(), name='booking-status-update'),
     
     # User-specific bookings
     path('customer/bookings/', views.CustomerBookingsView.as_view(), name='customer-bookings'),
@@ -13,6 +13,10 @@ urlpatterns = [
     path('upcoming/', views.UpcomingBookingsView.as_view(), name='upcoming-bookings'),
     path('stats/', views.BookingStatsView.as_view(), name='booking-stats'),
     
+    # iCalendar feed
+    path('calendar/', views.BookingCalendarLinkView.as_view(), name='booking-calendar'),
+    path('calendar/<str:token>.ics', views.BookingCalendarFeedView.as_view(), name='booking-calendar-feed'),
+    
     # Attachments
     path('bookings/<int:booking_id>/attachments/', views.BookingAttachmentsView.as_view(), name='booking-attachments'),
 ]
\ No newline at end of file
@@ -2,26 +2,40 @@ from rest_framework import generics, permissions, status, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from datetime import datetime, timedelta
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from datetime import datetime
 
 from .models import Booking, BookingStatusHistory, BookingAttachment
 from .serializers import (
     BookingSerializer, BookingCreateSerializer,
     BookingUpdateSerializer, BookingAttachmentSerializer,
-    BookingStatusHistorySerializer
+    BookingStatusHistorySerializer, UpcomingBookingSerializer
 )
 from apps.users.permissions import IsCustomer, IsServiceProvider
-from .permissions import IsBookingOwner, IsBookingProvider
+from apps.common.mixins import ConditionalGetMixin, QueryOptimizationMixin
+from apps.common.pagination import KeysetPagination
+from .permissions import IsBookingOwner, IsBookingProvider, IsCancellingBookingOwner
+from .stats import get_stats
+from . import ical, transitions
 
 
-class BookingListView(generics.ListCreateAPIView):
+class BookingListView(QueryOptimizationMixin, generics.ListCreateAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'payment_status', 'priority']
     search_fields = ['booking_number', 'problem_description', 'service_address']
     ordering_fields = ['scheduled_date', 'created_at', 'quoted_price']
+    pagination_class = KeysetPagination
+    keyset_orderings = {
+        'scheduled_date': ('scheduled_date', 'scheduled_time'),
+        'created_at': ('created_at',),
+        'quoted_price': ('quoted_price',),
+    }
+    keyset_default_ordering = '-scheduled_date'
     
     def get_queryset(self):
         user = self.request.user
@@ -42,9 +56,10 @@ class BookingListView(generics.ListCreateAPIView):
         serializer.save(customer=self.request.user)
 
 
-class BookingDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BookingDetailView(ConditionalGetMixin, QueryOptimizationMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    conditional_related = ['customer', 'provider', 'service', 'attachments', 'status_history']
     
     def get_queryset(self):
         user = self.request.user
@@ -60,7 +75,7 @@ class BookingDetailView(generics.RetrieveUpdateDestroyAPIView):
         return BookingSerializer
 
 
-class CustomerBookingsView(generics.ListAPIView):
+class CustomerBookingsView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated, IsCustomer]
     
@@ -68,7 +83,7 @@ class CustomerBookingsView(generics.ListAPIView):
         return Booking.objects.filter(customer=self.request.user)
 
 
-class ProviderBookingsView(generics.ListAPIView):
+class ProviderBookingsView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated, IsServiceProvider]
     
@@ -77,53 +92,42 @@ class ProviderBookingsView(generics.ListAPIView):
 
 
 class BookingStatusUpdateView(APIView):
-    permission_classes = [permissions.IsAuthenticated, IsBookingProvider]
+    # Customers may cancel their own bookings, every other change is the provider's
+    permission_classes = [permissions.IsAuthenticated, IsBookingProvider | IsCancellingBookingOwner]
     
     def post(self, request, pk):
+        new_status = request.data.get('status')
+        
+        if not new_status:
+            return Response({"error": "Status is required"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if new_status not in dict(Booking.Status.choices):
+            return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
             booking = Booking.objects.get(pk=pk)
-            new_status = request.data.get('status')
-            
-            if not new_status:
-                return Response({"error": "Status is required"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if new_status not in dict(booking.Status.choices):
-                return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Create status history
-            BookingStatusHistory.objects.create(
-                booking=booking,
-                old_status=booking.status,
-                new_status=new_status,
-                changed_by=request.user,
-                notes=request.data.get('notes', '')
-            )
-            
-            # Update booking status
-            booking.status = new_status
-            
-            # Update timestamps based on status
-            now = datetime.now()
-            if new_status == 'accepted':
-                booking.assigned_at = now
-            elif new_status == 'in_progress':
-                booking.started_at = now
-            elif new_status == 'completed':
-                booking.completed_at = now
-            elif new_status == 'cancelled':
-                booking.cancelled_at = now
-                booking.cancellation_reason = request.data.get('cancellation_reason', '')
-            
-            booking.save()
-            
-            serializer = BookingSerializer(booking)
-            return Response(serializer.data)
-        
         except Booking.DoesNotExist:
             return Response({"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND)
+        self.check_object_permissions(request, booking)
+        
+        values = {}
+        if new_status == 'cancelled':
+            values['cancellation_reason'] = request.data.get('cancellation_reason', '')
+        
+        # One conditional UPDATE plus the history row, see transitions.py
+        transitions.transition(
+            booking,
+            new_status,
+            changed_by=request.user,
+            notes=request.data.get('notes', ''),
+            **values
+        )
+        
+        serializer = BookingSerializer(booking)
+        return Response(serializer.data)
 
 
-class BookingAttachmentsView(generics.ListCreateAPIView):
+class BookingAttachmentsView(QueryOptimizationMixin, generics.ListCreateAPIView):
     serializer_class = BookingAttachmentSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -144,30 +148,64 @@ class BookingAttachmentsView(generics.ListCreateAPIView):
         serializer.save(booking=booking, uploaded_by=user)
 
 
-class UpcomingBookingsView(APIView):
+class UpcomingBookingsView(QueryOptimizationMixin, generics.ListAPIView):
+    serializer_class = UpcomingBookingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_orderings = {
+        'scheduled_date': ('scheduled_date', 'scheduled_time'),
+    }
+    keyset_default_ordering = 'scheduled_date'
     
-    def get(self, request):
-        user = request.user
+    def get_queryset(self):
+        user = self.request.user
         today = datetime.now().date()
         
         if user.role == 'customer':
-            bookings = Booking.objects.filter(
+            return Booking.objects.filter(
                 customer=user,
                 scheduled_date__gte=today,
                 status__in=['pending', 'confirmed', 'accepted']
             ).order_by('scheduled_date', 'scheduled_time')
         elif user.role == 'provider':
-            bookings = Booking.objects.filter(
+            return Booking.objects.filter(
                 provider=user.provider_profile,
                 scheduled_date__gte=today,
                 status__in=['pending', 'confirmed', 'accepted']
             ).order_by('scheduled_date', 'scheduled_time')
-        else:
-            bookings = Booking.objects.none()
+        return Booking.objects.none()
+
+
+class BookingCalendarLinkView(APIView):
+    """URL of the user's iCalendar feed, for subscribing from a calendar app."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        path = reverse('booking-calendar-feed', kwargs={'token': ical.make_token(request.user)})
+        return Response({'url': request.build_absolute_uri(path)})
+
+
+class BookingCalendarFeedView(APIView):
+    """iCalendar feed of a user's bookings, authenticated by the token in its URL."""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, token):
+        user = ical.get_user(token)
+        if user is None:
+            return Response({"error": "Calendar not found"}, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = BookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        bookings = ical.feed_bookings(user)
+        version = ical.get_version(bookings)
+        etag = ical.get_etag(user, version)
+        last_modified = int(version[0].timestamp()) if version[0] else None
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(ical.get_feed(user, bookings, version), content_type='text/calendar; charset=utf-8')
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
 
 
 class BookingStatsView(APIView):
@@ -176,34 +214,12 @@ class BookingStatsView(APIView):
     def get(self, request):
         user = request.user
         
+        # Read from the monthly rollups, see stats.py
         if user.role == 'customer':
-            bookings = Booking.objects.filter(customer=user)
+            stats = get_stats(customer=user)
         elif user.role == 'provider':
-            bookings = Booking.objects.filter(provider=user.provider_profile)
+            stats = get_stats(provider=user.provider_profile)
         else:
-            bookings = Booking.objects.none()
-        
-        stats = {
-            'total': bookings.count(),
-            'pending': bookings.filter(status='pending').count(),
-            'confirmed': bookings.filter(status='confirmed').count(),
-            'accepted': bookings.filter(status='accepted').count(),
-            'in_progress': bookings.filter(status='in_progress').count(),
-            'completed': bookings.filter(status='completed').count(),
-            'cancelled': bookings.filter(status='cancelled').count(),
-        }
-        
-        # Monthly stats for the last 6 months
-        monthly_stats = []
-        for i in range(5, -1, -1):
-            month = datetime.now().date().replace(day=1) - timedelta(days=30*i)
-            month_bookings = bookings.filter(created_at__year=month.year, created_at__month=month.month)
-            monthly_stats.append({
-                'month': month.strftime('%b %Y'),
-                'count': month_bookings.count(),
-                'revenue': sum(b.total_amount for b in month_bookings if b.total_amount)
-            })
-        
-        stats['monthly_stats'] = monthly_stats
+            stats = get_stats()
         
         return Response(stats)
\ No newline at end of file
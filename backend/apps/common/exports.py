@@ -0,0 +1,303 @@
+"""
+Bulk data export.
+
+Each export type names a model, the columns that may be exported and the
+fields that may be filtered on. Rows are read with values_list() and
+iterator(chunk_size=...), so memory use does not depend on the number of
+rows: CSV and JSON are streamed straight into the response and XLSX is
+written row by row into a temporary file that is then streamed back.
+"""
+import csv
+import datetime
+import json
+import tempfile
+import uuid
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+FILTER_LOOKUPS = ('exact', 'iexact', 'in', 'gt', 'gte', 'lt', 'lte', 'isnull', 'range')
+
+
+class ExportDefinition:
+    """What one export type may read from its model."""
+
+    def __init__(self, model, fields, filter_fields, ordering=('pk',)):
+        self.model_label = model
+        self.fields = list(fields)
+        self.filter_fields = set(filter_fields)
+        self.ordering = ordering
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def get_fields(self, requested=None):
+        if not requested:
+            return self.fields
+        unknown = [field for field in requested if field not in self.fields]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        return list(requested)
+
+    def get_filters(self, filters=None):
+        cleaned = {}
+        for key, value in (filters or {}).items():
+            field, _, lookup = key.partition('__')
+            if field not in self.filter_fields or (lookup and lookup not in FILTER_LOOKUPS):
+                raise ValidationError({'filters': f"Unsupported filter: {key}"})
+            cleaned[key] = value
+        return cleaned
+
+    def get_queryset(self, fields, filters=None):
+        try:
+            queryset = self.model.objects.filter(**self.get_filters(filters))
+        except (DjangoValidationError, ValueError, TypeError) as exc:
+            # Bad filter values must fail before the response starts streaming
+            raise ValidationError({'filters': str(exc)})
+        return queryset.order_by(*self.ordering).values_list(*fields)
+
+
+EXPORTS = {
+    'bookings': ExportDefinition(
+        'bookings.Booking',
+        fields=[
+            'booking_number', 'status', 'priority', 'payment_status',
+            'customer__email', 'provider__business_name', 'service__title',
+            'scheduled_date', 'scheduled_time', 'estimated_duration_minutes',
+            'city', 'state', 'postal_code', 'quoted_price', 'final_price',
+            'additional_charges', 'discount_amount', 'advance_paid',
+            'completed_at', 'cancelled_at', 'created_at',
+        ],
+        filter_fields=[
+            'status', 'payment_status', 'priority', 'customer', 'provider',
+            'service', 'city', 'scheduled_date', 'created_at',
+        ],
+    ),
+    'payments': ExportDefinition(
+        'payments.Payment',
+        fields=[
+            'payment_id', 'order_id', 'booking__booking_number', 'user__email',
+            'amount', 'currency', 'payment_method', 'payment_gateway', 'status',
+            'gateway_payment_id', 'refund_amount', 'initiated_at',
+            'completed_at', 'refunded_at', 'created_at',
+        ],
+        filter_fields=[
+            'status', 'payment_method', 'payment_gateway', 'user', 'booking',
+            'completed_at', 'created_at',
+        ],
+    ),
+    'wallet_transactions': ExportDefinition(
+        'payments.WalletTransaction',
+        fields=[
+            'transaction_id', 'wallet__user__email', 'transaction_type',
+            'amount', 'balance_before', 'balance_after', 'description',
+            'reference_payment__payment_id', 'created_at',
+        ],
+        filter_fields=['transaction_type', 'wallet', 'created_at'],
+    ),
+    'reviews': ExportDefinition(
+        'reviews.Review',
+        fields=[
+            'booking__booking_number', 'customer__email', 'provider__business_name',
+            'rating', 'punctuality_rating', 'professionalism_rating',
+            'quality_rating', 'communication_rating', 'title', 'comment',
+            'is_verified', 'is_featured', 'is_approved', 'helpful_count',
+            'created_at',
+        ],
+        filter_fields=['provider', 'customer', 'rating', 'is_approved', 'created_at'],
+    ),
+    'services': ExportDefinition(
+        'services.Service',
+        fields=[
+            'title', 'slug', 'category__slug', 'provider__business_name',
+            'base_price', 'price_unit', 'minimum_charge', 'is_price_negotiable',
+            'estimated_duration_minutes', 'warranty_months', 'is_available',
+            'total_bookings', 'average_rating', 'created_at',
+        ],
+        filter_fields=['category', 'provider', 'price_unit', 'is_available', 'created_at'],
+    ),
+}
+
+
+def get_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def get_definition(name):
+    try:
+        return EXPORTS[name]
+    except KeyError:
+        raise NotFound(f"Unknown export: {name}")
+
+
+def column_label(model, path):
+    """Human readable header for a field path such as ``customer__email``."""
+    labels = []
+    for name in path.split('__'):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            labels.append(name.replace('_', ' '))
+            break
+        labels.append(str(field.verbose_name))
+        model = field.related_model
+    return ' '.join(labels)
+
+
+def _to_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    return value
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, fields, headers, chunk_size):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    buffer = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        buffer.append(writer.writerow([_to_text(value) for value in row]))
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_json(queryset, fields, headers, chunk_size):
+    encoder = DjangoJSONEncoder()
+    yield '['
+    separator = ''
+    buffer = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        buffer.append(separator + encoder.encode(dict(zip(fields, row))))
+        separator = ','
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    buffer.append(']')
+    yield ''.join(buffer)
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(str(_to_text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def write_xlsx(output, queryset, fields, headers, chunk_size):
+    """Write a single-sheet workbook, streaming rows into the zip entry."""
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_STATIC_PARTS.items():
+            workbook.writestr(name, content)
+        with workbook.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(('<row>' + ''.join(_xlsx_cell(h) for h in headers) + '</row>').encode('utf-8'))
+            buffer = []
+            for row in queryset.iterator(chunk_size=chunk_size):
+                buffer.append('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>')
+                if len(buffer) >= chunk_size:
+                    sheet.write(''.join(buffer).encode('utf-8'))
+                    buffer = []
+            if buffer:
+                sheet.write(''.join(buffer).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+STREAM_WRITERS = {
+    'csv': iter_csv,
+    'json': iter_json,
+}
+
+
+def export_response(name, format='json', fields=None, filters=None):
+    """Build the streaming (or temp-file backed) response for an export."""
+    definition = get_definition(name)
+    fields = definition.get_fields(fields)
+    queryset = definition.get_queryset(fields, filters)
+    headers = [column_label(definition.model, field) for field in fields]
+    chunk_size = get_chunk_size()
+    filename = f"{name}-{timezone.now():%Y%m%d-%H%M%S}.{format}"
+
+    if format == 'xlsx':
+        output = tempfile.TemporaryFile()
+        write_xlsx(output, queryset, fields, headers, chunk_size)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=CONTENT_TYPES[format])
+
+    response = StreamingHttpResponse(
+        STREAM_WRITERS[format](queryset, fields, headers, chunk_size),
+        content_type=CONTENT_TYPES[format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,165 @@
+"""
+Geographic helpers for "near me" searches.
+
+Rows that carry coordinates also store a geohash of them. A search first
+narrows candidates to the geohash cells covering the search box (indexed
+range scans on the geohash column) plus the latitude/longitude box, then
+keeps the rows within the exact haversine distance and sorts by it.
+The sort happens in Python over every candidate, so searches are bounded:
+radius searches by their maximum radius, box searches by
+GEO_SEARCH_MAX_BOX_DEGREES.
+"""
+import math
+
+from django.conf import settings
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_MILE = 1.609344
+KM_PER_DEGREE_LAT = 111.32
+
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Sorts after every geohash character, used as an exclusive prefix bound
+GEOHASH_UPPER_BOUND = '~'
+MAX_COVER_CELLS = 16
+
+
+def get_result_limit():
+    return getattr(settings, 'GEO_SEARCH_MAX_RESULTS', 100)
+
+
+def get_max_box_degrees():
+    return getattr(settings, 'GEO_SEARCH_MAX_BOX_DEGREES', 2)
+
+
+def km_to_miles(distance_km):
+    return distance_km / KM_PER_MILE
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    lat1, lng1, lat2, lng2 = map(math.radians, map(float, (lat1, lng1, lat2, lng2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle."""
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(latitude))
+    lng_delta = 180.0 if cos_lat < 1e-6 else min(180.0, radius_km / (KM_PER_DEGREE_LAT * cos_lat))
+    return (
+        max(-90.0, latitude - lat_delta),
+        min(90.0, latitude + lat_delta),
+        max(-180.0, longitude - lng_delta),
+        min(180.0, longitude + lng_delta),
+    )
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """(height, width) in degrees of a geohash cell."""
+    bits = precision * 5
+    return 180.0 / (1 << (bits // 2)), 360.0 / (1 << ((bits + 1) // 2))
+
+
+def geohash_cover(min_lat, max_lat, min_lng, max_lng, max_cells=MAX_COVER_CELLS):
+    """Geohash prefixes whose cells together cover the box."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        first_row, last_row = math.floor(min_lat / height), math.floor(max_lat / height)
+        first_col, last_col = math.floor(min_lng / width), math.floor(max_lng / width)
+        if (last_row - first_row + 1) * (last_col - first_col + 1) <= max_cells:
+            break
+
+    cells = set()
+    for row in range(first_row, last_row + 1):
+        lat = min(89.999999, max(-89.999999, (row + 0.5) * height))
+        for col in range(first_col, last_col + 1):
+            lng = ((col + 0.5) * width + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(lat, lng, precision))
+    return sorted(cells)
+
+
+def box_filter(box, prefix=''):
+    """Indexed prefilter for rows inside a (min_lat, max_lat, min_lng, max_lng) box."""
+    min_lat, max_lat, min_lng, max_lng = box
+    cells = Q()
+    for cell in geohash_cover(*box):
+        cells |= Q(**{
+            f'{prefix}geohash__gte': cell,
+            f'{prefix}geohash__lt': cell + GEOHASH_UPPER_BOUND,
+        })
+    return cells & Q(**{
+        f'{prefix}latitude__range': (min_lat, max_lat),
+        f'{prefix}longitude__range': (min_lng, max_lng),
+    })
+
+
+def _sorted_by_distance(candidates, latitude, longitude, location, radius_km=None):
+    results = []
+    for obj in candidates:
+        point = getattr(obj, location) if location else obj
+        distance = haversine_km(latitude, longitude, point.latitude, point.longitude)
+        if radius_km is None or distance <= radius_km:
+            obj.distance_km = distance
+            results.append(obj)
+    results.sort(key=lambda obj: obj.distance_km)
+    return results
+
+
+def within_radius(queryset, latitude, longitude, radius_km, location=None, limit=None):
+    """
+    Objects within radius_km of the point, nearest first.
+
+    ``location`` names the related object holding the coordinates (for
+    example ``'provider'`` for services); by default the rows themselves.
+    Each returned object gets a ``distance_km`` attribute.
+    """
+    prefix = f'{location}__' if location else ''
+    box = bounding_box(latitude, longitude, radius_km)
+    candidates = queryset.filter(box_filter(box, prefix))
+    results = _sorted_by_distance(candidates, latitude, longitude, location, radius_km)
+    return results[:limit or get_result_limit()]
+
+
+def within_box(queryset, box, latitude=None, longitude=None, location=None, limit=None):
+    """Objects inside the box, nearest to the point (default: box centre) first."""
+    prefix = f'{location}__' if location else ''
+    min_lat, max_lat, min_lng, max_lng = (float(value) for value in box)
+    if latitude is None or longitude is None:
+        latitude, longitude = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    candidates = queryset.filter(box_filter((min_lat, max_lat, min_lng, max_lng), prefix))
+    results = _sorted_by_distance(candidates, latitude, longitude, location)
+    return results[:limit or get_result_limit()]
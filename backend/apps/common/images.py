@@ -0,0 +1,178 @@
+"""
+Image derivatives.
+
+After an image is uploaded to one of IMAGE_FIELDS, resized WebP variants
+(IMAGE_VARIANTS: name -> longest side in pixels) are rendered with Pillow in
+a process pool and stored next to the original as ``<name>.<variant>.webp``.
+Their storage names are kept in a JSON column beside the image field
+(``<field>_variants``, with the original they were made from under
+``source``), which ImageVariantsField turns into URLs so list pages can
+load a thumbnail instead of the original.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FIELDS = {
+    'services.ServiceCategory': 'image',
+    'providers.ServiceProvider': 'business_logo',
+    'reviews.ReviewImage': 'image',
+    'users.User': 'profile_image',
+}
+SOURCE_KEY = 'source'
+
+_executor = None
+
+
+def get_variant_sizes():
+    return getattr(settings, 'IMAGE_VARIANTS', {'thumb': 160, 'medium': 640})
+
+
+def get_quality():
+    return getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+
+
+def variants_field(field):
+    return f'{field}_variants'
+
+
+def variant_name(name, variant):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.{variant}.webp'
+
+
+def variant_names(variants):
+    """The stored variant files of a ``<field>_variants`` value."""
+    return {variant: name for variant, name in (variants or {}).items() if variant != SOURCE_KEY}
+
+
+def render_variants(source, sizes, quality):
+    """
+    WebP bytes of each variant of an image, given its path or its bytes.
+    Runs in the worker processes, so it touches nothing but Pillow.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.mode in ('LA', 'P', 'PA') else 'RGB')
+        rendered = {}
+        for variant, size in sizes.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, 'WEBP', quality=quality, method=4)
+            rendered[variant] = buffer.getvalue()
+    return rendered
+
+
+def _read_source(field_file):
+    try:
+        return field_file.path
+    except NotImplementedError:
+        # Remote storage: hand the worker the bytes
+        with field_file.storage.open(field_file.name, 'rb') as source:
+            return source.read()
+
+
+def delete_variant_files(variants):
+    for name in variant_names(variants).values():
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.warning('Could not delete image variant %s', name, exc_info=True)
+
+
+def store_variants(model_label, pk, field, source_name, rendered):
+    """Save rendered variants and point the row at them, unless its image changed meanwhile."""
+    model = apps.get_model(model_label)
+    stored = {SOURCE_KEY: source_name}
+    for variant, content in rendered.items():
+        stored[variant] = default_storage.save(variant_name(source_name, variant), ContentFile(content))
+    previous = model.objects.filter(pk=pk).values_list(variants_field(field), flat=True).first()
+    # updated_at too, the variant URLs are part of the serialized object
+    updated = model.objects.filter(pk=pk, **{field: source_name}).update(
+        updated_at=timezone.now(), **{variants_field(field): stored}
+    )
+    if updated:
+        if previous and variant_names(previous) != variant_names(stored):
+            delete_variant_files(previous)
+    else:
+        delete_variant_files(stored)
+    return stored if updated else None
+
+
+def _store_result(model_label, pk, field, source_name, future):
+    try:
+        store_variants(model_label, pk, field, source_name, future.result())
+    except Exception:
+        logger.exception('Could not make image variants of %s %s', model_label, pk)
+    finally:
+        connections.close_all()
+
+
+def generate_variants(instance, field):
+    """Render and store the variants of an instance's image, in the background by default."""
+    model_label = instance._meta.label
+    field_file = getattr(instance, field)
+    source = _read_source(field_file)
+    sizes = get_variant_sizes()
+
+    if not getattr(settings, 'IMAGE_VARIANTS_IN_BACKGROUND', True):
+        rendered = render_variants(source, sizes, get_quality())
+        return store_variants(model_label, instance.pk, field, field_file.name, rendered)
+
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=getattr(settings, 'IMAGE_WORKERS', 2))
+    future = _executor.submit(render_variants, source, sizes, get_quality())
+    future.add_done_callback(partial(_store_result, model_label, instance.pk, field, field_file.name))
+    return None
+
+
+def refresh_variants(instance, field):
+    """
+    Bring an instance's variants in line with its image: drop stale ones
+    right away and schedule new ones.
+    """
+    field_file = getattr(instance, field)
+    # The row, not the instance: a save of a stale instance may have
+    # overwritten variants stored since it was loaded
+    rows = type(instance).objects.filter(pk=instance.pk)
+    variants = rows.values_list(variants_field(field), flat=True).first() or {}
+    if variants.get(SOURCE_KEY) == (field_file.name or None):
+        return
+    if variants:
+        rows.update(updated_at=timezone.now(), **{variants_field(field): {}})
+        setattr(instance, variants_field(field), {})
+        delete_variant_files(variants)
+    if field_file:
+        try:
+            generate_variants(instance, field)
+        except Exception:
+            logger.exception('Could not make image variants of %s %s', instance._meta.label, instance.pk)
+
+
+def rebuild(chunk_size=500):
+    """Generate the missing or stale variants of every image; returns the number scheduled."""
+    count = 0
+    for model_label, field in IMAGE_FIELDS.items():
+        model = apps.get_model(model_label)
+        queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        for instance in queryset.only('pk', field, variants_field(field)).iterator(chunk_size=chunk_size):
+            if (getattr(instance, variants_field(field)) or {}).get(SOURCE_KEY) != getattr(instance, field).name:
+                refresh_variants(instance, field)
+                count += 1
+    return count
@@ -0,0 +1,471 @@
+"""
+Batched CSV import.
+
+The upload is copied to IMPORT_UPLOAD_ROOT and read back as a stream of
+chunks. For each chunk the foreign keys are resolved with one query per
+column, the existing rows are matched with one query, every row is
+validated and the chunk is written with bulk_create/bulk_update inside its
+own transaction. Progress and per-row errors are kept on an ImportJob row,
+so clients can poll while a large file is processed from any web worker.
+Files are processed on a thread pool in the worker that received them,
+so imports are not durable: a job whose worker is restarted or recycled
+before finishing cannot be resumed and has to be started again. Such a
+job stops saving progress, and once it has not been updated for
+IMPORT_STALE_TIMEOUT seconds it is marked failed and its upload deleted
+the next time a job is read or started. The timeout has to be longer than
+one chunk takes to process. Uploads are kept on the local disk, so with
+several hosts IMPORT_UPLOAD_ROOT should be shared for abandoned uploads to
+be cleaned up from any of them.
+"""
+import csv
+import json
+import logging
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, connections, models, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework.exceptions import NotFound
+
+logger = logging.getLogger(__name__)
+
+TRUE_VALUES = {'1', 't', 'true', 'y', 'yes'}
+FALSE_VALUES = {'0', 'f', 'false', 'n', 'no'}
+
+_executor = None
+
+
+class ForeignKeyLookup:
+    """Resolve a CSV column to a foreign key through a natural key."""
+
+    def __init__(self, field, model, lookup):
+        self.field = field
+        self.model_label = model
+        self.lookup = lookup
+
+    def resolve(self, values):
+        """Map each value to a pk, or to None when it is ambiguous."""
+        model = apps.get_model(self.model_label)
+        resolved = {}
+        rows = model.objects.filter(**{f'{self.lookup}__in': values}).values_list(self.lookup, 'pk')
+        for value, pk in rows:
+            resolved[value] = None if value in resolved else pk
+        return resolved
+
+
+class ImportDefinition:
+    """Columns, foreign keys and natural key of one import type."""
+
+    def __init__(self, model, columns, foreign_keys, key, generated=(), prepare=None, after_write=None):
+        self.model_label = model
+        self.columns = list(columns)
+        self.foreign_keys = foreign_keys
+        self.key = tuple(key)
+        # Columns prepare() fills in when they are left empty
+        self.generated = set(generated)
+        self.prepare = prepare
+        self.after_write = after_write
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def all_columns(self):
+        return set(self.columns) | set(self.foreign_keys)
+
+    def required_columns(self):
+        model = self.model
+        required = set(self.foreign_keys)
+        for name in set(self.columns) - self.generated:
+            field = model._meta.get_field(name)
+            if not field.blank and not field.has_default():
+                required.add(name)
+        return required
+
+    def key_of(self, instance):
+        return tuple(getattr(instance, name) for name in self.key)
+
+    def existing(self, keys):
+        """Existing rows matching the chunk's natural keys, in one query."""
+        if not keys:
+            return {}
+        filters = {
+            f'{name}__in': {key[position] for key in keys}
+            for position, name in enumerate(self.key)
+        }
+        matches = {}
+        for instance in self.model.objects.filter(**filters):
+            key = self.key_of(instance)
+            if key in keys:
+                matches[key] = instance
+        return matches
+
+
+def _service_slug(instance, row):
+    if not instance.slug and instance.title:
+        provider = row.get('provider') or ''
+        instance.slug = slugify(f'{provider} {instance.title}')[:200]
+
+
+def _services_written(created, updated):
+    from apps.providers.rollups import apply_deltas
+    from apps.services.category_tree import bump_version
+    from apps.services.models import Service
+    from apps.services.search import index_services
+
+    ids = [service.pk for service in created + updated]
+    index_services(Service.objects.filter(pk__in=ids).select_related('provider'))
+    if created:
+        bump_version()
+        # bulk_create sends no post_save, so count the new services here
+        for provider_id, count in Counter(service.provider_id for service in created).items():
+            apply_deltas(provider_id, {'total_services': count})
+
+
+def _availabilities_written(created, updated):
+    from apps.providers.bitmaps import sync
+
+    # bulk_create/bulk_update send no post_save, so refresh the bitmaps here
+    dates = defaultdict(set)
+    for availability in created + updated:
+        dates[availability.provider_id].add(availability.date)
+    for provider_id, provider_dates in dates.items():
+        sync(provider_id, provider_dates)
+
+
+IMPORTS = {
+    'services': ImportDefinition(
+        'services.Service',
+        columns=[
+            'title', 'slug', 'description', 'detailed_description', 'base_price',
+            'price_unit', 'minimum_charge', 'is_price_negotiable',
+            'estimated_duration_minutes', 'warranty_months', 'requirements',
+            'tools_needed', 'is_available', 'available_from', 'available_to',
+        ],
+        foreign_keys={
+            'category': ForeignKeyLookup('category', 'services.ServiceCategory', 'slug'),
+            'provider': ForeignKeyLookup('provider', 'providers.ServiceProvider', 'business_name'),
+        },
+        key=['slug'],
+        generated=['slug'],
+        prepare=_service_slug,
+        after_write=_services_written,
+    ),
+    'service_packages': ImportDefinition(
+        'services.ServicePackage',
+        columns=[
+            'name', 'description', 'price', 'discount_percentage',
+            'included_items', 'validity_days',
+        ],
+        foreign_keys={
+            'service': ForeignKeyLookup('service', 'services.Service', 'slug'),
+        },
+        key=['service_id', 'name'],
+    ),
+    'provider_availability': ImportDefinition(
+        'providers.ProviderAvailability',
+        columns=['date', 'start_time', 'end_time', 'is_available', 'notes'],
+        foreign_keys={
+            'provider': ForeignKeyLookup('provider', 'providers.ServiceProvider', 'business_name'),
+        },
+        key=['provider_id', 'date', 'start_time'],
+        after_write=_availabilities_written,
+    ),
+}
+
+
+def get_definition(name):
+    try:
+        return IMPORTS[name]
+    except KeyError:
+        raise NotFound(f"Unknown import: {name}")
+
+
+def get_chunk_size():
+    return getattr(settings, 'IMPORT_CHUNK_SIZE', 500)
+
+
+def get_max_errors():
+    return getattr(settings, 'IMPORT_MAX_ERRORS', 1000)
+
+
+# Jobs
+
+def get_job_timeout():
+    return getattr(settings, 'IMPORT_JOB_TIMEOUT', 86400)
+
+
+def get_stale_timeout():
+    return getattr(settings, 'IMPORT_STALE_TIMEOUT', 600)
+
+
+def get_upload_root():
+    return Path(getattr(settings, 'IMPORT_UPLOAD_ROOT', Path(settings.BASE_DIR) / 'import_uploads'))
+
+
+def upload_path(job):
+    return get_upload_root() / f'{job.pk}.csv'
+
+
+def _remove_upload(job):
+    upload_path(job).unlink(missing_ok=True)
+
+
+def fail_stale_jobs():
+    """Mark unfinished jobs that stopped saving progress as failed."""
+    ImportJob = apps.get_model('common', 'ImportJob')
+    now = timezone.now()
+    stale = ImportJob.objects.filter(
+        status__in=['pending', 'running'],
+        updated_at__lt=now - timezone.timedelta(seconds=get_stale_timeout()),
+    )
+    for job in stale:
+        job.status = 'failed'
+        job.finished_at = now
+        job.errors.append({'row': job.processed, 'errors': {
+            '__all__': ['The import stopped before finishing; start it again.'],
+        }})
+        save_job(job)
+        _remove_upload(job)
+
+
+def new_job(name, overwrite):
+    """Create a job, deleting those finished more than IMPORT_JOB_TIMEOUT seconds ago."""
+    ImportJob = apps.get_model('common', 'ImportJob')
+    fail_stale_jobs()
+    ImportJob.objects.filter(
+        finished_at__lt=timezone.now() - timezone.timedelta(seconds=get_job_timeout())
+    ).delete()
+    return ImportJob.objects.create(name=name, overwrite=overwrite)
+
+
+def save_job(job):
+    job.save(update_fields=[
+        'status', 'processed', 'created', 'updated', 'failed', 'errors',
+        'errors_truncated', 'started_at', 'finished_at', 'updated_at',
+    ])
+
+
+def get_job(job_id):
+    ImportJob = apps.get_model('common', 'ImportJob')
+    fail_stale_jobs()
+    try:
+        return ImportJob.objects.get(pk=job_id)
+    except ImportJob.DoesNotExist:
+        raise NotFound('Import job not found')
+
+
+def _add_error(job, row, errors):
+    job.failed += 1
+    if len(job.errors) < get_max_errors():
+        job.errors.append({'row': row, 'errors': errors})
+    else:
+        job.errors_truncated = True
+
+
+# Parsing and validation
+
+def _clean_value(field, value):
+    value = value.strip()
+    if isinstance(field, models.BooleanField):
+        lowered = value.lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+    elif isinstance(field, models.JSONField):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return [item.strip() for item in value.split('|') if item.strip()]
+    return value
+
+
+def _iter_chunks(reader, chunk_size):
+    chunk = []
+    for number, row in enumerate(reader, start=1):
+        chunk.append((number, row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _build_instances(definition, chunk, overwrite, job):
+    """Validate a chunk; return (instances to create, to update, fields updated)."""
+    model = definition.model
+
+    resolved = {}
+    for column, lookup in definition.foreign_keys.items():
+        values = {(row.get(column) or '').strip() for _, row in chunk} - {''}
+        resolved[column] = lookup.resolve(values) if values else {}
+
+    candidates = []
+    for number, row in chunk:
+        errors = {}
+        values = {}
+        for column, lookup in definition.foreign_keys.items():
+            value = (row.get(column) or '').strip()
+            if not value:
+                errors[column] = ['This field is required.']
+            elif value not in resolved[column]:
+                errors[column] = [f'No {column} matches "{value}".']
+            elif resolved[column][value] is None:
+                errors[column] = [f'More than one {column} matches "{value}".']
+            else:
+                values[f'{lookup.field}_id'] = resolved[column][value]
+        for column in definition.columns:
+            value = row.get(column)
+            if value is not None and value.strip() != '':
+                values[column] = _clean_value(model._meta.get_field(column), value)
+        instance = model(**values)
+        if definition.prepare:
+            definition.prepare(instance, row)
+        candidates.append((number, instance, values, errors))
+    existing = definition.existing({definition.key_of(instance) for _, instance, _, _ in candidates})
+
+    exclude = [lookup.field for lookup in definition.foreign_keys.values()]
+    to_create, to_update, update_fields, seen = [], [], set(), set()
+    for number, instance, values, errors in candidates:
+        key = definition.key_of(instance)
+        current = existing.get(key)
+        if current is not None:
+            if not overwrite:
+                errors.setdefault('__all__', []).append('A matching record already exists.')
+            for name, value in values.items():
+                setattr(current, name, value)
+            instance = current
+        if key in seen:
+            errors.setdefault('__all__', []).append('Duplicate of an earlier row in this file.')
+
+        try:
+            instance.clean_fields(exclude=exclude)
+            instance.clean()
+        except DjangoValidationError as exc:
+            for field, messages in exc.message_dict.items():
+                errors.setdefault(field, []).extend(messages)
+
+        if errors:
+            _add_error(job, number, errors)
+            continue
+        seen.add(key)
+        if current is not None:
+            to_update.append((number, instance))
+            update_fields.update(values)
+        else:
+            to_create.append((number, instance))
+    return to_create, to_update, update_fields
+
+
+def _write_chunk(definition, chunk, overwrite, job):
+    to_create, to_update, update_fields = _build_instances(definition, chunk, overwrite, job)
+    if not to_create and not to_update:
+        return
+    created = [instance for _, instance in to_create]
+    updated = [instance for _, instance in to_update]
+    model = definition.model
+    try:
+        with transaction.atomic():
+            if created:
+                model.objects.bulk_create(created)
+            if updated:
+                now = timezone.now()
+                for instance in updated:
+                    instance.updated_at = now
+                model.objects.bulk_update(updated, sorted(update_fields | {'updated_at'}))
+    except DatabaseError as exc:
+        for number, _ in to_create + to_update:
+            _add_error(job, number, {'__all__': [f'Chunk could not be saved: {exc}']})
+        return
+    job.created += len(created)
+    job.updated += len(updated)
+    if definition.after_write:
+        definition.after_write(created, updated)
+
+
+def run_import(job):
+    """Process the job's uploaded CSV file, updating the job after every chunk."""
+    ImportJob = apps.get_model('common', 'ImportJob')
+    definition = get_definition(job.name)
+    job.status = 'running'
+    job.started_at = timezone.now()
+    # A job queued for longer than IMPORT_STALE_TIMEOUT was failed meanwhile
+    if not ImportJob.objects.filter(pk=job.pk, status='pending').update(
+        status=job.status, started_at=job.started_at, updated_at=job.started_at
+    ):
+        job.refresh_from_db()
+        return job
+    try:
+        with open(upload_path(job), newline='', encoding='utf-8-sig') as csv_file:
+            reader = csv.DictReader(csv_file)
+            header = set(reader.fieldnames or [])
+            missing = definition.required_columns() - header
+            unknown = header - definition.all_columns
+            if missing or unknown:
+                job.status = 'failed'
+                job.errors.append({'row': 0, 'errors': {
+                    'missing_columns': sorted(missing),
+                    'unknown_columns': sorted(unknown),
+                }})
+                return job
+            for chunk in _iter_chunks(reader, get_chunk_size()):
+                _write_chunk(definition, chunk, job.overwrite, job)
+                job.processed += len(chunk)
+                save_job(job)
+        job.status = 'completed'
+    except (UnicodeDecodeError, csv.Error) as exc:
+        job.status = 'failed'
+        job.errors.append({'row': job.processed, 'errors': {'file': [f'Unreadable CSV: {exc}']}})
+    except Exception:
+        logger.exception('Import %s failed', job.pk)
+        job.status = 'failed'
+        raise
+    finally:
+        job.finished_at = timezone.now()
+        save_job(job)
+    return job
+
+
+def _run_in_background(job):
+    try:
+        run_import(job)
+    except Exception:
+        # Already logged and recorded on the job
+        pass
+    finally:
+        _remove_upload(job)
+        connections.close_all()
+
+
+def start_import(name, upload, overwrite=False):
+    """Copy the upload to disk and process it, in the background by default."""
+    get_definition(name)
+    job = new_job(name, overwrite)
+
+    path = upload_path(job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as destination:
+        for chunk in upload.chunks():
+            destination.write(chunk)
+
+    if not getattr(settings, 'IMPORT_RUN_IN_BACKGROUND', True):
+        try:
+            return run_import(job)
+        finally:
+            _remove_upload(job)
+
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMPORT_WORKERS', 2),
+            thread_name_prefix='csv-import',
+        )
+    _executor.submit(_run_in_background, job)
+    return job
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.common.storage import collect_garbage, recount
+
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed blobs no record references any more'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--recount', action='store_true', help='Recompute reference counts first')
+    
+    def handle(self, *args, **options):
+        if options['recount']:
+            recount(chunk_size=options['batch_size'])
+        count = collect_garbage(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} unreferenced blobs.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.common.uploads import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired upload sessions and their chunks'
+    
+    def handle(self, *args, **options):
+        count = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} upload sessions.'))
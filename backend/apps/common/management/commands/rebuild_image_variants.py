@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.common.images import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Generate missing or stale WebP variants of uploaded images'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        count = rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Scheduled variants of {count} images.'))
@@ -0,0 +1,303 @@
+"""
+Query planning for generic views.
+
+The planner walks a serializer's field tree once per serializer class and
+works out which relations it reads (dotted sources such as
+``category.name`` and nested serializers) and which columns it needs. The
+resulting plan applies ``select_related``/``prefetch_related``/``only`` to a
+queryset so list pages run a fixed number of queries. Plans for serializers
+with dynamic fields are built per field selection, so ``?fields=`` and
+``?expand=`` also cut down the joins, prefetches and columns.
+
+ConditionalGetMixin answers conditional GETs of detail views from a
+version query, before any of that runs.
+"""
+import hashlib
+import re
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import permissions
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from .serializers import DynamicFieldsMixin, get_field_selection
+
+DISPLAY_METHOD_RE = re.compile(r'^get_(?P<field>\w+)_display$')
+MAX_DEPTH = 5
+
+
+class QueryPlan:
+    """Relations to join/prefetch and columns to load for a serializer."""
+
+    def __init__(self, select_related=(), prefetch_related=(), only=None):
+        self.select_related = tuple(sorted(select_related))
+        self.prefetch_related = tuple(sorted(prefetch_related))
+        self.only = tuple(sorted(only)) if only else None
+
+    def __repr__(self):
+        return (
+            f'QueryPlan(select_related={self.select_related!r}, '
+            f'prefetch_related={self.prefetch_related!r}, only={self.only!r})'
+        )
+
+    def apply(self, queryset, restrict_columns=True):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if restrict_columns and self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+class _Level:
+    """Columns read from one model reached through select_related."""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = set()
+        # A level is closed while every column it needs is known; sources
+        # such as properties or methods may read anything, which opens it.
+        self.closed = True
+
+
+class QueryPlanner:
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.select_related = set()
+        self.prefetch_related = set()
+        self.levels = {}
+
+    def build(self):
+        model = self.serializer.Meta.model
+        self._walk(self.serializer, model, prefix=(), prefetched=False, depth=0)
+        return QueryPlan(self.select_related, self.prefetch_related, self._only())
+
+    def _level(self, path, model, prefetched):
+        if prefetched:
+            return None
+        return self.levels.setdefault(path, _Level(model))
+
+    def _walk(self, serializer, model, prefix, prefetched, depth):
+        if depth > MAX_DEPTH:
+            return
+        level = self._level(prefix, model, prefetched)
+
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            nested = field.child if isinstance(field, ListSerializer) else field
+            is_serializer = isinstance(nested, BaseSerializer)
+
+            if field.source == '*':
+                if is_serializer:
+                    self._walk(nested, model, prefix, prefetched, depth + 1)
+                elif level is not None:
+                    level.closed = False
+                continue
+
+            target = self._follow(field, model, prefix, prefetched, level, is_serializer)
+            if target is not None and is_serializer:
+                self._walk(nested, *target, depth=depth + 1)
+
+    def _follow(self, field, model, prefix, prefetched, level, is_serializer):
+        """Walk a dotted source; return (model, prefix, prefetched) it lands on."""
+        attrs = field.source_attrs
+        for position, attr in enumerate(attrs):
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                self._non_field_source(model, attr, level)
+                return None
+
+            if not model_field.is_relation:
+                if level is not None:
+                    level.fields.add(attr)
+                return None
+
+            is_last = position == len(attrs) - 1
+            many = model_field.many_to_many or model_field.one_to_many
+            path = prefix + (attr,)
+            lookup = '__'.join(path)
+
+            if is_last and not is_serializer:
+                # Primary key representation: the FK column is enough
+                if many:
+                    self.prefetch_related.add(lookup)
+                elif level is not None and model_field.concrete:
+                    level.fields.add(attr)
+                elif level is not None:
+                    level.closed = False
+                return None
+
+            if many or prefetched:
+                self.prefetch_related.add(lookup)
+                prefetched = True
+            else:
+                self.select_related.add(lookup)
+                if model_field.concrete:
+                    level.fields.add(attr)
+                else:
+                    level.closed = False
+
+            model = model_field.related_model
+            prefix = path
+            level = self._level(prefix, model, prefetched)
+        return model, prefix, prefetched
+
+    def _non_field_source(self, model, attr, level):
+        if level is None:
+            return
+        match = DISPLAY_METHOD_RE.match(attr)
+        if match:
+            try:
+                model._meta.get_field(match.group('field'))
+            except FieldDoesNotExist:
+                pass
+            else:
+                level.fields.add(match.group('field'))
+                return
+        if hasattr(model, attr):
+            # Property or method: it may read any column
+            level.closed = False
+
+    def _only(self):
+        root = self.levels.get(())
+        if root is None or not root.closed:
+            return None
+        only = set()
+        for path, level in self.levels.items():
+            # A restricted child would also restrict any open ancestor
+            ancestors = [self.levels.get(path[:i]) for i in range(len(path) + 1)]
+            if not all(ancestor is not None and ancestor.closed for ancestor in ancestors):
+                continue
+            prefix = '__'.join(path + ('',)) if path else ''
+            only.update(f'{prefix}{name}' for name in level.fields)
+        return only
+
+
+@lru_cache(maxsize=512)
+def _build_query_plan(serializer_class, selection):
+    context = {'field_selection': selection} if selection is not None else {}
+    return QueryPlanner(serializer_class(context=context)).build()
+
+
+def get_query_plan(serializer_class, selection=None):
+    """Build (once per serializer class and field selection) the query plan."""
+    if not issubclass(serializer_class, DynamicFieldsMixin):
+        selection = None
+    return _build_query_plan(serializer_class, selection)
+
+
+def optimize_queryset(queryset, serializer_class, restrict_columns=True, selection=None):
+    """Apply the serializer's query plan to a queryset."""
+    return get_query_plan(serializer_class, selection).apply(queryset, restrict_columns)
+
+
+class QueryOptimizationMixin:
+    """
+    Generic view mixin that applies the serializer's query plan.
+
+    The plan is applied in filter_queryset() so it also covers views that
+    override get_queryset(). Column restriction with only() is limited to
+    safe methods; set ``restrict_columns = False`` on views that read
+    columns outside the serializer.
+    """
+    restrict_columns = True
+
+    def is_list_request(self):
+        return (self.lookup_url_kwarg or self.lookup_field) not in self.kwargs
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimize_queryset(
+            queryset,
+            self.get_serializer_class(),
+            restrict_columns=self.restrict_columns and self.request.method in permissions.SAFE_METHODS,
+            selection=get_field_selection(self.request, many=self.is_list_request()),
+        )
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified for retrieve views.
+    
+    An object's version is its ``updated_at`` plus, for each relation in
+    ``conditional_related``, the latest ``updated_at`` and the number of
+    related rows (so deleting one changes the version too). The version is
+    read with a single query and a matching If-None-Match or
+    If-Modified-Since is answered with 304 before the full object is
+    loaded and serialized. If-Modified-Since cannot see deleted related
+    rows; clients should prefer the ETag.
+    """
+    conditional_related = ()
+    
+    def _relation_subqueries(self, model, name):
+        field = model._meta.get_field(name)
+        related_model = field.related_model
+        if field.auto_created and not field.concrete:
+            back = field.field.name
+        else:
+            back = field.related_query_name()
+        related = related_model._default_manager.filter(**{back: OuterRef('pk')}).order_by()
+        annotations = {
+            f'_version_{name}_count': Coalesce(
+                Subquery(related.values(back).annotate(count=Count('pk')).values('count')),
+                Value(0),
+                output_field=IntegerField(),
+            ),
+        }
+        try:
+            related_model._meta.get_field('updated_at')
+        except FieldDoesNotExist:
+            return annotations
+        annotations[f'_version_{name}_updated'] = Subquery(
+            related.order_by('-updated_at').values('updated_at')[:1]
+        )
+        return annotations
+    
+    def get_version_object(self):
+        """The bare object annotated with its version, or None when it is not visible."""
+        queryset = self.get_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        annotations = {}
+        for name in self.conditional_related:
+            annotations.update(self._relation_subqueries(queryset.model, name))
+        queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset.select_related(None).prefetch_related(None).annotate(**annotations).first()
+    
+    def get_validators(self, obj):
+        """(etag, last_modified timestamp) of a version object."""
+        timestamps = [obj.updated_at]
+        parts = [str(obj.pk), obj.updated_at.isoformat()]
+        for name in self.conditional_related:
+            updated = getattr(obj, f'_version_{name}_updated', None)
+            if updated is not None:
+                timestamps.append(updated)
+            parts.append(f'{name}:{getattr(obj, f"_version_{name}_count")}:{updated.isoformat() if updated else ""}')
+        # The representation also depends on ?fields=/?expand= and the format
+        parts.append(self.request.query_params.urlencode())
+        parts.append(getattr(self.request, 'accepted_media_type', '') or '')
+        etag = 'W/' + quote_etag(hashlib.sha1('|'.join(parts).encode()).hexdigest())
+        return etag, int(max(timestamps).timestamp())
+    
+    def retrieve(self, request, *args, **kwargs):
+        obj = self.get_version_object()
+        if obj is None:
+            return super().retrieve(request, *args, **kwargs)
+        self.check_object_permissions(request, obj)
+        etag, last_modified = self.get_validators(obj)
+        not_modified = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            not_modified['Last-Modified'] = http_date(last_modified)
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -0,0 +1,198 @@
+import base64
+import binascii
+import datetime
+import json
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on (ordering fields..., id).
+
+    Unlike PageNumberPagination there is no COUNT(*) and no OFFSET: each page
+    is a range scan that starts right after the last row of the previous
+    page. Views declare the orderings that can be used this way:
+
+        keyset_orderings = {'created_at': ('created_at',)}
+        keyset_default_ordering = '-created_at'
+
+    and clients pick one per request with ``?ordering=<name>`` or
+    ``?ordering=-<name>``; any other ordering is rejected rather than
+    silently replaced. The primary key is always appended as the final
+    tie-breaker so pages are stable when values repeat. Keyset paging is
+    opt-in: clients pass ``?cursor=`` (empty for the first page), and
+    requests without it get page number pagination with its ``count``.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering_param = api_settings.ORDERING_PARAM
+    page_query_param = 'page'
+    # Querysets annotated with a search rank keep their rank order
+    rank_annotation = 'search_rank'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_number_pagination = None
+        if self.cursor_query_param not in request.query_params:
+            self.page_number_pagination = PageNumberPagination()
+            return self.page_number_pagination.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.ordering_key = ','.join(self.ordering)
+
+        values, reverse = self.decode_cursor(request)
+        order_by = [self._flip(term) if reverse else term for term in self.ordering]
+        queryset = queryset.order_by(*order_by)
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(queryset.model, order_by, values))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = values is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        if self.page_number_pagination is not None:
+            return self.page_number_pagination.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """Resolve the requested ordering into field terms ending with the pk."""
+        orderings = getattr(view, 'keyset_orderings', {'created_at': ('created_at',)})
+        requested = request.query_params.get(self.ordering_param, '').split(',')[0].strip()
+        name = requested.lstrip('-')
+
+        if name in orderings:
+            descending = requested.startswith('-')
+            fields = orderings[name]
+        elif name:
+            raise ValidationError({self.ordering_param: [
+                f'Cursor pagination cannot order by "{name}"; use one of: {", ".join(sorted(orderings))}.'
+            ]})
+        elif self.rank_annotation in queryset.query.annotations:
+            descending = False
+            fields = (self.rank_annotation,)
+        else:
+            default = getattr(view, 'keyset_default_ordering', '-created_at')
+            descending = default.startswith('-')
+            fields = orderings[default.lstrip('-')]
+
+        prefix = '-' if descending else ''
+        return [f'{prefix}{field}' for field in fields] + [f'{prefix}pk']
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        values = [
+            self._to_json(getattr(instance, term.lstrip('-')))
+            for term in self.ordering
+        ]
+        payload = json.dumps({'o': self.ordering_key, 'v': values, 'r': reverse})
+        cursor = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        url = remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if payload['o'] != self.ordering_key or len(payload['v']) != len(self.ordering):
+                raise ValueError('Cursor does not match the requested ordering')
+            return payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound('Invalid cursor')
+
+    def _seek_filter(self, model, order_by, raw_values):
+        """Rows strictly after the cursor position in the given ordering."""
+        terms = [(term.lstrip('-'), term.startswith('-')) for term in order_by]
+        values = [self._from_json(model, name, value) for (name, _), value in zip(terms, raw_values)]
+
+        # (a, b, pk) > (x, y, z)  <=>  a > x OR (a = x AND b > y) OR ...
+        condition = Q()
+        for index, (name, descending) in enumerate(terms):
+            lookup = 'lt' if descending else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for (previous_name, _), previous_value in zip(terms[:index], values):
+                step &= Q(**{previous_name: previous_value})
+            condition |= step
+        return condition
+
+    @staticmethod
+    def _flip(term):
+        return term[1:] if term.startswith('-') else f'-{term}'
+
+    @staticmethod
+    def _to_json(value):
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (Decimal, uuid.UUID)):
+            return str(value)
+        return value
+
+    @staticmethod
+    def _from_json(model, name, value):
+        if name == 'pk':
+            name = model._meta.pk.name
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        try:
+            return field.to_python(value)
+        except DjangoValidationError:
+            raise NotFound('Invalid cursor')
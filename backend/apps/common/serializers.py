@@ -1,5 +1,97 @@
-from rest_framework import serializers
-from .models import BaseModel, TimeStampedModel, UUIDModel, Address
+from collections import namedtuple
+
+from rest_framework import permissions, serializers
+from .geo import get_max_box_degrees
+from .models import BaseModel, TimeStampedModel, UUIDModel, Address, UploadSession, ImportJob
+
+# Fields requested with ?fields= (None means all), expanded with ?expand=,
+# and whether the root serializer renders a list
+FieldSelection = namedtuple('FieldSelection', ['fields', 'expand', 'many'])
+
+
+def parse_field_list(value):
+    return tuple(sorted({name.strip() for name in (value or '').split(',') if name.strip()}))
+
+
+def get_field_selection(request, many=False):
+    """Read ?fields= and ?expand= from a request (safe methods only)."""
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return FieldSelection(None, (), many)
+    fields = parse_field_list(request.query_params.get('fields'))
+    return FieldSelection(fields or None, parse_field_list(request.query_params.get('expand')), many)
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and a compact list representation.
+    
+    ``?fields=id,status`` limits the top-level fields, ``?expand=a,b`` adds
+    fields from ``Meta.expandable_fields``. Expandable fields (heavy nested
+    objects) are left out when the serializer renders a list unless they
+    are expanded; nested serializers inside a list are compact as well. The
+    selection can also be passed as ``context['field_selection']``.
+    """
+    _many = False
+    
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_serializer = super().many_init(*args, **kwargs)
+        list_serializer.child._many = True
+        return list_serializer
+    
+    def _is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+    
+    def _root_selection(self):
+        selection = self.context.get('field_selection')
+        if selection is None:
+            many = isinstance(self.root, serializers.ListSerializer)
+            selection = get_field_selection(self.context.get('request'), many)
+        return selection
+    
+    def get_field_selection(self):
+        selection = self._root_selection()
+        if self._is_root():
+            return selection
+        return FieldSelection(None, (), self._many or selection.many)
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.get_field_selection()
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        if selection.fields is not None:
+            keep = set(selection.fields) | (set(selection.expand) & expandable)
+        elif selection.many:
+            keep = set(fields) - (expandable - set(selection.expand))
+        else:
+            return fields
+        return {name: field for name, field in fields.items() if name in keep}
+
+
+class DynamicFieldsModelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """ModelSerializer with ?fields= / ?expand= support."""
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    URLs of an image's WebP variants, from its ``<field>_variants`` column
+    (see images.py). Empty until the variants have been generated.
+    """
+    
+    def to_representation(self, value):
+        from django.core.files.storage import default_storage
+        from .images import variant_names
+        
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in variant_names(value).items():
+            url = default_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
 
 class BaseModelSerializer(serializers.ModelSerializer):
     """Base serializer for models inheriting from BaseModel."""
@@ -215,6 +307,67 @@ class CSVImportSerializer(serializers.Serializer):
     overwrite = serializers.BooleanField(default=False, help_text="Overwrite existing records")
 
 
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of a CSV import."""
+    
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'name', 'overwrite', 'status', 'processed', 'created', 'updated',
+                  'failed', 'errors', 'errors_truncated', 'started_at', 'finished_at']
+        read_only_fields = fields
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        # Named "import" in the API, which is not a valid attribute name
+        fields['import'] = serializers.CharField(source='name', read_only=True)
+        del fields['name']
+        return fields
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Serializer for opening a chunked upload."""
+    target = serializers.ChoiceField(choices=['provider_document', 'booking_attachment', 'review_image'])
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=100, required=False, default='')
+    checksum = serializers.RegexField(
+        r'^[0-9a-fA-F]{64}$',
+        required=False,
+        default='',
+        help_text="SHA-256 of the whole file"
+    )
+    metadata = serializers.DictField(
+        required=False,
+        default=dict,
+        help_text="Fields of the record the file is attached to"
+    )
+    
+    def validate_size(self, value):
+        from .uploads import get_max_size
+        
+        if value > get_max_size():
+            raise serializers.ValidationError(f"Files may be at most {get_max_size()} bytes.")
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for the state of a chunked upload."""
+    total_chunks = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'target', 'filename', 'content_type', 'size', 'chunk_size',
+                  'total_chunks', 'received_chunks', 'checksum', 'metadata', 'status',
+                  'object_id', 'expires_at', 'created_at']
+        read_only_fields = fields
+    
+    def get_received_chunks(self, obj):
+        from .uploads import received_chunks
+        
+        return received_chunks(obj) if obj.status == 'uploading' else []
+
+
 class ExportSerializer(serializers.Serializer):
     """Serializer for data export."""
     format = serializers.ChoiceField(
@@ -265,6 +418,19 @@ class BoundingBoxSerializer(serializers.Serializer):
     max_lat = serializers.DecimalField(max_digits=9, decimal_places=6)
     min_lng = serializers.DecimalField(max_digits=9, decimal_places=6)
     max_lng = serializers.DecimalField(max_digits=9, decimal_places=6)
+    
+    def validate(self, attrs):
+        # Every row in the box is loaded to be sorted by distance
+        max_degrees = get_max_box_degrees()
+        for axis in ['lat', 'lng']:
+            span = attrs[f'max_{axis}'] - attrs[f'min_{axis}']
+            if span < 0:
+                raise serializers.ValidationError({f'max_{axis}': f'Must not be less than min_{axis}.'})
+            if span > max_degrees:
+                raise serializers.ValidationError(
+                    {f'max_{axis}': f'The box may span at most {max_degrees} degrees.'}
+                )
+        return attrs
 
 
 class SearchRadiusSerializer(serializers.Serializer):
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import images, storage
+
+
+def refresh_image_variants(sender, instance, update_fields=None, **kwargs):
+    field = images.IMAGE_FIELDS[sender._meta.label]
+    if update_fields is not None and field not in update_fields:
+        return
+    # Render from the committed row, after the file is in storage
+    transaction.on_commit(lambda: images.refresh_variants(instance, field))
+
+
+def delete_image_variants(sender, instance, **kwargs):
+    field = images.IMAGE_FIELDS[sender._meta.label]
+    images.delete_variant_files(getattr(instance, images.variants_field(field)))
+
+
+def release_replaced_blob(sender, instance, update_fields=None, **kwargs):
+    field = storage.BLOB_FIELDS[sender._meta.label]
+    if instance._state.adding or (update_fields is not None and field not in update_fields):
+        return
+    old_name = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+    if storage.is_blob(old_name) and old_name != getattr(instance, field).name:
+        transaction.on_commit(lambda: storage.release(old_name))
+
+
+def release_deleted_blob(sender, instance, **kwargs):
+    name = getattr(instance, storage.BLOB_FIELDS[sender._meta.label]).name
+    if storage.is_blob(name):
+        transaction.on_commit(lambda: storage.release(name))
+
+
+for model_label in images.IMAGE_FIELDS:
+    post_save.connect(refresh_image_variants, sender=model_label, dispatch_uid=f'image-variants-{model_label}')
+    post_delete.connect(delete_image_variants, sender=model_label, dispatch_uid=f'image-variants-{model_label}')
+
+for model_label in storage.BLOB_FIELDS:
+    pre_save.connect(release_replaced_blob, sender=model_label, dispatch_uid=f'blob-refs-{model_label}')
+    post_delete.connect(release_deleted_blob, sender=model_label, dispatch_uid=f'blob-refs-{model_label}')
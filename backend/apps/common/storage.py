@@ -0,0 +1,145 @@
+"""
+Content-addressed media storage.
+
+Files saved through ContentAddressedStorage are stored once per content:
+the name is derived from the SHA-256 of the bytes (``blobs/ab/<digest>.ext``
+under MEDIA_ROOT) and a StoredBlob row counts the records pointing at it.
+Uploading a file that is already stored costs hashing it and bumping the
+count. Deleting or replacing a record releases its reference (see
+signals.py); blobs nobody references are removed in batches by
+collect_garbage(), after a grace period so a release racing an upload of
+the same content does not lose the file.
+"""
+import hashlib
+import os
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'blobs/'
+
+# Fields stored through get_blob_storage(); their references are released
+# when a record is deleted or its file replaced
+BLOB_FIELDS = {
+    'providers.ProviderDocument': 'document_file',
+    'bookings.BookingAttachment': 'file',
+    'reviews.ReviewImage': 'image',
+}
+
+
+def get_gc_grace_seconds():
+    return getattr(settings, 'BLOB_GC_GRACE_SECONDS', 3600)
+
+
+def content_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_name(digest, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{BLOB_PREFIX}{digest[:2]}/{digest}{extension}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that deduplicates files by content."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        StoredBlob = apps.get_model('common', 'StoredBlob')
+        name = blob_name(content_digest(content), name)
+        with transaction.atomic():
+            blob, _ = StoredBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={'size': content.size}
+            )
+            if not super().exists(name):
+                # New content, or a blob collected while this upload was hashing
+                super()._save(name, content)
+            StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1, updated_at=timezone.now())
+        return name
+
+    def delete(self, name):
+        if is_blob(name):
+            release(name)
+        else:
+            super().delete(name)
+
+    def _delete_blob(self, name):
+        super().delete(name)
+
+
+def get_blob_storage():
+    return blob_storage
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def release(name):
+    """Drop one reference to a blob; the file stays until collect_garbage()."""
+    if not is_blob(name):
+        return
+    StoredBlob = apps.get_model('common', 'StoredBlob')
+    StoredBlob.objects.filter(name=name).update(
+        ref_count=Greatest(F('ref_count') - 1, 0), updated_at=timezone.now()
+    )
+
+
+def collect_garbage(batch_size=500, grace_seconds=None):
+    """Delete unreferenced blobs and their files in batches; returns the number deleted."""
+    StoredBlob = apps.get_model('common', 'StoredBlob')
+    if grace_seconds is None:
+        grace_seconds = get_gc_grace_seconds()
+    cutoff = timezone.now() - timezone.timedelta(seconds=grace_seconds)
+    count = 0
+    while True:
+        with transaction.atomic():
+            blobs = list(
+                StoredBlob.objects.select_for_update(skip_locked=True)
+                .filter(ref_count=0, updated_at__lte=cutoff)
+                .order_by('updated_at')[:batch_size]
+            )
+            if not blobs:
+                return count
+            for blob in blobs:
+                blob_storage._delete_blob(blob.name)
+            StoredBlob.objects.filter(pk__in=[blob.pk for blob in blobs]).delete()
+        count += len(blobs)
+        if len(blobs) < batch_size:
+            return count
+
+
+def recount(chunk_size=500):
+    """Recompute every blob's reference count from BLOB_FIELDS; returns the number of blobs."""
+    StoredBlob = apps.get_model('common', 'StoredBlob')
+    counts = Counter()
+    for model_label, field in BLOB_FIELDS.items():
+        names = apps.get_model(model_label).objects.filter(**{f'{field}__startswith': BLOB_PREFIX})
+        counts.update(names.values_list(field, flat=True).iterator(chunk_size=chunk_size))
+    blobs = []
+    with transaction.atomic():
+        for blob in StoredBlob.objects.select_for_update().iterator(chunk_size=chunk_size):
+            if blob.ref_count != counts.get(blob.name, 0):
+                blob.ref_count = counts.get(blob.name, 0)
+                blob.updated_at = timezone.now()
+                blobs.append(blob)
+        StoredBlob.objects.bulk_update(blobs, ['ref_count', 'updated_at'], batch_size=chunk_size)
+    return StoredBlob.objects.count()
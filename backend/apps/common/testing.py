@@ -0,0 +1,93 @@
+"""
+Factories for the apps' tests.
+
+Each helper creates a valid object with unique names and fills in any
+related object it is not given, so a test only spells out what it checks.
+"""
+import datetime
+import itertools
+from decimal import Decimal
+
+from django.apps import apps
+
+_sequence = itertools.count()
+
+
+def user(role='customer', **kwargs):
+    User = apps.get_model('users', 'User')
+    number = next(_sequence)
+    kwargs.setdefault('first_name', 'Test')
+    kwargs.setdefault('last_name', f'User {number}')
+    # No password: hashing one is slow and tests authenticate with force_authenticate
+    return User.objects.create_user(email=f'user{number}@example.com', role=role, **kwargs)
+
+
+def provider(**kwargs):
+    ServiceProvider = apps.get_model('providers', 'ServiceProvider')
+    number = next(_sequence)
+    values = {
+        'business_name': f'Business {number}',
+        'business_description': 'Repairs',
+        'address_line1': '1 Main Street',
+        'city': 'Pune',
+        'state': 'MH',
+        'postal_code': '411001',
+        'is_verified': True,
+    }
+    values.update(kwargs)
+    if 'user' not in values:
+        values['user'] = user('provider')
+    return ServiceProvider.objects.create(**values)
+
+
+def category(**kwargs):
+    ServiceCategory = apps.get_model('services', 'ServiceCategory')
+    number = next(_sequence)
+    kwargs.setdefault('name', f'Category {number}')
+    kwargs.setdefault('slug', f'category-{number}')
+    return ServiceCategory.objects.create(**kwargs)
+
+
+def service(**kwargs):
+    Service = apps.get_model('services', 'Service')
+    number = next(_sequence)
+    values = {
+        'title': f'Service {number}',
+        'slug': f'service-{number}',
+        'description': 'General work',
+        'base_price': Decimal('100'),
+    }
+    values.update(kwargs)
+    if 'provider' not in values:
+        values['provider'] = provider()
+    if 'category' not in values:
+        values['category'] = category()
+    return Service.objects.create(**values)
+
+
+def booking(**kwargs):
+    Booking = apps.get_model('bookings', 'Booking')
+    values = {
+        'scheduled_date': datetime.date.today() + datetime.timedelta(days=1),
+        'scheduled_time': datetime.time(10, 0),
+        'service_address': '1 Main Street',
+        'city': 'Pune',
+        'state': 'MH',
+        'postal_code': '411001',
+        'problem_description': 'Leaking tap',
+        'quoted_price': Decimal('500'),
+    }
+    values.update(kwargs)
+    if 'service' not in values:
+        values['service'] = service(**({'provider': values['provider']} if 'provider' in values else {}))
+    values.setdefault('provider', values['service'].provider)
+    if 'customer' not in values:
+        values['customer'] = user()
+    return Booking.objects.create(**values)
+
+
+def review(booking_, **kwargs):
+    Review = apps.get_model('reviews', 'Review')
+    values = {'rating': 5, 'comment': 'Great work'}
+    values.update(kwargs)
+    return Review.objects.create(booking=booking_, customer=booking_.customer, provider=booking_.provider, **values)
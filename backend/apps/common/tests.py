@@ -1,3 +1,671 @@
-from django.test import TestCase
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.common import geo, imports, storage, testing, uploads
+from apps.common.models import ImportJob, StoredBlob, UploadSession
+
+
+class GeoTests(TestCase):
+    
+    def test_geohash_cover_contains_the_box(self):
+        self.assertEqual(geo.encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        rnd = random.Random(1)
+        for _ in range(50):
+            box = geo.bounding_box(rnd.uniform(-60, 60), rnd.uniform(-179, 179), rnd.uniform(0.1, 100))
+            cells = geo.geohash_cover(*box)
+            for _ in range(10):
+                point = geo.encode_geohash(rnd.uniform(box[0], box[1]), rnd.uniform(box[2], box[3]))
+                self.assertTrue(any(point.startswith(cell) for cell in cells), (box, cells, point))
+    
+    def test_nearby_and_within(self):
+        rnd = random.Random(2)
+        center = (18.5204, 73.8567)
+        providers = [
+            testing.provider(
+                latitude=Decimal(str(round(center[0] + rnd.uniform(-0.3, 0.3), 6))),
+                longitude=Decimal(str(round(center[1] + rnd.uniform(-0.3, 0.3), 6))),
+            )
+            for _ in range(40)
+        ]
+        testing.provider()
+        for provider in providers[:10]:
+            testing.service(provider=provider)
+        client = APIClient()
+        
+        distances = sorted((geo.haversine_km(*center, p.latitude, p.longitude), str(p.pk)) for p in providers)
+        response = client.get('/api/providers/providers/nearby/', {
+            'latitude': center[0], 'longitude': center[1], 'radius_km': 15,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [pk for km, pk in distances if km <= 15])
+        
+        response = client.get('/api/services/services/nearby/', {
+            'latitude': center[0], 'longitude': center[1], 'radius_km': 50,
+        })
+        self.assertEqual(response.data['count'], 10)
+        distances = [row['distance_km'] for row in response.data['results']]
+        self.assertEqual(distances, sorted(distances))
+        
+        response = client.get('/api/providers/providers/within/', {
+            'min_lat': 18.4, 'max_lat': 18.6, 'min_lng': 73.8, 'max_lng': 73.9,
+        })
+        self.assertEqual({row['id'] for row in response.data['results']}, {
+            str(p.pk) for p in providers if 18.4 <= p.latitude <= 18.6 and 73.8 <= p.longitude <= 73.9
+        })
+        self.assertEqual(client.get('/api/providers/providers/nearby/').status_code, 400)
+        
+        # The whole world is too big a box
+        response = client.get('/api/providers/providers/within/', {
+            'min_lat': -90, 'max_lat': 90, 'min_lng': -180, 'max_lng': 180,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('max_lat', response.data)
+        response = client.get('/api/providers/providers/within/', {
+            'min_lat': 18.6, 'max_lat': 18.4, 'min_lng': 73.8, 'max_lng': 73.9,
+        })
+        self.assertEqual(response.status_code, 400)
+    
+    def test_geohash_follows_the_coordinates(self):
+        provider = testing.provider(latitude=Decimal('18.52'), longitude=Decimal('73.85'))
+        provider.latitude = Decimal('10')
+        provider.save(update_fields=['latitude'])
+        provider.refresh_from_db()
+        self.assertEqual(provider.geohash, geo.encode_geohash(10, provider.longitude))
+
+
+class ConditionalGetTests(TestCase):
+    
+    def assert_round_trip(self, client, url):
+        """GET a detail URL, then revalidate it with both validators; returns the ETag."""
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        return etag
+    
+    def test_detail_routes(self):
+        booking = testing.booking()
+        client = APIClient()
+        client.force_authenticate(booking.customer)
+        for url in [
+            f'/api/providers/providers/{booking.provider_id}/',
+            f'/api/services/categories/{booking.service.category_id}/',
+            f'/api/services/services/{booking.service_id}/',
+            f'/api/bookings/bookings/{booking.pk}/',
+        ]:
+            with self.subTest(url=url):
+                self.assert_round_trip(client, url)
+    
+    def test_provider_counters_change_etag(self):
+        from apps.bookings import transitions
+        
+        booking = testing.booking()
+        client = APIClient()
+        url = f'/api/providers/providers/{booking.provider_id}/'
+        etag = self.assert_round_trip(client, url)
+        
+        transitions.transition(booking, 'accepted')
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.assert_round_trip(client, url)
+        
+        testing.review(booking)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_reviews'], 1)
+    
+    def test_embedded_users_change_etag(self):
+        booking = testing.booking()
+        client = APIClient()
+        client.force_authenticate(booking.customer)
+        for url, user in [
+            (f'/api/bookings/bookings/{booking.pk}/', booking.customer),
+            (f'/api/providers/providers/{booking.provider_id}/', booking.provider.user),
+        ]:
+            with self.subTest(url=url):
+                etag = self.assert_round_trip(client, url)
+                user.first_name = 'Renamed'
+                user.save()
+                self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_booking_detail_is_scoped(self):
+        booking = testing.booking()
+        client = APIClient()
+        client.force_authenticate(testing.user())
+        self.assertEqual(client.get(f'/api/bookings/bookings/{booking.pk}/').status_code, 404)
+
+
+class QueryPlannerTests(TestCase):
+    
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+    
+    def test_list_queries_do_not_grow_with_the_page(self):
+        customer = testing.user()
+        testing.booking(customer=customer)
+        client = APIClient()
+        client.force_authenticate(customer)
+        urls = [
+            '/api/bookings/bookings/',
+            '/api/bookings/bookings/?expand=provider_details',
+            '/api/services/services/',
+            '/api/providers/providers/',
+        ]
+        before = {url: self.count_queries(client, url)[0] for url in urls}
+        for _ in range(4):
+            testing.booking(customer=customer)
+        for url in urls:
+            with self.subTest(url=url):
+                count, response = self.count_queries(client, url)
+                self.assertEqual(count, before[url])
+                self.assertEqual(len(response.data['results']), 5)
+    
+    def test_only_selected_columns_are_read(self):
+        booking = testing.booking()
+        client = APIClient()
+        client.force_authenticate(booking.customer)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/bookings/bookings/?fields=id,booking_number')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'booking_number'])
+        select = next(query['sql'] for query in queries if 'FROM "bookings_booking"' in query['sql']
+                      and 'COUNT' not in query['sql'])
+        self.assertNotIn('problem_description', select)
+
+
+class SparseFieldsetTests(TestCase):
+    
+    def test_compact_lists_and_expansions(self):
+        booking = testing.booking()
+        client = APIClient()
+        client.force_authenticate(booking.customer)
+        
+        row = client.get('/api/bookings/bookings/').data['results'][0]
+        self.assertIn('status', row)
+        self.assertNotIn('provider_details', row)
+        self.assertNotIn('status_history', row)
+        
+        row = client.get('/api/bookings/bookings/?expand=provider_details,status_history').data['results'][0]
+        self.assertEqual(row['provider_details']['business_name'], booking.provider.business_name)
+        self.assertEqual(row['status_history'], [])
+        
+        row = client.get('/api/bookings/bookings/?fields=id,status').data['results'][0]
+        self.assertEqual(set(row), {'id', 'status'})
+        # Details stay complete
+        self.assertIn('provider_details', client.get(f'/api/bookings/bookings/{booking.pk}/').data)
+    
+    def test_providers_and_services(self):
+        testing.service()
+        client = APIClient()
+        self.assertNotIn('services', client.get('/api/providers/providers/').data['results'][0])
+        self.assertIn('services', client.get('/api/providers/providers/?expand=services').data['results'][0])
+        row = client.get('/api/services/services/?fields=id,title').data['results'][0]
+        self.assertEqual(set(row), {'id', 'title'})
+
+
+class KeysetPaginationTests(TestCase):
+    
+    def setUp(self):
+        from decimal import Decimal
+        
+        self.customer = testing.user()
+        service = testing.service()
+        for index in range(7):
+            testing.booking(customer=self.customer, service=service, quoted_price=Decimal(700 - index * 100))
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+    
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertNotIn('count', response.data)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids
+    
+    def test_plain_requests_keep_page_number_response(self):
+        response = self.client.get('/api/bookings/bookings/?ordering=quoted_price')
+        self.assertEqual(response.data['count'], 7)
+        prices = [row['quoted_price'] for row in response.data['results']]
+        self.assertEqual(prices, sorted(prices, key=float))
+    
+    def test_cursor_walk_follows_ordering(self):
+        from apps.bookings.models import Booking
+        
+        for ordering in ['quoted_price', '-quoted_price', 'created_at', '-scheduled_date']:
+            with self.subTest(ordering=ordering):
+                ids = self.walk(f'/api/bookings/bookings/?cursor=&page_size=3&ordering={ordering}')
+                expected = Booking.objects.order_by(ordering, f'{"-" if ordering.startswith("-") else ""}pk')
+                if ordering == '-scheduled_date':
+                    expected = Booking.objects.order_by('-scheduled_date', '-scheduled_time', '-pk')
+                self.assertEqual(ids, [str(pk) for pk in expected.values_list('pk', flat=True)])
+    
+    def test_previous_link_returns_to_first_page(self):
+        first = self.client.get('/api/bookings/bookings/?cursor=&page_size=3&ordering=quoted_price')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+    
+    def test_unsupported_ordering_is_rejected(self):
+        response = self.client.get('/api/bookings/bookings/?cursor=&ordering=city')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data)
+    
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/bookings/bookings/?cursor=zzz').status_code, 404)
+
+
+class ExportTests(TestCase):
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(testing.user('admin'))
+    
+    def export(self, name, **data):
+        response = self.client.post(f'/api/common/exports/{name}/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+    
+    def test_formats(self):
+        service = testing.service()
+        for number in range(5):
+            testing.booking(service=service, status='pending' if number % 2 else 'completed')
+        
+        rows = list(csv.reader(io.StringIO(self.export('bookings', format='csv', filters={'status': 'pending'}).decode())))
+        self.assertEqual(len(rows), 3)
+        
+        data = json.loads(self.export('bookings', format='json', fields=['booking_number', 'quoted_price']))
+        self.assertEqual(len(data), 5)
+        self.assertEqual(set(data[0]), {'booking_number', 'quoted_price'})
+        
+        workbook = zipfile.ZipFile(io.BytesIO(self.export('services', format='xlsx')))
+        self.assertIn(service.title, workbook.read('xl/worksheets/sheet1.xml').decode())
+        for name in ['payments', 'wallet_transactions', 'reviews']:
+            with self.subTest(name=name):
+                self.export(name, format='csv')
+    
+    def test_invalid_requests(self):
+        post = self.client.post
+        self.assertEqual(post('/api/common/exports/bookings/', {'filters': {'password': 'x'}}, format='json').status_code, 400)
+        self.assertEqual(
+            post('/api/common/exports/bookings/', {'filters': {'scheduled_date__gte': 'nope'}}, format='json').status_code,
+            400,
+        )
+        self.assertEqual(post('/api/common/exports/nope/', {}, format='json').status_code, 404)
+        self.client.force_authenticate(testing.user())
+        self.assertEqual(post('/api/common/exports/bookings/', {}, format='json').status_code, 403)
+
+
+def csv_upload(*lines):
+    return SimpleUploadedFile('import.csv', '\n'.join(lines).encode(), content_type='text/csv')
+
+
+class TemporaryMediaMixin:
+    """Keeps uploads and stored files in a temporary directory."""
+    
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.media_root = f'{root}/media'
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings = self.settings(
+            MEDIA_ROOT=self.media_root, UPLOAD_SESSION_ROOT=f'{root}/sessions', UPLOAD_CHUNK_SIZE=1000,
+            IMPORT_UPLOAD_ROOT=f'{root}/imports',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+@override_settings(IMPORT_RUN_IN_BACKGROUND=False, IMPORT_CHUNK_SIZE=50)
+class ImportTests(TemporaryMediaMixin, TestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(testing.user('admin'))
+    
+    def test_services(self):
+        from apps.services.models import Service
+        
+        testing.provider(business_name='Acme')
+        category = testing.category()
+        lines = ['title,description,category,provider,base_price,tools_needed']
+        lines += [f'Job {number},Repairs,{category.slug},Acme,{100 + number},drill|saw' for number in range(120)]
+        lines += [f'Bad,Repairs,{category.slug},Nobody,10,', f'Job 1,Repairs,{category.slug},Acme,5,']
+        response = self.client.post('/api/common/imports/services/', {'file': csv_upload(*lines)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['import'], 'services')
+        self.assertEqual(
+            (response.data['status'], response.data['processed'], response.data['created'], response.data['failed']),
+            ('completed', 122, 120, 2),
+        )
+        self.assertEqual([error['row'] for error in response.data['errors']], [121, 122])
+        self.assertEqual(Service.objects.get(slug='acme-job-5').tools_needed, ['drill', 'saw'])
+        
+        lines = ['title,description,category,provider,base_price', f'Job 1,Repairs,{category.slug},Acme,7']
+        response = self.client.post(
+            '/api/common/imports/services/', {'file': csv_upload(*lines), 'overwrite': True}, format='multipart'
+        )
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(Service.objects.get(slug='acme-job-1').base_price, 7)
+    
+    def test_availability_refreshes_bitmaps(self):
+        from apps.providers import bitmaps
+        
+        provider = testing.provider(business_name='Acme', working_days=[])
+        day = timezone.localdate() + datetime.timedelta(days=2)
+        self.assertEqual(bitmaps.available_providers([provider.pk], day, datetime.time(10), 60), [])
+        response = self.client.post('/api/common/imports/provider_availability/', {'file': csv_upload(
+            'provider,date,start_time,end_time', f'Acme,{day},09:00,12:00',
+        )}, format='multipart')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(bitmaps.available_providers([provider.pk], day, datetime.time(10), 60), [provider.pk])
+    
+    def test_job_is_stored(self):
+        response = self.client.post('/api/common/imports/provider_availability/', {'file': csv_upload(
+            'provider,date,bogus',
+        )}, format='multipart')
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertEqual(response.data['errors'][0]['errors']['missing_columns'], ['end_time', 'start_time'])
+        job = self.client.get(f"/api/common/imports/jobs/{response.data['id']}/")
+        self.assertEqual(job.data, response.data)
+        self.assertEqual(ImportJob.objects.get().status, 'failed')
+        
+        # Finished jobs are deleted once they are older than IMPORT_JOB_TIMEOUT
+        ImportJob.objects.update(finished_at=timezone.now() - datetime.timedelta(days=2))
+        self.client.post('/api/common/imports/provider_availability/', {'file': csv_upload(
+            'provider,date,bogus',
+        )}, format='multipart')
+        self.assertEqual(ImportJob.objects.count(), 1)
+        self.assertEqual(self.client.get(f"/api/common/imports/jobs/{response.data['id']}/").status_code, 404)
+    
+    def test_abandoned_jobs_fail(self):
+        running = imports.new_job('services', False)
+        running.status = 'running'
+        imports.save_job(running)
+        queued = imports.new_job('services', False)
+        for job in [running, queued]:
+            path = imports.upload_path(job)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('title\n')
+        
+        # Still making progress
+        self.assertEqual(self.client.get(f'/api/common/imports/jobs/{running.pk}/').data['status'], 'running')
+        ImportJob.objects.update(updated_at=timezone.now() - datetime.timedelta(minutes=11))
+        response = self.client.get(f'/api/common/imports/jobs/{running.pk}/')
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertIsNotNone(response.data['finished_at'])
+        self.assertEqual(ImportJob.objects.filter(status='failed').count(), 2)
+        self.assertFalse(imports.upload_path(running).exists())
+        self.assertFalse(imports.upload_path(queued).exists())
+        
+        # A queued job failed meanwhile is not run when its turn comes
+        self.assertEqual(imports.run_import(queued).status, 'failed')
+        self.assertIsNone(ImportJob.objects.get(pk=queued.pk).started_at)
+
+
+class BackgroundImportTests(TemporaryMediaMixin, TransactionTestCase):
+    
+    def test_progress_is_visible_while_running(self):
+        testing.provider(business_name='Acme')
+        client = APIClient()
+        client.force_authenticate(testing.user('admin'))
+        response = client.post('/api/common/imports/provider_availability/', {'file': csv_upload(
+            'provider,date,start_time,end_time', 'Acme,2030-01-01,09:00,12:00',
+        )}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        url = f"/api/common/imports/jobs/{response.data['id']}/"
+        for _ in range(50):
+            job = client.get(url).data
+            if job['status'] == 'completed':
+                break
+            time.sleep(0.1)
+        self.assertEqual((job['status'], job['created']), ('completed', 1))
+
+
+def png_bytes(size=(5, 5), color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class UploadTests(TemporaryMediaMixin, TestCase):
+    
+    def start(self, client, target, data, filename='scan.pdf', **metadata):
+        response = client.post('/api/common/uploads/', {
+            'target': target,
+            'filename': filename,
+            'size': len(data),
+            'checksum': hashlib.sha256(data).hexdigest(),
+            'metadata': metadata,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+    
+    def put(self, client, session_id, index, data, checksum=None):
+        return client.put(
+            f'/api/common/uploads/{session_id}/chunks/{index}/',
+            data=data,
+            content_type='application/octet-stream',
+            HTTP_X_CHUNK_CHECKSUM=checksum or hashlib.sha256(data).hexdigest(),
+        )
+    
+    def test_chunks_in_any_order(self):
+        from apps.providers.models import ProviderDocument
+        
+        provider = testing.provider()
+        client = APIClient()
+        client.force_authenticate(provider.user)
+        data = bytes(range(256)) * 10
+        session = self.start(client, 'provider_document', data, document_type='id_proof', document_name='ID')
+        self.assertEqual(session['total_chunks'], 3)
+        
+        self.assertEqual(self.put(client, session['id'], 2, data[2000:]).status_code, 200)
+        self.assertEqual(self.put(client, session['id'], 0, data[:1000], checksum='0' * 64).status_code, 400)
+        self.assertEqual(self.put(client, session['id'], 0, data[:999]).status_code, 400)
+        self.assertEqual(self.put(client, session['id'], 0, data[:1000]).status_code, 200)
+        self.assertEqual(self.put(client, session['id'], 5, data[:1000]).status_code, 400)
+        response = client.post(f"/api/common/uploads/{session['id']}/complete/")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['missing_chunks'], ['1'])
+        self.assertEqual(client.get(f"/api/common/uploads/{session['id']}/").json()['received_chunks'], [0, 2])
+        
+        self.put(client, session['id'], 1, data[1000:2000])
+        self.assertEqual(client.post(f"/api/common/uploads/{session['id']}/complete/").status_code, 201)
+        document = ProviderDocument.objects.get()
+        self.assertEqual(document.provider, provider)
+        self.assertEqual(document.document_file.read(), data)
+        self.assertEqual(UploadSession.objects.get().object_id, document.pk)
+        self.assertEqual(client.post(f"/api/common/uploads/{session['id']}/complete/").status_code, 400)
+        
+        other = APIClient()
+        other.force_authenticate(testing.user())
+        self.assertEqual(other.get(f"/api/common/uploads/{session['id']}/").status_code, 404)
+    
+    def test_targets_check_permissions_and_content(self):
+        from apps.bookings.models import BookingAttachment
+        from apps.reviews.models import ReviewImage
+        
+        booking = testing.booking()
+        client = APIClient()
+        client.force_authenticate(booking.customer)
+        session = self.start(client, 'booking_attachment', b'x' * 10, booking=str(booking.pk), file_type='document')
+        self.put(client, session['id'], 0, b'x' * 10)
+        self.assertEqual(client.post(f"/api/common/uploads/{session['id']}/complete/").status_code, 201)
+        self.assertEqual(BookingAttachment.objects.get().uploaded_by, booking.customer)
+        
+        stranger = APIClient()
+        stranger.force_authenticate(testing.user())
+        response = stranger.post('/api/common/uploads/', {
+            'target': 'booking_attachment', 'filename': 'a.txt', 'size': 10,
+            'metadata': {'booking': str(booking.pk), 'file_type': 'document'},
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+        
+        review = testing.review(booking)
+        image = png_bytes()
+        session = self.start(client, 'review_image', image, filename='tap.png', review=str(review.pk), caption='Tap')
+        self.put(client, session['id'], 0, image)
+        self.assertEqual(client.post(f"/api/common/uploads/{session['id']}/complete/").status_code, 201)
+        self.assertEqual(ReviewImage.objects.get().caption, 'Tap')
+        
+        # Not an image: the review image serializer rejects the assembled file
+        session = self.start(client, 'review_image', b'abc', filename='tap.png', review=str(review.pk))
+        self.put(client, session['id'], 0, b'abc')
+        self.assertEqual(client.post(f"/api/common/uploads/{session['id']}/complete/").status_code, 400)
+        self.assertEqual(client.delete(f"/api/common/uploads/{session['id']}/").status_code, 204)
+    
+    def test_purge_expired(self):
+        client = APIClient()
+        client.force_authenticate(testing.provider().user)
+        session = self.start(client, 'provider_document', b'x' * 10, document_type='id_proof', document_name='ID')
+        self.put(client, session['id'], 0, b'x' * 10)
+        self.assertEqual(uploads.purge_expired(), 0)
+        UploadSession.objects.update(expires_at=timezone.now())
+        self.assertEqual(uploads.purge_expired(), 1)
+        self.assertFalse(UploadSession.objects.exists())
+
+
+def png_upload(width, height):
+    return SimpleUploadedFile('photo.png', png_bytes((width, height)), content_type='image/png')
+
+
+@override_settings(IMAGE_VARIANTS_IN_BACKGROUND=False)
+class ImageVariantTests(TemporaryMediaMixin, TestCase):
+    
+    def open_variant(self, name):
+        return Image.open(f'{self.media_root}/{name}')
+    
+    def test_variants_follow_the_image(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = testing.category(image=png_upload(2000, 1000))
+        category.refresh_from_db()
+        variants = category.image_variants
+        self.assertEqual(variants['source'], category.image.name)
+        with self.open_variant(variants['thumb']) as image:
+            self.assertEqual((image.size, image.format), ((160, 80), 'WEBP'))
+        
+        rows = APIClient().get('/api/services/categories/').json()
+        rows = rows['results'] if isinstance(rows, dict) else rows
+        row = next(row for row in rows if row['id'] == str(category.pk))
+        self.assertTrue(row['image_variants']['medium'].startswith('http://testserver/media/'))
+        
+        # Replacing the image replaces its variants
+        with self.captureOnCommitCallbacks(execute=True):
+            category.image = png_upload(100, 300)
+            category.save()
+        category.refresh_from_db()
+        self.assertFalse(os.path.exists(f"{self.media_root}/{variants['thumb']}"))
+        with self.open_variant(category.image_variants['medium']) as image:
+            # Never enlarged
+            self.assertEqual(image.size, (100, 300))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            category.image = None
+            category.save()
+        category.refresh_from_db()
+        self.assertEqual(category.image_variants, {})
+
+
+@override_settings(IMAGE_VARIANTS_IN_BACKGROUND=True)
+class BackgroundImageVariantTests(TemporaryMediaMixin, TransactionTestCase):
+    
+    def test_pool_renders_variants(self):
+        provider = testing.provider()
+        provider.business_logo = png_upload(800, 800)
+        provider.save()
+        for _ in range(100):
+            provider.refresh_from_db()
+            if provider.business_logo_variants:
+                break
+            time.sleep(0.1)
+        self.assertEqual(set(provider.business_logo_variants), {'source', 'thumb', 'medium'})
+
+
+class BlobStorageTests(TemporaryMediaMixin, TestCase):
+    
+    def document(self, provider, content, name):
+        from apps.providers.models import ProviderDocument
+        
+        return ProviderDocument.objects.create(
+            provider=provider, document_type='id_proof', document_name=name,
+            document_file=ContentFile(content, name=name),
+        )
+    
+    def test_identical_files_share_a_blob(self):
+        from apps.bookings.models import BookingAttachment
+        
+        provider = testing.provider()
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.document(provider, b'same bytes', 'scan.PDF')
+            second = self.document(provider, b'same bytes', 'copy.pdf')
+        self.assertEqual(first.document_file.name, second.document_file.name)
+        self.assertTrue(first.document_file.name.startswith('blobs/'))
+        self.assertTrue(first.document_file.name.endswith('.pdf'))
+        self.assertTrue(first.document_file.path.startswith(self.media_root))
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = BookingAttachment.objects.create(
+                booking=testing.booking(), file_type='document', file=ContentFile(b'same bytes', name='bill.pdf')
+            )
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+            attachment.file = ContentFile(b'other bytes', name='bill.pdf')
+            attachment.save()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+    
+    def test_garbage_collection(self):
+        provider = testing.provider()
+        with self.captureOnCommitCallbacks(execute=True):
+            document = self.document(provider, b'bytes', 'scan.pdf')
+            self.document(provider, b'kept', 'kept.pdf')
+        path = document.document_file.path
+        self.assertEqual(storage.collect_garbage(grace_seconds=0), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+        # Unreferenced blobs are kept for a grace period, in case an upload is about to reuse them
+        self.assertEqual(storage.collect_garbage(grace_seconds=3600), 0)
+        self.assertTrue(os.path.exists(path))
+        # ...which brings it back to life
+        with self.captureOnCommitCallbacks(execute=True):
+            document = self.document(provider, b'bytes', 'again.pdf')
+        self.assertEqual(storage.collect_garbage(grace_seconds=0), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+        self.assertEqual(storage.collect_garbage(grace_seconds=0, batch_size=1), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(StoredBlob.objects.count(), 1)
+        
+        StoredBlob.objects.update(ref_count=7)
+        storage.recount()
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
@@ -0,0 +1,295 @@
+"""
+Resumable chunked uploads.
+
+A client opens an UploadSession for one target (a provider document, a
+booking attachment or a review image) with the file's name, size and
+metadata, then PUTs the chunks in any order, each with the SHA-256 of its
+bytes. Every chunk is streamed from the request to its own file under
+UPLOAD_SESSION_ROOT and only kept when its length and checksum match, so a
+failed or interrupted chunk is simply sent again and the session lists the
+chunks it still needs. Completing the session concatenates the chunks on
+disk into one file, which the target's serializer validates and its
+FileField moves into storage without reading it into memory.
+"""
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+
+COPY_BUFFER_SIZE = 64 * 1024
+CHUNK_SUFFIX = '.part'
+ASSEMBLED_NAME = 'assembled'
+
+
+class UploadTarget:
+    """The serializer and file field a completed upload is saved through."""
+
+    def __init__(self, serializer, file_field, authorize):
+        self.serializer_path = serializer
+        self.file_field = file_field
+        # authorize(user, metadata) -> extra save() kwargs, or raises
+        self.authorize = authorize
+
+    @property
+    def serializer_class(self):
+        return import_string(self.serializer_path)
+
+
+def _get_related(model_label, pk, field):
+    model = apps.get_model(model_label)
+    try:
+        return model.objects.get(pk=pk)
+    except (model.DoesNotExist, DjangoValidationError, ValueError, TypeError):
+        raise ValidationError({'metadata': {field: 'Not a valid id.'}})
+
+
+def _authorize_provider_document(user, metadata):
+    if user.role != 'provider' or not hasattr(user, 'provider_profile'):
+        raise PermissionDenied("Only service providers can upload documents")
+    return {'provider': user.provider_profile}
+
+
+def _authorize_booking_attachment(user, metadata):
+    booking = _get_related('bookings.Booking', metadata.get('booking'), 'booking')
+    if not (user == booking.customer or
+            (hasattr(user, 'provider_profile') and user.provider_profile == booking.provider)):
+        raise PermissionDenied("You don't have permission to add attachments to this booking")
+    return {'booking': booking, 'uploaded_by': user}
+
+
+def _authorize_review_image(user, metadata):
+    review = _get_related('reviews.Review', metadata.get('review'), 'review')
+    if review.customer != user:
+        raise PermissionDenied("You can only add images to your own reviews")
+    return {'review': review}
+
+
+UPLOAD_TARGETS = {
+    'provider_document': UploadTarget(
+        'apps.providers.serializers.ProviderDocumentSerializer',
+        'document_file',
+        _authorize_provider_document,
+    ),
+    'booking_attachment': UploadTarget(
+        'apps.bookings.serializers.BookingAttachmentSerializer',
+        'file',
+        _authorize_booking_attachment,
+    ),
+    'review_image': UploadTarget(
+        'apps.reviews.serializers.ReviewImageSerializer',
+        'image',
+        _authorize_review_image,
+    ),
+}
+
+
+class AssembledFile(UploadedFile):
+    """An assembled upload on disk; storages move it instead of copying it."""
+
+    def __init__(self, path, name, content_type, size):
+        self.path = str(path)
+        super().__init__(open(self.path, 'rb'), name, content_type or None, size)
+
+    def temporary_file_path(self):
+        return self.path
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # The file has been moved into storage
+            pass
+
+
+def get_target(name):
+    try:
+        return UPLOAD_TARGETS[name]
+    except KeyError:
+        raise ValidationError({'target': f'Unknown upload target "{name}".'})
+
+
+def get_chunk_size():
+    return getattr(settings, 'UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024)
+
+
+def get_max_size():
+    return getattr(settings, 'UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+
+
+def get_session_timeout():
+    return getattr(settings, 'UPLOAD_SESSION_TIMEOUT', 86400)
+
+
+def get_session_root():
+    return Path(getattr(settings, 'UPLOAD_SESSION_ROOT', Path(settings.BASE_DIR) / 'upload_sessions'))
+
+
+def session_dir(session):
+    return get_session_root() / str(session.pk)
+
+
+def _chunk_path(session, index):
+    return session_dir(session) / f'{index:06d}{CHUNK_SUFFIX}'
+
+
+def expected_length(session, index):
+    if index == session.total_chunks - 1:
+        return session.size - index * session.chunk_size
+    return session.chunk_size
+
+
+def received_chunks(session):
+    directory = session_dir(session)
+    if not directory.is_dir():
+        return []
+    return sorted(
+        int(entry.name[:-len(CHUNK_SUFFIX)])
+        for entry in os.scandir(directory)
+        if entry.name.endswith(CHUNK_SUFFIX)
+    )
+
+
+def missing_chunks(session):
+    received = set(received_chunks(session))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def start_session(user, target, filename, size, checksum='', content_type='', metadata=None):
+    """Open an upload session after checking the user may upload to the target."""
+    UploadSession = apps.get_model('common', 'UploadSession')
+    metadata = metadata or {}
+    get_target(target).authorize(user, metadata)
+    session = UploadSession.objects.create(
+        user=user,
+        target=target,
+        filename=os.path.basename(filename),
+        content_type=content_type,
+        size=size,
+        chunk_size=get_chunk_size(),
+        checksum=checksum.lower(),
+        metadata=metadata,
+        expires_at=timezone.now() + timezone.timedelta(seconds=get_session_timeout()),
+    )
+    session_dir(session).mkdir(parents=True, exist_ok=True)
+    return session
+
+
+def get_session(user, session_id):
+    UploadSession = apps.get_model('common', 'UploadSession')
+    try:
+        return UploadSession.objects.get(pk=session_id, user=user)
+    except UploadSession.DoesNotExist:
+        raise NotFound("Upload session not found.")
+
+
+def _check_open(session):
+    if session.status != 'uploading':
+        raise ValidationError({'detail': f'Upload session is {session.status}.'})
+    if session.is_expired:
+        raise ValidationError({'detail': 'Upload session has expired.'})
+
+
+def write_chunk(session, index, stream, checksum):
+    """Stream one chunk to disk, keeping it only when its length and SHA-256 match."""
+    _check_open(session)
+    if not 0 <= index < session.total_chunks:
+        raise ValidationError({'index': f'Chunk index must be between 0 and {session.total_chunks - 1}.'})
+    length = expected_length(session, index)
+    path = _chunk_path(session, index)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(partial, 'wb') as destination:
+            while written <= length:
+                data = stream.read(min(COPY_BUFFER_SIZE, length + 1 - written)) if stream else b''
+                if not data:
+                    break
+                digest.update(data)
+                destination.write(data)
+                written += len(data)
+        if written != length:
+            raise ValidationError({'detail': f'Chunk {index} must be {length} bytes, got {written}.'})
+        if digest.hexdigest() != (checksum or '').lower():
+            raise ValidationError({'checksum': f'Chunk {index} does not match its checksum.'})
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return received_chunks(session)
+
+
+def _assemble(session):
+    """Concatenate the chunks into one file, returning its path."""
+    path = session_dir(session) / ASSEMBLED_NAME
+    digest = hashlib.sha256()
+    with open(path, 'wb') as destination:
+        for index in range(session.total_chunks):
+            with open(_chunk_path(session, index), 'rb') as source:
+                while True:
+                    data = source.read(COPY_BUFFER_SIZE)
+                    if not data:
+                        break
+                    digest.update(data)
+                    destination.write(data)
+    if session.checksum and digest.hexdigest() != session.checksum:
+        path.unlink()
+        raise ValidationError({'checksum': 'The assembled file does not match its checksum.'})
+    return path
+
+
+def complete_session(session, context=None):
+    """Assemble the upload and save it through its target; returns the serialized record."""
+    UploadSession = apps.get_model('common', 'UploadSession')
+    target = get_target(session.target)
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        _check_open(session)
+        missing = missing_chunks(session)
+        if missing:
+            raise ValidationError({'missing_chunks': missing})
+        save_kwargs = target.authorize(session.user, session.metadata)
+        path = _assemble(session)
+        upload = AssembledFile(path, session.filename, session.content_type, session.size)
+        try:
+            serializer = target.serializer_class(
+                data={**session.metadata, target.file_field: upload}, context=context or {}
+            )
+            serializer.is_valid(raise_exception=True)
+            instance = serializer.save(**save_kwargs)
+        finally:
+            upload.close()
+        session.status = 'completed'
+        session.object_id = instance.pk
+        session.save(update_fields=['status', 'object_id', 'updated_at'])
+    shutil.rmtree(session_dir(session), ignore_errors=True)
+    return serializer.data
+
+
+def cancel_session(session):
+    _check_open(session)
+    session.status = 'cancelled'
+    session.save(update_fields=['status', 'updated_at'])
+    shutil.rmtree(session_dir(session), ignore_errors=True)
+
+
+def purge_expired():
+    """Delete sessions past their expiry and their chunks; returns the number deleted."""
+    UploadSession = apps.get_model('common', 'UploadSession')
+    expired = UploadSession.objects.filter(expires_at__lte=timezone.now())
+    count = 0
+    for session in expired.iterator():
+        shutil.rmtree(session_dir(session), ignore_errors=True)
+        count += 1
+    expired.delete()
+    return count
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('exports/<str:name>/', views.ExportView.as_view(), name='export'),
+    path('imports/jobs/<uuid:job_id>/', views.ImportJobView.as_view(), name='import-job'),
+    path('imports/<str:name>/', views.ImportView.as_view(), name='import'),
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='upload-create'),
+    path('uploads/<uuid:pk>/', views.UploadSessionView.as_view(), name='upload-session'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/', views.UploadChunkView.as_view(), name='upload-chunk'),
+    path('uploads/<uuid:pk>/complete/', views.UploadCompleteView.as_view(), name='upload-complete'),
+]
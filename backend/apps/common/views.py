@@ -1,3 +1,194 @@
-from django.shortcuts import render
+from rest_framework import permissions, status
+from rest_framework.views import APIView
+from rest_framework.response import Response
 
-# Create your views here.
+from apps.users.permissions import IsAdmin
+from .exports import export_response
+from .imports import start_import, get_job
+from . import uploads
+from .geo import within_radius, within_box, km_to_miles, get_result_limit
+from .mixins import optimize_queryset
+from .serializers import (
+    LocationSerializer, SearchRadiusSerializer, BoundingBoxSerializer,
+    ExportSerializer, CSVImportSerializer, ImportJobSerializer, UploadSessionCreateSerializer,
+    UploadSessionSerializer, get_field_selection
+)
+
+
+class GeoSearchView(APIView):
+    """
+    Base view for "near me" searches.
+
+    ``mode = 'radius'`` takes ``latitude``, ``longitude`` and ``radius_km``;
+    ``mode = 'box'`` takes ``min_lat``, ``max_lat``, ``min_lng``, ``max_lng``
+    and optionally a ``latitude``/``longitude`` to sort from. Subclasses set
+    serializer_class, get_queryset() and, when the coordinates live on a
+    related object, ``location``.
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = None
+    location = None
+    mode = 'radius'
+    default_radius_km = 10
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get(self, request):
+        # Coordinates of the related object are read after the query plan,
+        # so its columns are not restricted
+        queryset = optimize_queryset(
+            self.get_queryset(),
+            self.serializer_class,
+            restrict_columns=False,
+            selection=get_field_selection(request, many=True),
+        )
+        limit = self.get_limit()
+        if self.mode == 'box':
+            results = self.search_box(queryset, limit)
+        else:
+            results = self.search_radius(queryset, limit)
+
+        data = self.serializer_class(results, many=True, context={'request': request}).data
+        for item, obj in zip(data, results):
+            item['distance_km'] = round(obj.distance_km, 3)
+            item['distance_miles'] = round(km_to_miles(obj.distance_km), 3)
+        return Response({'count': len(data), 'results': data})
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', ''))
+        except ValueError:
+            return get_result_limit()
+        return max(1, min(limit, get_result_limit()))
+
+    def search_radius(self, queryset, limit):
+        params = self.request.query_params
+        serializer = SearchRadiusSerializer(data={
+            'center': {
+                'latitude': params.get('latitude'),
+                'longitude': params.get('longitude'),
+            },
+            'radius_km': params.get('radius_km', self.default_radius_km),
+        })
+        serializer.is_valid(raise_exception=True)
+        center = serializer.validated_data['center']
+        return within_radius(
+            queryset,
+            center['latitude'],
+            center['longitude'],
+            serializer.validated_data['radius_km'],
+            location=self.location,
+            limit=limit,
+        )
+
+    def search_box(self, queryset, limit):
+        serializer = BoundingBoxSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        box = serializer.validated_data
+        latitude = longitude = None
+        if 'latitude' in self.request.query_params:
+            center = LocationSerializer(data=self.request.query_params)
+            center.is_valid(raise_exception=True)
+            latitude = center.validated_data['latitude']
+            longitude = center.validated_data['longitude']
+        return within_box(
+            queryset,
+            (box['min_lat'], box['max_lat'], box['min_lng'], box['max_lng']),
+            latitude,
+            longitude,
+            location=self.location,
+            limit=limit,
+        )
+
+
+class ExportView(APIView):
+    """Stream an export (bookings, payments, ...) as csv, json or xlsx."""
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    
+    def post(self, request, name):
+        serializer = ExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return export_response(
+            name,
+            format=serializer.validated_data['format'],
+            fields=serializer.validated_data.get('fields'),
+            filters=serializer.validated_data.get('filters'),
+        )
+
+
+class ImportView(APIView):
+    """Start a CSV import of services, service packages or provider availability."""
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    
+    def post(self, request, name):
+        serializer = CSVImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = start_import(
+            name,
+            serializer.validated_data['file'],
+            overwrite=serializer.validated_data['overwrite'],
+        )
+        data = ImportJobSerializer(job).data
+        if job.status in ('completed', 'failed'):
+            return Response(data, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class ImportJobView(APIView):
+    """Progress and row errors of an import job."""
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    
+    def get(self, request, job_id):
+        return Response(ImportJobSerializer(get_job(job_id)).data)
+
+
+class UploadSessionCreateView(APIView):
+    """Open a resumable chunked upload."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = uploads.start_session(request.user, **serializer.validated_data)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionView(APIView):
+    """State of an upload (including the chunks received so far), or cancel it."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, pk):
+        session = uploads.get_session(request.user, pk)
+        return Response(UploadSessionSerializer(session).data)
+    
+    def delete(self, request, pk):
+        session = uploads.get_session(request.user, pk)
+        uploads.cancel_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadChunkView(APIView):
+    """
+    Store one chunk. The body is the chunk's raw bytes and the
+    X-Chunk-Checksum header their SHA-256 hex digest.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def put(self, request, pk, index):
+        session = uploads.get_session(request.user, pk)
+        # The body is streamed to disk rather than parsed
+        received = uploads.write_chunk(
+            session, index, request.stream, request.headers.get('X-Chunk-Checksum')
+        )
+        return Response({'index': index, 'received_chunks': received})
+
+
+class UploadCompleteView(APIView):
+    """Assemble an upload and attach it to its target record."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, pk):
+        session = uploads.get_session(request.user, pk)
+        data = uploads.complete_session(session, context={'request': request})
+        return Response(data, status=status.HTTP_201_CREATED)
@@ -71,6 +71,7 @@ class Notification(BaseModel):
             models.Index(fields=['notification_type']),
             models.Index(fields=['created_at']),
             models.Index(fields=['channel', 'is_sent']),
+            models.Index(fields=['user', 'created_at']),
         ]
         ordering = ['-created_at']
     
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from apps.common.serializers import DynamicFieldsModelSerializer
 from .models import Notification, NotificationTemplate, UserNotificationPreference, SMSLog, EmailLog
 from apps.users.serializers import UserSerializer
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     notification_type_display = serializers.CharField(source='get_notification_type_display', read_only=True)
     channel_display = serializers.CharField(source='get_channel_display', read_only=True)
@@ -14,6 +15,7 @@ class NotificationSerializer(serializers.ModelSerializer):
                  'read_at', 'is_sent', 'sent_at', 'action_url', 'action_text',
                  'priority', 'expiry_date', 'created_at']
         read_only_fields = ['id', 'created_at', 'is_read', 'read_at', 'is_sent', 'sent_at']
+        expandable_fields = ['user_details']
 
 class NotificationCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,8 +17,10 @@ from .serializers import (
     NotificationCountSerializer
 )
 from apps.users.permissions import IsAdmin
+from apps.common.mixins import QueryOptimizationMixin
+from apps.common.pagination import KeysetPagination
 
-class NotificationListView(generics.ListCreateAPIView):
+class NotificationListView(QueryOptimizationMixin, generics.ListCreateAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -26,6 +28,9 @@ class NotificationListView(generics.ListCreateAPIView):
     search_fields = ['title', 'message']
     ordering_fields = ['created_at', 'priority']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
+    keyset_orderings = {'created_at': ('created_at',), 'priority': ('priority',)}
+    keyset_default_ordering = '-created_at'
     
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
@@ -38,7 +43,7 @@ class NotificationListView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class NotificationDetailView(generics.RetrieveDestroyAPIView):
+class NotificationDetailView(QueryOptimizationMixin, generics.RetrieveDestroyAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -136,14 +136,15 @@ class Payment(BaseModel):
             self.payment_id = f"PAY{date_str}{unique_id}"
         
         if not self.order_id and self.booking_id:
-            # Use get_model to avoid circular import
-            from django.apps import apps
-            Booking = apps.get_model('bookings', 'Booking')
-            try:
-                booking = Booking.objects.get(id=self.booking_id)
-                self.order_id = booking.booking_number
-            except Booking.DoesNotExist:
-                pass
+            if Payment.booking.is_cached(self):
+                self.order_id = self.booking.booking_number
+            else:
+                # Use get_model to avoid circular import
+                from django.apps import apps
+                Booking = apps.get_model('bookings', 'Booking')
+                self.order_id = Booking.objects.filter(id=self.booking_id).values_list(
+                    'booking_number', flat=True
+                ).first() or self.order_id
         
         super().save(*args, **kwargs)
     
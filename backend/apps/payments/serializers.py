@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from apps.common.serializers import DynamicFieldsModelSerializer
 from .models import Payment, PaymentRefund, Wallet, WalletTransaction
 from apps.bookings.serializers import BookingSerializer
 from apps.users.serializers import UserSerializer
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(DynamicFieldsModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     booking_details = BookingSerializer(source='booking', read_only=True)
     payment_method_display = serializers.CharField(source='get_payment_method_display', read_only=True)
@@ -20,13 +21,14 @@ class PaymentSerializer(serializers.ModelSerializer):
                  'refund_amount', 'refund_reason', 'refund_gateway_id', 'description',
                  'metadata', 'is_successful', 'is_refunded', 'created_at']
         read_only_fields = ['id', 'payment_id', 'created_at', 'is_successful', 'is_refunded']
+        expandable_fields = ['user_details', 'booking_details']
 
 class PaymentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['booking', 'amount', 'payment_method', 'payment_gateway']
 
-class PaymentRefundSerializer(serializers.ModelSerializer):
+class PaymentRefundSerializer(DynamicFieldsModelSerializer):
     payment_details = PaymentSerializer(source='payment', read_only=True)
     processed_by_details = UserSerializer(source='processed_by', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -37,6 +39,7 @@ class PaymentRefundSerializer(serializers.ModelSerializer):
                  'status', 'status_display', 'gateway_refund_id', 'gateway_response',
                  'processed_by', 'processed_by_details', 'processed_at', 'created_at']
         read_only_fields = ['id', 'refund_id', 'created_at']
+        expandable_fields = ['payment_details', 'processed_by_details']
 
 class WalletSerializer(serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
@@ -46,7 +49,7 @@ class WalletSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_details', 'balance', 'currency', 'created_at']
         read_only_fields = ['id', 'created_at']
 
-class WalletTransactionSerializer(serializers.ModelSerializer):
+class WalletTransactionSerializer(DynamicFieldsModelSerializer):
     wallet_details = WalletSerializer(source='wallet', read_only=True)
     reference_payment_details = PaymentSerializer(source='reference_payment', read_only=True)
     transaction_type_display = serializers.CharField(source='get_transaction_type_display', read_only=True)
@@ -57,4 +60,5 @@ class WalletTransactionSerializer(serializers.ModelSerializer):
                  'transaction_type', 'transaction_type_display', 'balance_before',
                  'balance_after', 'description', 'reference_payment',
                  'reference_payment_details', 'created_at']
-        read_only_fields = ['id', 'transaction_id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'transaction_id', 'created_at']
+        expandable_fields = ['wallet_details', 'reference_payment_details']
\ No newline at end of file
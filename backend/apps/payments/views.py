@@ -11,9 +11,10 @@ from .serializers import (
     WalletTransactionSerializer
 )
 from apps.users.permissions import IsCustomer, IsServiceProvider, IsAdmin
+from apps.common.mixins import QueryOptimizationMixin
 
 
-class PaymentListView(generics.ListCreateAPIView):
+class PaymentListView(QueryOptimizationMixin, generics.ListCreateAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -35,7 +36,7 @@ class PaymentListView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class PaymentDetailView(generics.RetrieveAPIView):
+class PaymentDetailView(QueryOptimizationMixin, generics.RetrieveAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -56,7 +57,7 @@ class PaymentRefundCreateView(generics.CreateAPIView):
         serializer.save(processed_by=self.request.user)
 
 
-class PaymentRefundDetailView(generics.RetrieveAPIView):
+class PaymentRefundDetailView(QueryOptimizationMixin, generics.RetrieveAPIView):
     queryset = PaymentRefund.objects.all()
     serializer_class = PaymentRefundSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
@@ -71,7 +72,7 @@ class WalletDetailView(generics.RetrieveAPIView):
         return wallet
 
 
-class WalletTransactionListView(generics.ListAPIView):
+class WalletTransactionListView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = WalletTransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
     
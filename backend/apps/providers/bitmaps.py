@@ -0,0 +1,131 @@
+"""
+Per-day availability bitmaps.
+
+A provider's free time on a day (see slots.free_intervals) is stored as a
+ProviderDayBitmap: 96 bits, one per 15 minute slot, packed into 12 bytes.
+A slot is set only when the provider is free for all of it. Rows are
+recomputed when the provider's availabilities or bookings on that day
+change, dropped when its regular hours change, and written on demand for
+days nobody has asked about yet. Asking which of many providers can take
+a job is then a bitwise AND of a NumPy matrix with the job's mask.
+"""
+import datetime
+
+import numpy as np
+from django.apps import apps
+from django.utils import timezone
+
+from .slots import MINUTES_PER_DAY, free_intervals, to_minutes
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+
+
+def encode(intervals):
+    """Pack an IntervalSet of minutes into a day bitmap."""
+    slots = np.zeros(SLOTS_PER_DAY, dtype=bool)
+    for start, end in intervals:
+        first = -(-start // SLOT_MINUTES)
+        last = min(end, MINUTES_PER_DAY) // SLOT_MINUTES
+        slots[first:last] = True
+    return np.packbits(slots).tobytes()
+
+
+def decode(bits):
+    return np.unpackbits(np.frombuffer(bytes(bits), dtype=np.uint8)).astype(bool)
+
+
+def job_mask(start_minutes, duration):
+    """Bitmap of the slots a job starting at start_minutes touches."""
+    slots = np.zeros(SLOTS_PER_DAY, dtype=bool)
+    first = start_minutes // SLOT_MINUTES
+    last = -(-(start_minutes + duration) // SLOT_MINUTES)
+    slots[first:last] = True
+    return np.packbits(slots)
+
+
+def refresh(provider_ids, date):
+    """Recompute (or write) the bitmaps of some providers for one day."""
+    ProviderDayBitmap = apps.get_model('providers', 'ProviderDayBitmap')
+    days = free_intervals(provider_ids, date, date, exclude_past=False)
+    rows = [
+        ProviderDayBitmap(provider_id=provider_id, date=date, bits=encode(provider_days[date]))
+        for provider_id, provider_days in days.items()
+    ]
+    # An upsert, as concurrent reads of a missing day may write the same rows
+    ProviderDayBitmap.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['provider', 'date'],
+        update_fields=['bits', 'updated_at'],
+    )
+    return {row.provider_id: row.bits for row in rows}
+
+
+def sync(provider_id, dates):
+    """Recompute those of a provider's bitmaps on some days that have been written."""
+    ProviderDayBitmap = apps.get_model('providers', 'ProviderDayBitmap')
+    written = ProviderDayBitmap.objects.filter(
+        provider_id=provider_id, date__in={date for date in dates if date}
+    ).values_list('date', flat=True)
+    for date in list(written):
+        refresh([provider_id], date)
+
+
+def invalidate(provider_id, since=None):
+    """Drop a provider's bitmaps from a day on, after its regular hours change."""
+    ProviderDayBitmap = apps.get_model('providers', 'ProviderDayBitmap')
+    ProviderDayBitmap.objects.filter(
+        provider_id=provider_id, date__gte=since or timezone.localdate()
+    ).delete()
+
+
+def day_bitmaps(provider_ids, date):
+    """{provider_id: bits} for one day, writing the bitmaps that are missing."""
+    ProviderDayBitmap = apps.get_model('providers', 'ProviderDayBitmap')
+    provider_ids = list(provider_ids)
+    bitmaps = {
+        provider_id: bytes(bits)
+        for provider_id, bits in ProviderDayBitmap.objects.filter(
+            provider_id__in=provider_ids, date=date
+        ).values_list('provider_id', 'bits')
+    }
+    missing = [provider_id for provider_id in provider_ids if provider_id not in bitmaps]
+    if missing:
+        bitmaps.update(refresh(missing, date))
+    return bitmaps
+
+
+def available_providers(provider_ids, date, start_time, duration):
+    """Ids of the providers free from start_time on date for duration minutes."""
+    start = to_minutes(start_time)
+    now = timezone.localtime()
+    if start + duration > MINUTES_PER_DAY:
+        return []
+    if date < now.date() or (date == now.date() and start <= to_minutes(now)):
+        return []
+    bitmaps = day_bitmaps(provider_ids, date)
+    if not bitmaps:
+        return []
+    ids = list(bitmaps)
+    matrix = np.frombuffer(b''.join(bitmaps[provider_id] for provider_id in ids), dtype=np.uint8)
+    matrix = matrix.reshape(len(ids), BITMAP_BYTES)
+    mask = job_mask(start, duration)
+    fits = ((matrix & mask) == mask).all(axis=1)
+    return [ids[index] for index in np.flatnonzero(fits)]
+
+
+def rebuild(days=14, chunk_size=500):
+    """Write every provider's bitmaps for the next days and drop past ones; returns rows written."""
+    ServiceProvider = apps.get_model('providers', 'ServiceProvider')
+    ProviderDayBitmap = apps.get_model('providers', 'ProviderDayBitmap')
+    today = timezone.localdate()
+    ProviderDayBitmap.objects.filter(date__lt=today).delete()
+    provider_ids = list(ServiceProvider.objects.values_list('pk', flat=True))
+    count = 0
+    for offset in range(days):
+        date = today + datetime.timedelta(days=offset)
+        for index in range(0, len(provider_ids), chunk_size):
+            count += len(refresh(provider_ids[index:index + chunk_size], date))
+    return count
@@ -0,0 +1,50 @@
+import operator
+from functools import reduce
+
+import django_filters
+from django.db.models import Exists, OuterRef, Q
+from rest_framework import filters
+
+from .models import ServiceProvider, ProviderSkill, normalize_skill
+
+class ProviderFilter(django_filters.FilterSet):
+    """
+    Skill filters answered from the ProviderSkill index.
+    
+    ``?skills=a,b`` matches providers with any of the skills and
+    ``?skills_all=a,b`` providers with all of them.
+    """
+    skills = django_filters.CharFilter(method='filter_any_skill')
+    skills_all = django_filters.CharFilter(method='filter_all_skills')
+    
+    class Meta:
+        model = ServiceProvider
+        fields = []
+    
+    def filter_any_skill(self, queryset, name, value):
+        return queryset.with_any_skill(value.split(','))
+    
+    def filter_all_skills(self, queryset, name, value):
+        return queryset.with_all_skills(value.split(','))
+
+class ProviderSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter whose terms also match whole skills.
+    
+    Skills are looked up in the ProviderSkill index instead of a LIKE over
+    the serialized skills JSON; search_fields should only name columns of
+    the provider row itself.
+    """
+    
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+        
+        lookups = [self.construct_search(str(field)) for field in search_fields]
+        for term in search_terms:
+            condition = reduce(operator.or_, [Q(**{lookup: term}) for lookup in lookups])
+            condition |= Exists(ProviderSkill.objects.filter(provider=OuterRef('pk'), name=normalize_skill(term)))
+            queryset = queryset.filter(condition)
+        return queryset
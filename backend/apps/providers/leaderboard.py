@@ -0,0 +1,135 @@
+"""
+Precomputed provider leaderboards.
+
+Every qualifying provider has one ProviderLeaderboardEntry per board it
+belongs to: all providers, its city, each of its service categories and
+each (city, category) pair. Entries carry the stats the boards are ranked
+by, so a top-N read is an index range scan whatever the number of reviews.
+A provider's entries are recomputed from its rating aggregates and rollup
+counters when they change (see signals.py and apps.reviews.signals);
+rebuild() recomputes every board.
+"""
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+PROVIDER_FIELDS = ('id', 'city', 'is_verified', 'average_rating', 'total_reviews', 'total_jobs_completed')
+ORDERINGS = {
+    'jobs': ('-leaderboard_entries__average_rating', '-leaderboard_entries__jobs_completed'),
+    'reviews': ('-leaderboard_entries__average_rating', '-leaderboard_entries__review_count'),
+}
+
+
+def get_min_rating():
+    return Decimal(str(getattr(settings, 'LEADERBOARD_MIN_RATING', 4.0)))
+
+
+def get_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', 10)
+
+
+def normalize_city(city):
+    return ' '.join((city or '').split()).lower()
+
+
+def board_rows(provider_id, city, category_ids, average_rating, review_count, jobs_completed):
+    """Field values of a provider's entries, one per board."""
+    cities = {'', normalize_city(city)}
+    categories = [None, *category_ids]
+    return [
+        {
+            'provider_id': provider_id,
+            'city': board_city,
+            'category_id': category_id,
+            'average_rating': average_rating,
+            'review_count': review_count,
+            'jobs_completed': jobs_completed,
+        }
+        for board_city in sorted(cities)
+        for category_id in categories
+    ]
+
+
+def _qualifies(is_verified, average_rating, review_count):
+    return is_verified and review_count > 0 and Decimal(str(average_rating)) >= get_min_rating()
+
+
+def _entries(registry, providers):
+    ProviderServiceCategory = registry.get_model('providers', 'ProviderServiceCategory')
+    ProviderLeaderboardEntry = registry.get_model('providers', 'ProviderLeaderboardEntry')
+    provider_ids = [provider.pk for provider in providers]
+    categories = {}
+    links = ProviderServiceCategory.objects.filter(provider_id__in=provider_ids)
+    for provider_id, category_id in links.values_list('provider_id', 'category_id'):
+        categories.setdefault(provider_id, []).append(category_id)
+
+    entries = []
+    for provider in providers:
+        if not _qualifies(provider.is_verified, provider.average_rating, provider.total_reviews):
+            continue
+        entries.extend(
+            ProviderLeaderboardEntry(**row)
+            for row in board_rows(
+                provider.pk, provider.city, categories.get(provider.pk, []),
+                provider.average_rating, provider.total_reviews, provider.total_jobs_completed,
+            )
+        )
+    return entries
+
+
+def refresh_providers(provider_ids, registry=django_apps):
+    """Recompute the entries of some providers."""
+    ServiceProvider = registry.get_model('providers', 'ServiceProvider')
+    ProviderLeaderboardEntry = registry.get_model('providers', 'ProviderLeaderboardEntry')
+    provider_ids = set(provider_ids)
+    providers = list(ServiceProvider.objects.filter(pk__in=provider_ids).only(*PROVIDER_FIELDS))
+    entries = _entries(registry, providers)
+    with transaction.atomic():
+        ProviderLeaderboardEntry.objects.filter(provider_id__in=provider_ids).delete()
+        ProviderLeaderboardEntry.objects.bulk_create(entries)
+
+
+def refresh_provider(provider_id):
+    refresh_providers([provider_id])
+
+
+def rebuild(registry=django_apps, chunk_size=500):
+    """Recompute every board; returns the number of entries written."""
+    ServiceProvider = registry.get_model('providers', 'ServiceProvider')
+    ProviderLeaderboardEntry = registry.get_model('providers', 'ProviderLeaderboardEntry')
+    count = 0
+    with transaction.atomic():
+        ProviderLeaderboardEntry.objects.all().delete()
+        providers = ServiceProvider.objects.filter(is_verified=True).only(*PROVIDER_FIELDS)
+        batch = []
+        for provider in providers.iterator(chunk_size=chunk_size):
+            batch.append(provider)
+            if len(batch) >= chunk_size:
+                count += len(ProviderLeaderboardEntry.objects.bulk_create(_entries(registry, batch)))
+                batch = []
+        if batch:
+            count += len(ProviderLeaderboardEntry.objects.bulk_create(_entries(registry, batch)))
+    return count
+
+
+def top_providers(city=None, category=None, order='jobs', min_reviews=0):
+    """
+    Providers of a board, best first.
+
+    ``order='jobs'`` breaks rating ties by completed jobs, ``'reviews'`` by
+    review count. Slice the result to the number of places wanted.
+    """
+    ServiceProvider = django_apps.get_model('providers', 'ServiceProvider')
+    try:
+        queryset = ServiceProvider.objects.filter(
+            leaderboard_entries__city=normalize_city(city),
+            leaderboard_entries__category=category or None,
+            leaderboard_entries__review_count__gte=min_reviews,
+        )
+    except DjangoValidationError:
+        raise ValidationError({'category': 'Not a valid category id.'})
+    return queryset.order_by(*ORDERINGS[order])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.providers.bitmaps import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute provider availability bitmaps for the coming days'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14)
+        parser.add_argument('--chunk-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        count = rebuild(days=options['days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} availability bitmaps.'))
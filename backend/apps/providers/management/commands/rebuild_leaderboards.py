@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.providers.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute every provider leaderboard'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        count = rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} leaderboard entries.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.providers import leaderboard, rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute provider booking/service counters, completion rates and response times'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        count = rollups.rebuild(chunk_size=options['chunk_size'])
+        leaderboard.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed stats of {count} providers.'))
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 21:21
+
+from django.db import migrations, models
+
+
+def populate_geohash(apps, schema_editor):
+    from apps.common.geo import encode_geohash
+
+    ServiceProvider = apps.get_model('providers', 'ServiceProvider')
+    providers = ServiceProvider.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for provider in providers.only('id', 'latitude', 'longitude').iterator():
+        provider.geohash = encode_geohash(provider.latitude, provider.longitude)
+        provider.save(update_fields=['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0003_alter_serviceprovider_working_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['geohash'], name='providers_s_geohash_17b922_idx'),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-17 21:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_skill_index(apps, schema_editor):
+    from apps.providers.models import normalize_skills
+
+    ServiceProvider = apps.get_model('providers', 'ServiceProvider')
+    ProviderSkill = apps.get_model('providers', 'ProviderSkill')
+    rows = []
+    for provider in ServiceProvider.objects.only('id', 'skills').iterator():
+        rows.extend(ProviderSkill(provider_id=provider.pk, name=name) for name in normalize_skills(provider.skills))
+        if len(rows) >= 1000:
+            ProviderSkill.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    ProviderSkill.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0004_serviceprovider_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_index', to='providers.serviceprovider')),
+            ],
+            options={
+                'verbose_name': 'Provider Skill',
+                'verbose_name_plural': 'Provider Skills',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='providerskill',
+            index=models.Index(fields=['name', 'provider'], name='providers_p_name_1c2b8a_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='providerskill',
+            unique_together={('provider', 'name')},
+        ),
+        migrations.RunPython(populate_skill_index, migrations.RunPython.noop),
+    ]
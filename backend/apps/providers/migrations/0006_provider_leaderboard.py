@@ -0,0 +1,53 @@
+# Generated by Django 4.2 on 2026-10-17 21:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_leaderboards(apps, schema_editor):
+    from apps.providers.leaderboard import rebuild
+
+    rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_amount_indexes'),
+        ('reviews', '0002_review_reviews_rev_provide_7fea6b_idx'),
+        ('services', '0004_servicepackage_effective_price_index'),
+        ('providers', '0005_provider_skill_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderLeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('average_rating', models.DecimalField(decimal_places=2, max_digits=3)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('jobs_completed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='services.servicecategory')),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='providers.serviceprovider')),
+            ],
+            options={
+                'verbose_name': 'Provider Leaderboard Entry',
+                'verbose_name_plural': 'Provider Leaderboard Entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='providerleaderboardentry',
+            index=models.Index(fields=['city', 'category', '-average_rating', '-jobs_completed'], name='providers_board_jobs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='providerleaderboardentry',
+            index=models.Index(fields=['city', 'category', '-average_rating', '-review_count'], name='providers_board_reviews_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='providerleaderboardentry',
+            unique_together={('city', 'category', 'provider')},
+        ),
+        migrations.RunPython(populate_leaderboards, migrations.RunPython.noop),
+    ]
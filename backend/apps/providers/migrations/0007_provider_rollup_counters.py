@@ -0,0 +1,53 @@
+# Generated by Django 4.2 on 2026-10-17 21:36
+
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    from apps.providers import leaderboard, rollups
+
+    rollups.rebuild(apps)
+    leaderboard.rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_amount_indexes'),
+        ('services', '0004_servicepackage_effective_price_index'),
+        ('providers', '0006_provider_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='active_bookings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='closed_bookings',
+            field=models.PositiveIntegerField(default=0, help_text='Completed, cancelled, rejected or no-show bookings'),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='responded_bookings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='response_minutes_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='total_bookings',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='total_services',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    from apps.providers import leaderboard
+    from apps.reviews import ratings
+
+    ratings.rebuild(apps)
+    leaderboard.rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_review_reviews_rev_provide_7fea6b_idx'),
+        ('services', '0005_rating_aggregates'),
+        ('providers', '0007_provider_rollup_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='communication_rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='communication_rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='professionalism_rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='professionalism_rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='punctuality_rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='punctuality_rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='quality_rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='quality_rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='rating_score',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Bayesian-smoothed rating used for ranking', max_digits=4),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['rating_score'], name='providers_s_rating__9f1202_idx'),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
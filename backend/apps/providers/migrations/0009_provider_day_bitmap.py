@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-17 21:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0008_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderDayBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bits', models.BinaryField(max_length=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_bitmaps', to='providers.serviceprovider')),
+            ],
+            options={
+                'verbose_name': 'Provider Day Bitmap',
+                'verbose_name_plural': 'Provider Day Bitmaps',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='providerdaybitmap',
+            index=models.Index(fields=['date', 'provider'], name='providers_p_date_5a1e16_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='providerdaybitmap',
+            unique_together={('provider', 'date')},
+        ),
+    ]
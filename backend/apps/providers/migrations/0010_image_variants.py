@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0009_provider_day_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='business_logo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='WebP variants of the logo, see apps.common.images'),
+        ),
+    ]
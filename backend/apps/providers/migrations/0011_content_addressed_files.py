@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 21:54
+
+import apps.common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('providers', '0010_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='providerdocument',
+            name='document_file',
+            field=models.FileField(storage=apps.common.storage.get_blob_storage, upload_to='provider_documents/'),
+        ),
+    ]
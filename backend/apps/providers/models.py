@@ -1,8 +1,48 @@
 from django.db import models
+from django.db.models import Count, Exists, OuterRef
 from django.core.validators import MinValueValidator, MaxValueValidator
 from apps.common.models import BaseModel, Address
+from apps.common.geo import encode_geohash
+from apps.common.storage import get_blob_storage
 from apps.users.models import User
 
+SKILL_MAX_LENGTH = 100
+
+
+def normalize_skill(value):
+    """Canonical form of a skill/tag: lowercase with single spaces."""
+    return ' '.join(str(value).split()).lower()[:SKILL_MAX_LENGTH]
+
+
+def normalize_skills(values):
+    return {skill for skill in map(normalize_skill, values or []) if skill}
+
+
+class ServiceProviderQuerySet(models.QuerySet):
+    
+    def with_any_skill(self, skills):
+        """Providers having at least one of the skills, read from the skill index."""
+        skills = normalize_skills(skills)
+        if not skills:
+            return self
+        return self.filter(Exists(
+            ProviderSkill.objects.filter(provider=OuterRef('pk'), name__in=skills)
+        ))
+    
+    def with_all_skills(self, skills):
+        """Providers having every one of the skills, read from the skill index."""
+        skills = normalize_skills(skills)
+        if not skills:
+            return self
+        matches = (
+            ProviderSkill.objects.filter(name__in=skills)
+            .values('provider')
+            .annotate(matched=Count('name'))
+            .filter(matched=len(skills))
+            .values('provider')
+        )
+        return self.filter(pk__in=matches)
+
 
 class ServiceProvider(BaseModel, Address):
     """Service Provider Profile."""
@@ -27,6 +67,12 @@ class ServiceProvider(BaseModel, Address):
         blank=True, 
         null=True
     )
+    business_logo_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="WebP variants of the logo, see apps.common.images"
+    )
     
     # Professional Information
     years_of_experience = models.PositiveIntegerField(
@@ -93,6 +139,35 @@ class ServiceProvider(BaseModel, Address):
         help_text="Average response time in minutes"
     )
     
+    # Rollup counters behind the fields above, maintained by rollups.py
+    total_services = models.PositiveIntegerField(default=0)
+    total_bookings = models.PositiveIntegerField(default=0)
+    active_bookings = models.PositiveIntegerField(default=0)
+    closed_bookings = models.PositiveIntegerField(
+        default=0,
+        help_text="Completed, cancelled, rejected or no-show bookings"
+    )
+    responded_bookings = models.PositiveIntegerField(default=0)
+    response_minutes_total = models.PositiveIntegerField(default=0)
+    
+    # Running sums of approved review ratings behind average_rating and
+    # total_reviews, maintained by apps.reviews.ratings
+    rating_sum = models.PositiveIntegerField(default=0)
+    punctuality_rating_sum = models.PositiveIntegerField(default=0)
+    punctuality_rating_count = models.PositiveIntegerField(default=0)
+    professionalism_rating_sum = models.PositiveIntegerField(default=0)
+    professionalism_rating_count = models.PositiveIntegerField(default=0)
+    quality_rating_sum = models.PositiveIntegerField(default=0)
+    quality_rating_count = models.PositiveIntegerField(default=0)
+    communication_rating_sum = models.PositiveIntegerField(default=0)
+    communication_rating_count = models.PositiveIntegerField(default=0)
+    rating_score = models.DecimalField(
+        max_digits=4,
+        decimal_places=3,
+        default=0,
+        help_text="Bayesian-smoothed rating used for ranking"
+    )
+    
     # Verification Status
     is_verified = models.BooleanField(default=False)
     verification_status = models.CharField(
@@ -120,6 +195,11 @@ class ServiceProvider(BaseModel, Address):
         default=0.00
     )
     
+    # Geohash of latitude/longitude, kept in sync by save()
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+    
+    objects = ServiceProviderQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Service Provider'
         verbose_name_plural = 'Service Providers'
@@ -128,26 +208,118 @@ class ServiceProvider(BaseModel, Address):
             models.Index(fields=['average_rating']),
             models.Index(fields=['is_verified']),
             models.Index(fields=['user']),
+            models.Index(fields=['geohash']),
+            models.Index(fields=['rating_score']),
         ]
     
     def __str__(self):
         return f"{self.business_name}"
     
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if update_fields is None or 'skills' in update_fields:
+            self.sync_skills(adding=adding)
+    
+    def sync_skills(self, adding=False):
+        """Bring the ProviderSkill index rows in line with the skills list."""
+        skills = normalize_skills(self.skills)
+        existing = set() if adding else set(self.skill_index.values_list('name', flat=True))
+        stale = existing - skills
+        if stale:
+            self.skill_index.filter(name__in=stale).delete()
+        if skills - existing:
+            ProviderSkill.objects.bulk_create(
+                [ProviderSkill(provider=self, name=name) for name in sorted(skills - existing)],
+                ignore_conflicts=True,
+            )
+    
     @property
     def full_address(self):
         return f"{self.address_line1}, {self.city}, {self.state}, {self.country} - {self.postal_code}"
     
-    def update_rating(self):
-        """Update average rating from reviews."""
-        from django.apps import apps
-        Review = apps.get_model('reviews', 'Review')
-        from django.db.models import Avg
+    @property
+    def detailed_ratings(self):
+        """Average of each detailed rating, None where no review rated it."""
+        from apps.reviews.ratings import DIMENSIONS, average
         
-        reviews = Review.objects.filter(provider=self)
-        if reviews.exists():
-            self.average_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0.00
-            self.total_reviews = reviews.count()
-            self.save(update_fields=['average_rating', 'total_reviews'])
+        ratings = {}
+        for dimension in DIMENSIONS:
+            count = getattr(self, f'{dimension}_rating_count')
+            ratings[dimension] = average(getattr(self, f'{dimension}_rating_sum'), count) if count else None
+        return ratings
+
+
+class ProviderSkill(models.Model):
+    """Normalized skill index, one row per provider and skill."""
+    provider = models.ForeignKey(
+        ServiceProvider,
+        on_delete=models.CASCADE,
+        related_name='skill_index'
+    )
+    name = models.CharField(max_length=SKILL_MAX_LENGTH)
+    
+    class Meta:
+        verbose_name = 'Provider Skill'
+        verbose_name_plural = 'Provider Skills'
+        unique_together = ['provider', 'name']
+        indexes = [
+            models.Index(fields=['name', 'provider']),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider.business_name} - {self.name}"
+
+
+class ProviderLeaderboardEntry(models.Model):
+    """
+    A provider's stats on one leaderboard, maintained by leaderboard.py.
+    
+    A board is a (city, category) pair; an empty city or a null category
+    means the board spans all cities or all categories.
+    """
+    city = models.CharField(max_length=100, blank=True)
+    category = models.ForeignKey(
+        'services.ServiceCategory',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='leaderboard_entries'
+    )
+    provider = models.ForeignKey(
+        ServiceProvider,
+        on_delete=models.CASCADE,
+        related_name='leaderboard_entries'
+    )
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2)
+    review_count = models.PositiveIntegerField(default=0)
+    jobs_completed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Provider Leaderboard Entry'
+        verbose_name_plural = 'Provider Leaderboard Entries'
+        unique_together = ['city', 'category', 'provider']
+        indexes = [
+            models.Index(
+                fields=['city', 'category', '-average_rating', '-jobs_completed'],
+                name='providers_board_jobs_idx'
+            ),
+            models.Index(
+                fields=['city', 'category', '-average_rating', '-review_count'],
+                name='providers_board_reviews_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider.business_name} - {self.city or 'all'} / {self.category_id or 'all'}"
 
 
 class ProviderServiceCategory(BaseModel):
@@ -186,7 +358,7 @@ class ProviderDocument(BaseModel):
         ]
     )
     document_name = models.CharField(max_length=255)
-    document_file = models.FileField(upload_to='provider_documents/')
+    document_file = models.FileField(upload_to='provider_documents/', storage=get_blob_storage)
     is_verified = models.BooleanField(default=False)
     verified_by = models.ForeignKey(
         User,
@@ -226,4 +398,29 @@ class ProviderAvailability(BaseModel):
         ordering = ['date', 'start_time']
     
     def __str__(self):
-        return f"{self.provider.business_name} - {self.date} {self.start_time}-{self.end_time}"
\ No newline at end of file
+        return f"{self.provider.business_name} - {self.date} {self.start_time}-{self.end_time}"
+
+class ProviderDayBitmap(models.Model):
+    """
+    A provider's free time on one day as a bitset of 15 minute slots,
+    maintained by bitmaps.py from its hours, availabilities and bookings.
+    """
+    provider = models.ForeignKey(
+        ServiceProvider,
+        on_delete=models.CASCADE,
+        related_name='day_bitmaps'
+    )
+    date = models.DateField()
+    bits = models.BinaryField(max_length=12)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Provider Day Bitmap'
+        verbose_name_plural = 'Provider Day Bitmaps'
+        unique_together = ['provider', 'date']
+        indexes = [
+            models.Index(fields=['date', 'provider']),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider_id} - {self.date}"
@@ -0,0 +1,201 @@
+"""
+Provider performance rollups.
+
+Creating, deleting or changing the status of a booking applies counter
+deltas to its provider with one UPDATE of F() expressions, which also
+re-derives completion_rate and response_time_minutes from the updated
+counters. Concurrent writers therefore never lose an update and the stats
+endpoint reads a single row. Response times come from the status history:
+only a booking's first response is counted, by transitions.py as it writes
+the history row and by rebuild(), which recomputes every provider from the
+bookings, services and status history tables to repair drift.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Value
+from django.db.models.functions import Coalesce, Greatest, NullIf, Round
+from django.utils import timezone
+
+ACTIVE_STATUSES = {'pending', 'confirmed', 'accepted', 'in_progress'}
+CLOSED_STATUSES = {'completed', 'cancelled', 'rejected', 'no_show'}
+# A provider responds by moving an awaiting booking to a response status
+AWAITING_RESPONSE_STATUSES = {'pending', 'confirmed'}
+RESPONSE_STATUSES = {'accepted', 'rejected'}
+RESPONSES = Q(old_status__in=AWAITING_RESPONSE_STATUSES, new_status__in=RESPONSE_STATUSES)
+
+RATE_PLACES = Decimal('0.01')
+DEFAULT_COMPLETION_RATE = Decimal('100.00')
+COUNTERS = [
+    'total_services', 'total_bookings', 'active_bookings', 'total_jobs_completed',
+    'closed_bookings', 'responded_bookings', 'response_minutes_total',
+]
+
+
+def status_deltas(old_status, new_status):
+    """Counter deltas for a booking moving between statuses (None: no booking)."""
+    deltas = Counter()
+    for booking_status, sign in ((old_status, -1), (new_status, 1)):
+        if booking_status is None:
+            continue
+        deltas['total_bookings'] += sign
+        if booking_status in ACTIVE_STATUSES:
+            deltas['active_bookings'] += sign
+        if booking_status in CLOSED_STATUSES:
+            deltas['closed_bookings'] += sign
+        if booking_status == 'completed':
+            deltas['total_jobs_completed'] += sign
+    return deltas
+
+
+def is_response(old_status, new_status):
+    return old_status in AWAITING_RESPONSE_STATUSES and new_status in RESPONSE_STATUSES
+
+
+def response_deltas(old_status, new_status, created_at, responded_at):
+    if not is_response(old_status, new_status):
+        return Counter()
+    return Counter(responded_bookings=1, response_minutes_total=minutes_between(created_at, responded_at))
+
+
+def minutes_between(start, end):
+    return max(0, int((end - start).total_seconds() // 60))
+
+
+def completion_rate(completed, closed):
+    if not closed:
+        return DEFAULT_COMPLETION_RATE
+    return (Decimal(completed * 100) / closed).quantize(RATE_PLACES, rounding=ROUND_HALF_UP)
+
+
+def response_time(minutes_total, responded):
+    return minutes_total // responded if responded else 0
+
+
+def apply_deltas(provider_id, deltas):
+    """Add deltas to a provider's counters and re-derive its rates, in one UPDATE."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    ServiceProvider = django_apps.get_model('providers', 'ServiceProvider')
+
+    def counter(name):
+        # Clamped so drift (e.g. rows written with bulk_create) cannot go negative
+        return Greatest(F(name) + deltas.get(name, 0), 0)
+
+    values = {name: counter(name) for name in deltas}
+    if deltas.keys() & {'total_jobs_completed', 'closed_bookings'}:
+        values['completion_rate'] = Coalesce(
+            Round(counter('total_jobs_completed') * Value(100.0) / NullIf(counter('closed_bookings'), 0), 2),
+            Value(DEFAULT_COMPLETION_RATE),
+            output_field=DecimalField(max_digits=5, decimal_places=2),
+        )
+    if deltas.keys() & {'responded_bookings', 'response_minutes_total'}:
+        values['response_time_minutes'] = Coalesce(
+            counter('response_minutes_total') / NullIf(counter('responded_bookings'), 0),
+            0,
+        )
+    # updated_at too, it versions the provider's ETag
+    ServiceProvider.objects.filter(pk=provider_id).update(updated_at=timezone.now(), **values)
+
+
+def record_status_change(provider_id, old_status, new_status):
+    """Roll up one booking being created (old None), changed or deleted (new None)."""
+    apply_deltas(provider_id, status_deltas(old_status, new_status))
+
+
+def first_responses(booking_ids):
+    """Those of some bookings with exactly one response in their status history."""
+    BookingStatusHistory = django_apps.get_model('bookings', 'BookingStatusHistory')
+    return set(
+        BookingStatusHistory.objects.filter(RESPONSES, booking_id__in=booking_ids)
+        .values('booking_id').annotate(responses=Count('id')).filter(responses=1)
+        .values_list('booking_id', flat=True)
+    )
+
+
+def record_status_changes(changes, changed_at):
+    """
+    Roll up (booking_id, provider_id, old_status, new_status, created_at)
+    rows changed at changed_at, one UPDATE per provider. Their history rows
+    must be written already, so a response is counted only if it is the
+    booking's first.
+    """
+    changes = list(changes)
+    first = first_responses([
+        booking_id for booking_id, _, old_status, new_status, _ in changes
+        if is_response(old_status, new_status)
+    ])
+    per_provider = defaultdict(Counter)
+    for booking_id, provider_id, old_status, new_status, created_at in changes:
+        per_provider[provider_id].update(status_deltas(old_status, new_status))
+        if booking_id in first:
+            per_provider[provider_id].update(response_deltas(old_status, new_status, created_at, changed_at))
+    with transaction.atomic():
+        for provider_id, deltas in per_provider.items():
+            apply_deltas(provider_id, deltas)
+    return set(per_provider)
+
+
+def _booking_counts(Booking):
+    counts = Booking.objects.values('provider').annotate(
+        total_bookings=Count('id'),
+        active_bookings=Count('id', filter=Q(status__in=ACTIVE_STATUSES)),
+        closed_bookings=Count('id', filter=Q(status__in=CLOSED_STATUSES)),
+        total_jobs_completed=Count('id', filter=Q(status='completed')),
+    )
+    return {row.pop('provider'): row for row in counts}
+
+
+def _response_counts(BookingStatusHistory):
+    """Minutes to the first response of every booking, summed per provider."""
+    responses = BookingStatusHistory.objects.filter(RESPONSES).order_by('booking_id', 'created_at').values_list(
+        'booking_id', 'booking__provider_id', 'booking__created_at', 'created_at'
+    )
+    counts = defaultdict(Counter)
+    seen = set()
+    for booking_id, provider_id, created_at, responded_at in responses.iterator():
+        if booking_id in seen:
+            continue
+        seen.add(booking_id)
+        counts[provider_id].update(response_deltas('pending', 'accepted', created_at, responded_at))
+    return counts
+
+
+def rebuild(registry=django_apps, chunk_size=500):
+    """Recompute every provider's counters and rates; returns the number of providers."""
+    ServiceProvider = registry.get_model('providers', 'ServiceProvider')
+    Booking = registry.get_model('bookings', 'Booking')
+    BookingStatusHistory = registry.get_model('bookings', 'BookingStatusHistory')
+    Service = registry.get_model('services', 'Service')
+
+    bookings = _booking_counts(Booking)
+    responses = _response_counts(BookingStatusHistory)
+    services = dict(Service.objects.values('provider').annotate(count=Count('id')).values_list('provider', 'count'))
+
+    fields = COUNTERS + ['completion_rate', 'response_time_minutes']
+    count = 0
+    batch = []
+    with transaction.atomic():
+        for provider in ServiceProvider.objects.only('id').iterator(chunk_size=chunk_size):
+            values = dict.fromkeys(COUNTERS, 0)
+            values.update(bookings.get(provider.pk, {}))
+            values.update(responses.get(provider.pk, {}))
+            values['total_services'] = services.get(provider.pk, 0)
+            values['completion_rate'] = completion_rate(values['total_jobs_completed'], values['closed_bookings'])
+            values['response_time_minutes'] = response_time(
+                values['response_minutes_total'], values['responded_bookings']
+            )
+            for name, value in values.items():
+                setattr(provider, name, value)
+            batch.append(provider)
+            if len(batch) >= chunk_size:
+                ServiceProvider.objects.bulk_update(batch, fields)
+                count += len(batch)
+                batch = []
+        if batch:
+            ServiceProvider.objects.bulk_update(batch, fields)
+            count += len(batch)
+    return count
@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from apps.common.serializers import DynamicFieldsModelSerializer, ImageVariantsField
 from .models import ServiceProvider, ProviderDocument, ProviderAvailability
+from .slots import get_max_days, get_max_providers
 from apps.services.serializers import ServiceCategorySerializer, ServiceSerializer
 from apps.users.serializers import UserSerializer
 
@@ -16,30 +18,57 @@ class ProviderAvailabilitySerializer(serializers.ModelSerializer):
         fields = ['id', 'date', 'start_time', 'end_time', 'is_available', 'notes']
         read_only_fields = ['id']
 
-class ServiceProviderSerializer(serializers.ModelSerializer):
+class FreeSlotQuerySerializer(serializers.Serializer):
+    """Query parameters of a free-slot search."""
+    providers = serializers.CharField(required=False, help_text="Comma separated provider ids")
+    start_date = serializers.DateField()
+    end_date = serializers.DateField(required=False)
+    duration = serializers.IntegerField(required=False, min_value=15, max_value=24 * 60)
+    step = serializers.IntegerField(required=False, default=30, min_value=5, max_value=24 * 60)
+    
+    def validate_providers(self, value):
+        field = serializers.UUIDField()
+        providers = [field.run_validation(item.strip()) for item in value.split(',') if item.strip()]
+        if len(providers) > get_max_providers():
+            raise serializers.ValidationError(f"At most {get_max_providers()} providers per request.")
+        return providers
+    
+    def validate(self, data):
+        data.setdefault('end_date', data['start_date'])
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({'end_date': "Must not be before start_date."})
+        if (data['end_date'] - data['start_date']).days >= get_max_days():
+            raise serializers.ValidationError({'end_date': f"At most {get_max_days()} days per request."})
+        return data
+
+class ServiceProviderSerializer(DynamicFieldsModelSerializer):
     user = UserSerializer(read_only=True)
     service_categories = ServiceCategorySerializer(many=True, read_only=True)
     documents = ProviderDocumentSerializer(many=True, read_only=True)
     availabilities = ProviderAvailabilitySerializer(many=True, read_only=True)
     services = ServiceSerializer(many=True, read_only=True)
     full_address = serializers.CharField(read_only=True)
+    business_logo_variants = ImageVariantsField()
     
     class Meta:
         model = ServiceProvider
         fields = ['id', 'user', 'business_name', 'business_description',
+                 'business_logo', 'business_logo_variants',
                  'years_of_experience', 'certifications', 'skills',
                  'service_categories', 'services_offered', 'is_available',
                  'available_from', 'available_to', 'working_days',
-                 'emergency_service', 'average_rating', 'total_reviews',
+                 'emergency_service', 'average_rating', 'total_reviews', 'rating_score',
                  'total_jobs_completed', 'completion_rate', 'response_time_minutes',
                  'is_verified', 'verification_status', 'hourly_rate',
                  'min_service_charge', 'address_line1', 'address_line2',
                  'city', 'state', 'country', 'postal_code', 'latitude',
                  'longitude', 'full_address', 'documents', 'availabilities',
                  'services', 'created_at']
-        read_only_fields = ['id', 'average_rating', 'total_reviews',
+        read_only_fields = ['id', 'average_rating', 'total_reviews', 'rating_score',
                            'total_jobs_completed', 'completion_rate',
                            'response_time_minutes', 'is_verified', 'created_at']
+        expandable_fields = ['service_categories', 'documents',
+                            'availabilities', 'services']
 
 class ServiceProviderCreateSerializer(serializers.ModelSerializer):
     user_id = serializers.IntegerField(write_only=True)
@@ -72,4 +101,10 @@ class ProviderProfileUpdateSerializer(serializers.ModelSerializer):
                  'skills', 'available_from', 'available_to', 'working_days',
                  'emergency_service', 'hourly_rate', 'min_service_charge',
                  'address_line1', 'address_line2', 'city', 'state',
-                 'country', 'postal_code', 'latitude', 'longitude']
\ No newline at end of file
+                 'country', 'postal_code', 'latitude', 'longitude']
+
+class AvailableProviderQuerySerializer(serializers.Serializer):
+    """Query parameters of a search for providers free to take a job."""
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    duration = serializers.IntegerField(min_value=15, max_value=24 * 60)
@@ -0,0 +1,89 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ServiceProvider, ProviderServiceCategory, ProviderAvailability
+from . import bitmaps, leaderboard, rollups
+
+# Provider fields that decide which boards a provider is on
+LEADERBOARD_FIELDS = {'city', 'is_verified'}
+# Provider fields that decide its regular hours
+SCHEDULE_FIELDS = {'is_available', 'working_days', 'available_from', 'available_to'}
+# Booking fields that decide the time it takes up
+BOOKING_TIME_FIELDS = {'status', 'scheduled_date', 'scheduled_time', 'estimated_duration_minutes'}
+
+
+@receiver(post_save, sender='bookings.Booking')
+def update_rollups_for_booking(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    old_status = None if created else instance.loaded_status
+    if not created and old_status is None:
+        # Loaded without its status; the rollups cannot tell what changed
+        return
+    if old_status == instance.status:
+        return
+    # Response times are rolled up from the status history, see transitions.py
+    rollups.record_status_change(instance.provider_id, old_status, instance.status)
+    if 'completed' in (old_status, instance.status):
+        leaderboard.refresh_provider(instance.provider_id)
+
+
+@receiver(post_delete, sender='bookings.Booking')
+def update_rollups_for_deleted_booking(sender, instance, **kwargs):
+    rollups.record_status_change(instance.provider_id, instance.loaded_status or instance.status, None)
+    if instance.status == 'completed':
+        leaderboard.refresh_provider(instance.provider_id)
+
+
+@receiver(post_save, sender='bookings.Booking')
+def sync_bitmaps_for_booking(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not BOOKING_TIME_FIELDS & set(update_fields):
+        return
+    # The date the booking was loaded with is still on record until save() returns
+    bitmaps.sync(instance.provider_id, {instance.scheduled_date, instance.loaded_scheduled_date})
+
+
+@receiver(post_delete, sender='bookings.Booking')
+def sync_bitmaps_for_deleted_booking(sender, instance, **kwargs):
+    bitmaps.sync(instance.provider_id, {instance.scheduled_date})
+
+
+@receiver(post_save, sender=ProviderAvailability)
+@receiver(post_delete, sender=ProviderAvailability)
+def sync_bitmaps_for_availability(sender, instance, **kwargs):
+    bitmaps.sync(instance.provider_id, {instance.date})
+
+
+@receiver(post_save, sender='services.Service')
+def count_created_service(sender, instance, created, **kwargs):
+    if created:
+        rollups.apply_deltas(instance.provider_id, {'total_services': 1})
+
+
+@receiver(post_delete, sender='services.Service')
+def count_deleted_service(sender, instance, **kwargs):
+    rollups.apply_deltas(instance.provider_id, {'total_services': -1})
+
+
+@receiver(post_save, sender=ServiceProvider)
+def refresh_leaderboard_for_provider(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not LEADERBOARD_FIELDS & set(update_fields):
+        return
+    leaderboard.refresh_provider(instance.pk)
+
+
+@receiver(post_save, sender=ProviderServiceCategory)
+@receiver(post_delete, sender=ProviderServiceCategory)
+def refresh_leaderboard_for_category(sender, instance, **kwargs):
+    leaderboard.refresh_provider(instance.provider_id)
+
+
+@receiver(post_save, sender=ServiceProvider)
+def invalidate_bitmaps_for_provider(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not SCHEDULE_FIELDS & set(update_fields):
+        return
+    bitmaps.invalidate(instance.pk)
@@ -0,0 +1,182 @@
+"""
+Free-slot computation.
+
+A provider's day starts from its working hours (working_days,
+available_from/available_to), gains the ProviderAvailability rows marked
+available and loses the rows marked unavailable and the time taken by its
+active bookings. Days are IntervalSets of minutes since midnight, so each
+step is a merge of sorted intervals. One query per table answers a whole
+batch of providers over a date range.
+"""
+import datetime
+from bisect import bisect_left, bisect_right
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+
+MINUTES_PER_DAY = 24 * 60
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+# Bookings in these statuses take up the provider's time
+BLOCKING_STATUSES = ['pending', 'confirmed', 'accepted', 'in_progress', 'rescheduled']
+
+
+class IntervalSet:
+    """Disjoint, sorted half-open [start, end) integer intervals."""
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in intervals:
+            self.add(start, end)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def __eq__(self, other):
+        return isinstance(other, IntervalSet) and list(self) == list(other)
+
+    def __repr__(self):
+        return f'IntervalSet({list(self)!r})'
+
+    def add(self, start, end):
+        if start >= end:
+            return
+        # Intervals overlapping or touching [start, end) are merged into it
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def remove(self, start, end):
+        if start >= end:
+            return
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end)
+        if first >= last:
+            return
+        pieces = []
+        if self.starts[first] < start:
+            pieces.append((self.starts[first], start))
+        if self.ends[last - 1] > end:
+            pieces.append((end, self.ends[last - 1]))
+        self.starts[first:last] = [piece[0] for piece in pieces]
+        self.ends[first:last] = [piece[1] for piece in pieces]
+
+    def covers(self, start, end):
+        """Whether [start, end) lies inside a single interval."""
+        position = bisect_right(self.starts, start) - 1
+        return position >= 0 and self.ends[position] >= end
+
+    def slots(self, duration, step):
+        """Start minutes of every [start, start + duration) that fits, on a step grid."""
+        starts = []
+        for start, end in self:
+            first = -(-start // step) * step
+            starts.extend(range(first, end - duration + 1, step))
+        return starts
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes):
+    if minutes >= MINUTES_PER_DAY:
+        return '24:00'
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def get_max_days():
+    return getattr(settings, 'SLOT_MAX_DAYS', 31)
+
+
+def get_max_providers():
+    return getattr(settings, 'SLOT_MAX_PROVIDERS', 50)
+
+
+def _dates(start_date, end_date):
+    return [start_date + datetime.timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+def _working_hours(provider, date):
+    if not provider.is_available or WEEKDAYS[date.weekday()] not in (provider.working_days or []):
+        return IntervalSet()
+    return IntervalSet([(to_minutes(provider.available_from), to_minutes(provider.available_to))])
+
+
+def free_intervals(provider_ids, start_date, end_date, exclude_past=True):
+    """
+    {provider_id: {date: IntervalSet of free minutes}} for a batch of providers.
+
+    With ``exclude_past`` the time of today that has already gone is not free.
+    """
+    ServiceProvider = apps.get_model('providers', 'ServiceProvider')
+    ProviderAvailability = apps.get_model('providers', 'ProviderAvailability')
+    Booking = apps.get_model('bookings', 'Booking')
+
+    providers = ServiceProvider.objects.filter(pk__in=provider_ids).only(
+        'id', 'is_available', 'working_days', 'available_from', 'available_to'
+    )
+    dates = _dates(start_date, end_date)
+    days = {
+        provider.pk: {date: _working_hours(provider, date) for date in dates}
+        for provider in providers
+    }
+
+    availabilities = ProviderAvailability.objects.filter(
+        provider_id__in=days, date__range=(start_date, end_date)
+    ).order_by('is_available').values_list('provider_id', 'date', 'start_time', 'end_time', 'is_available')
+    # Unavailable rows sort first but must be applied after the additions
+    blocked = []
+    for provider_id, date, start_time, end_time, is_available in availabilities:
+        if is_available:
+            days[provider_id][date].add(to_minutes(start_time), to_minutes(end_time))
+        else:
+            blocked.append((provider_id, date, to_minutes(start_time), to_minutes(end_time)))
+    for provider_id, date, start, end in blocked:
+        days[provider_id][date].remove(start, end)
+
+    bookings = Booking.objects.filter(
+        provider_id__in=days,
+        scheduled_date__range=(start_date, end_date),
+        status__in=BLOCKING_STATUSES,
+    ).values_list('provider_id', 'scheduled_date', 'scheduled_time', 'estimated_duration_minutes')
+    for provider_id, date, scheduled_time, duration in bookings:
+        start = to_minutes(scheduled_time)
+        days[provider_id][date].remove(start, start + duration)
+
+    now = timezone.localtime()
+    if exclude_past and start_date <= now.date() <= end_date:
+        for provider_days in days.values():
+            provider_days[now.date()].remove(0, to_minutes(now) + 1)
+    return days
+
+
+def free_slots(provider_ids, start_date, end_date, duration=None, step=30):
+    """
+    Free time of each provider per day.
+
+    Without a duration the free intervals are returned; with one, the start
+    times (every ``step`` minutes) of the slots that can fit a job that long.
+    """
+    result = {}
+    for provider_id, provider_days in free_intervals(provider_ids, start_date, end_date).items():
+        result[provider_id] = {}
+        for date, intervals in provider_days.items():
+            if duration:
+                result[provider_id][date] = [
+                    {'start': to_time(start), 'end': to_time(start + duration)}
+                    for start in intervals.slots(duration, step)
+                ]
+            else:
+                result[provider_id][date] = [
+                    {'start': to_time(start), 'end': to_time(end)} for start, end in intervals
+                ]
+    return result
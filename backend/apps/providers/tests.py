@@ -1,3 +1,289 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.bookings import transitions
+from apps.bookings.models import Booking
+from apps.common import testing
+from apps.providers import bitmaps, rollups
+from apps.providers.models import (
+    ProviderAvailability, ProviderDayBitmap, ProviderLeaderboardEntry, ProviderServiceCategory,
+    ServiceProvider,
+)
+from apps.providers.slots import IntervalSet, free_intervals, free_slots
+
+ALL_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+class IntervalSetTests(TestCase):
+    
+    def test_add_and_remove(self):
+        intervals = IntervalSet([(0, 10), (20, 30)])
+        intervals.add(10, 20)
+        self.assertEqual(list(intervals), [(0, 30)])
+        intervals.remove(5, 8)
+        self.assertEqual(list(intervals), [(0, 5), (8, 30)])
+        intervals.remove(0, 100)
+        self.assertFalse(intervals)
+        
+        intervals = IntervalSet([(0, 10), (20, 30), (40, 50)])
+        intervals.add(5, 45)
+        intervals.add(60, 70)
+        intervals.add(55, 56)
+        self.assertEqual(list(intervals), [(0, 50), (55, 56), (60, 70)])
+        intervals.remove(50, 60)
+        self.assertEqual(list(intervals), [(0, 50), (60, 70)])
+        self.assertTrue(intervals.covers(10, 50))
+        self.assertFalse(intervals.covers(45, 61))
+        self.assertEqual(IntervalSet([(5, 70)]).slots(30, 30), [30])
+
+
+class SlotTests(TestCase):
+    
+    def setUp(self):
+        self.day = datetime.date.today() + datetime.timedelta(days=2)
+        self.provider = testing.provider(
+            working_days=ALL_DAYS, available_from=datetime.time(9), available_to=datetime.time(17)
+        )
+        self.off = testing.provider(working_days=[])
+        testing.booking(provider=self.provider, scheduled_date=self.day, scheduled_time=datetime.time(10),
+                        estimated_duration_minutes=90)
+        testing.booking(provider=self.provider, scheduled_date=self.day, scheduled_time=datetime.time(14),
+                        status='cancelled')
+        ProviderAvailability.objects.create(
+            provider=self.provider, date=self.day, start_time=datetime.time(18), end_time=datetime.time(19)
+        )
+        ProviderAvailability.objects.create(
+            provider=self.provider, date=self.day, start_time=datetime.time(16), end_time=datetime.time(18, 30),
+            is_available=False,
+        )
+        self.client = APIClient()
+    
+    def test_free_intervals(self):
+        with self.assertNumQueries(3):
+            days = free_intervals([self.provider.pk, self.off.pk], self.day, self.day + datetime.timedelta(days=1))
+        # Hours, less the booking and the blocked time, plus the extra evening hour
+        self.assertEqual(list(days[self.provider.pk][self.day]), [(540, 600), (690, 960), (1110, 1140)])
+        self.assertFalse(days[self.off.pk][self.day])
+        slots = free_slots([self.provider.pk], self.day, self.day, duration=60, step=30)
+        self.assertEqual(slots[self.provider.pk][self.day][0], {'start': '09:00', 'end': '10:00'})
+    
+    def test_slot_views(self):
+        response = self.client.get(f'/api/providers/providers/{self.provider.pk}/slots/', {
+            'start_date': self.day.isoformat(), 'duration': 60,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['days'][0]['slots'][0]['start'], '09:00')
+        
+        url = '/api/providers/providers/slots/'
+        start_date = self.day.isoformat()
+        response = self.client.get(url, {'start_date': start_date, 'providers': f'{self.provider.pk},{self.off.pk}'})
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertEqual(self.client.get(url, {'start_date': start_date, 'providers': 'junk'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start_date': start_date}).status_code, 400)
+        end_date = (self.day + datetime.timedelta(days=40)).isoformat()
+        response = self.client.get(url, {'start_date': start_date, 'end_date': end_date, 'providers': self.provider.pk})
+        self.assertEqual(response.status_code, 400)
+
+
+class BitmapTests(TestCase):
+    
+    def setUp(self):
+        self.day = datetime.date.today() + datetime.timedelta(days=2)
+        self.provider = testing.provider(
+            working_days=ALL_DAYS, available_from=datetime.time(9), available_to=datetime.time(17)
+        )
+    
+    def test_available_providers(self):
+        late = testing.provider(
+            working_days=ALL_DAYS, available_from=datetime.time(12), available_to=datetime.time(17)
+        )
+        off = testing.provider(working_days=[])
+        ids = [self.provider.pk, late.pk, off.pk]
+        self.assertEqual(bitmaps.available_providers(ids, self.day, datetime.time(10), 120), [self.provider.pk])
+        self.assertEqual(ProviderDayBitmap.objects.count(), 3)
+        with self.assertNumQueries(1):
+            available = bitmaps.available_providers(ids, self.day, datetime.time(13), 60)
+        self.assertEqual(set(available), {self.provider.pk, late.pk})
+    
+    def test_bookings_and_availabilities_refresh_bitmaps(self):
+        ids = [self.provider.pk]
+        self.assertEqual(bitmaps.available_providers(ids, self.day, datetime.time(10), 120), ids)
+        testing.booking(provider=self.provider, scheduled_date=self.day, scheduled_time=datetime.time(11))
+        self.assertEqual(bitmaps.available_providers(ids, self.day, datetime.time(10), 120), [])
+        self.assertEqual(bitmaps.available_providers(ids, self.day, datetime.time(12), 120), ids)
+        
+        ProviderAvailability.objects.create(
+            provider=self.provider, date=self.day, start_time=datetime.time(17), end_time=datetime.time(20)
+        )
+        self.assertEqual(bitmaps.available_providers(ids, self.day, datetime.time(17), 120), ids)
+    
+    def test_refresh_is_an_upsert(self):
+        # Two requests that both found the day missing write it twice
+        first = bitmaps.refresh([self.provider.pk], self.day)
+        testing.booking(provider=self.provider, scheduled_date=self.day, scheduled_time=datetime.time(9))
+        second = bitmaps.refresh([self.provider.pk], self.day)
+        self.assertEqual(ProviderDayBitmap.objects.filter(provider=self.provider).count(), 1)
+        self.assertNotEqual(first, second)
+        self.assertEqual(bytes(ProviderDayBitmap.objects.get(provider=self.provider).bits), second[self.provider.pk])
+    
+    def test_jobs_past_midnight_fit_nobody(self):
+        provider = testing.provider(
+            working_days=ALL_DAYS, available_from=datetime.time(0), available_to=datetime.time(23, 59)
+        )
+        self.assertEqual(bitmaps.available_providers([provider.pk], self.day, datetime.time(23), 120), [])
+    
+    def test_bookings_must_end_by_midnight(self):
+        service = testing.service(provider=self.provider)
+        customer = testing.user()
+        client = APIClient()
+        client.force_authenticate(customer)
+        data = {
+            'customer': customer.pk,
+            'provider': self.provider.pk,
+            'service': service.pk,
+            'scheduled_date': self.day,
+            'scheduled_time': '23:30',
+            'service_address': '1 Main Street',
+            'city': 'Pune',
+            'state': 'MH',
+            'postal_code': '411001',
+            'problem_description': 'Leaking tap',
+            'quoted_price': '500',
+        }
+        response = client.post('/api/bookings/bookings/', data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('scheduled_time', response.data)
+        
+        data['scheduled_time'] = '23:00'
+        self.assertEqual(client.post('/api/bookings/bookings/', data).status_code, 201)
+
+
+class RollupTests(TestCase):
+    
+    def setUp(self):
+        self.provider = testing.provider()
+        self.bookings = [testing.booking(provider=self.provider) for _ in range(4)]
+        # Created two hours ago, so each response takes 120 minutes
+        Booking.objects.update(created_at=timezone.now() - datetime.timedelta(hours=2))
+        self.bookings = list(Booking.objects.order_by('created_at', 'pk'))
+    
+    def counters(self):
+        return ServiceProvider.objects.filter(pk=self.provider.pk).values(
+            *rollups.COUNTERS, 'completion_rate', 'response_time_minutes'
+        ).get()
+    
+    def test_transitions_update_counters(self):
+        first, second, third, fourth = self.bookings
+        transitions.transition(first, 'accepted')
+        transitions.transition(first, 'completed')
+        transitions.transition(second, 'rejected')
+        transitions.bulk_transition(Booking.objects.filter(pk__in=[third.pk, fourth.pk]), 'cancelled')
+        counters = self.counters()
+        self.assertEqual(counters['total_bookings'], 4)
+        self.assertEqual(counters['active_bookings'], 0)
+        self.assertEqual(counters['closed_bookings'], 4)
+        self.assertEqual(counters['total_jobs_completed'], 1)
+        self.assertEqual(counters['completion_rate'], Decimal('25.00'))
+        self.assertEqual((counters['responded_bookings'], counters['response_time_minutes']), (2, 120))
+        
+        Booking.objects.get(pk=second.pk).delete()
+        counters = self.counters()
+        self.assertEqual((counters['total_bookings'], counters['closed_bookings']), (3, 3))
+    
+    def test_only_the_first_response_counts(self):
+        booking = self.bookings[0]
+        transitions.transition(booking, 'accepted')
+        transitions.transition(booking, 'rescheduled')
+        transitions.transition(booking, 'confirmed')
+        transitions.transition(booking, 'accepted')
+        transitions.bulk_transition(Booking.objects.filter(pk=self.bookings[1].pk), 'accepted')
+        counters = self.counters()
+        self.assertEqual(counters['responded_bookings'], 2)
+        
+        # rebuild() counts the same responses from the history
+        ServiceProvider.objects.filter(pk=self.provider.pk).update(
+            responded_bookings=0, response_minutes_total=0, total_bookings=99, completion_rate=0
+        )
+        call_command('rebuild_provider_stats', stdout=StringIO())
+        self.assertEqual(self.counters(), counters)
+
+
+class SkillIndexTests(TestCase):
+    
+    def setUp(self):
+        self.plumber = testing.provider(business_name='Sparkle', skills=['Plumbing', ' Pipe  Fitting '])
+        self.handyman = testing.provider(skills=['plumbing', 'Electrical'])
+        self.electrician = testing.provider(skills=['Electrical'])
+        self.client = APIClient()
+    
+    def names(self, **params):
+        response = self.client.get('/api/providers/providers/', params)
+        self.assertEqual(response.status_code, 200)
+        return {row['business_name'] for row in response.data['results']}
+    
+    def test_skills_are_normalized(self):
+        self.assertEqual(set(self.plumber.skill_index.values_list('name', flat=True)), {'plumbing', 'pipe fitting'})
+        self.electrician.skills = ['Painting']
+        self.electrician.save(update_fields=['skills'])
+        self.assertEqual(list(self.electrician.skill_index.values_list('name', flat=True)), ['painting'])
+    
+    def test_skill_filters(self):
+        self.assertEqual(
+            self.names(skills='plumbing,electrical'),
+            {self.plumber.business_name, self.handyman.business_name, self.electrician.business_name},
+        )
+        self.assertEqual(self.names(skills_all='Plumbing,electrical'), {self.handyman.business_name})
+        # Search terms match whole skills (or the provider's own columns)
+        self.assertEqual(self.names(search='Electrical'), {self.handyman.business_name, self.electrician.business_name})
+        self.assertEqual(self.names(search='sparkle'), {self.plumber.business_name})
+        self.assertEqual(self.names(search='electri'), set())
+        
+        category = testing.category()
+        ProviderServiceCategory.objects.create(provider=self.plumber, category=category)
+        self.assertEqual(self.names(category=category.pk), {self.plumber.business_name})
+
 
-# Create your tests here.
+class LeaderboardTests(TestCase):
+    
+    def setUp(self):
+        self.pune = testing.provider(city='Pune')
+        self.pune_too = testing.provider(city=' pune ')
+        self.mumbai = testing.provider(city='Mumbai')
+        self.category = testing.category()
+        ProviderServiceCategory.objects.create(provider=self.pune, category=self.category)
+        for provider, ratings in ((self.pune, [5, 5, 4, 5, 5]), (self.pune_too, [4, 4]), (self.mumbai, [3, 5, 5, 5, 5, 5])):
+            for rating in ratings:
+                testing.review(testing.booking(provider=provider, status='completed'), rating=rating)
+        self.client = APIClient()
+    
+    def names(self, url='/api/providers/providers/top/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['business_name'] for row in response.data]
+    
+    def test_boards(self):
+        self.assertEqual(self.names(), [p.business_name for p in (self.pune, self.mumbai, self.pune_too)])
+        self.assertEqual(self.names(city='PUNE'), [self.pune.business_name, self.pune_too.business_name])
+        self.assertEqual(self.names(category=self.category.pk), [self.pune.business_name])
+        self.assertEqual(self.client.get('/api/providers/providers/top/', {'category': 'bogus'}).status_code, 400)
+        # Top-rated needs enough reviews to be listed
+        self.assertEqual(
+            self.names('/api/reviews/providers/top-rated/'), [self.pune.business_name, self.mumbai.business_name]
+        )
+    
+    def test_boards_follow_changes(self):
+        entries = ProviderLeaderboardEntry.objects.count()
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        self.assertEqual(ProviderLeaderboardEntry.objects.count(), entries)
+        
+        self.pune.is_verified = False
+        self.pune.save(update_fields=['is_verified'])
+        self.assertEqual(self.names(), [self.mumbai.business_name, self.pune_too.business_name])
+        Booking.objects.filter(provider=self.mumbai).delete()
+        self.assertEqual(self.names(), [self.pune_too.business_name])
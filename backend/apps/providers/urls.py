@@ -4,8 +4,13 @@ from . import views
 urlpatterns = [
     # Public endpoints
     path('providers/', views.ProviderListView.as_view(), name='provider-list'),
-    path('providers/<int:pk>/', views.ProviderDetailView.as_view(), name='provider-detail'),
+    path('providers/<uuid:pk>/', views.ProviderDetailView.as_view(), name='provider-detail'),
     path('providers/top/', views.TopProvidersView.as_view(), name='top-providers'),
+    path('providers/nearby/', views.ProviderNearbyView.as_view(), name='providers-nearby'),
+    path('providers/within/', views.ProviderWithinBoxView.as_view(), name='providers-within'),
+    path('providers/available/', views.ProviderAvailableListView.as_view(), name='providers-available'),
+    path('providers/slots/', views.ProviderFreeSlotsView.as_view(), name='providers-free-slots'),
+    path('providers/<uuid:pk>/slots/', views.ProviderFreeSlotsView.as_view(), name='provider-free-slots'),
     
     # Provider registration
     path('providers/register/', views.ProviderCreateView.as_view(), name='provider-create'),
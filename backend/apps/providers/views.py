@@ -3,24 +3,32 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, Exists, OuterRef
 
-from .models import ServiceProvider, ProviderDocument, ProviderAvailability
+from .models import ServiceProvider, ProviderServiceCategory, ProviderDocument, ProviderAvailability
+from .filters import ProviderFilter, ProviderSearchFilter
+from .leaderboard import top_providers, get_size
+from .slots import free_slots
+from .bitmaps import available_providers
 from .serializers import (
     ServiceProviderSerializer, ServiceProviderCreateSerializer,
     ProviderProfileUpdateSerializer, ProviderDocumentSerializer,
-    ProviderAvailabilitySerializer
+    ProviderAvailabilitySerializer, FreeSlotQuerySerializer, AvailableProviderQuerySerializer
 )
 from apps.services.serializers import ServiceSerializer
 from apps.users.permissions import IsServiceProvider, IsOwnerOrReadOnly
+from apps.common.mixins import ConditionalGetMixin, QueryOptimizationMixin, optimize_queryset
+from apps.common.serializers import get_field_selection
+from apps.common.views import GeoSearchView
 from apps.services.models import Service
 
-class ProviderListView(generics.ListAPIView):
+class ProviderListView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = ServiceProviderSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['business_name', 'city', 'state', 'skills']
-    ordering_fields = ['average_rating', 'total_jobs_completed', 'hourly_rate']
+    filter_backends = [DjangoFilterBackend, ProviderSearchFilter, filters.OrderingFilter]
+    filterset_class = ProviderFilter
+    search_fields = ['business_name', 'city', 'state']
+    ordering_fields = ['average_rating', 'rating_score', 'total_jobs_completed', 'hourly_rate']
     
     def get_queryset(self):
         queryset = ServiceProvider.objects.filter(is_verified=True, is_available=True)
@@ -33,7 +41,9 @@ class ProviderListView(generics.ListAPIView):
         # Filter by service category
         category_id = self.request.query_params.get('category')
         if category_id:
-            queryset = queryset.filter(service_categories__id=category_id)
+            queryset = queryset.filter(Exists(ProviderServiceCategory.objects.filter(
+                provider=OuterRef('pk'), category_id=category_id
+            )))
         
         # Filter by rating
         min_rating = self.request.query_params.get('min_rating')
@@ -45,12 +55,42 @@ class ProviderListView(generics.ListAPIView):
         if emergency and emergency.lower() == 'true':
             queryset = queryset.filter(emergency_service=True)
         
-        return queryset.distinct()
+        return queryset
 
-class ProviderDetailView(generics.RetrieveAPIView):
+class ProviderAvailableListView(ProviderListView):
+    """
+    Providers matching the list filters that are free on ?date= from
+    ?start_time= for ?duration= minutes, checked against the day bitmaps.
+    """
+    
+    def filter_queryset(self, queryset):
+        query = AvailableProviderQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        queryset = super().filter_queryset(queryset)
+        provider_ids = available_providers(
+            queryset.values_list('pk', flat=True),
+            query.validated_data['date'],
+            query.validated_data['start_time'],
+            query.validated_data['duration'],
+        )
+        return queryset.filter(pk__in=provider_ids)
+
+class ProviderDetailView(ConditionalGetMixin, QueryOptimizationMixin, generics.RetrieveAPIView):
     queryset = ServiceProvider.objects.filter(is_verified=True)
     serializer_class = ServiceProviderSerializer
     permission_classes = [permissions.AllowAny]
+    conditional_related = ['user', 'service_categories', 'documents', 'availabilities', 'services']
+
+class ProviderNearbyView(GeoSearchView):
+    """Verified providers within radius_km of a point, nearest first."""
+    serializer_class = ServiceProviderSerializer
+    
+    def get_queryset(self):
+        return ServiceProvider.objects.filter(is_verified=True, is_available=True)
+
+class ProviderWithinBoxView(ProviderNearbyView):
+    """Verified providers inside a bounding box."""
+    mode = 'box'
 
 class ProviderCreateView(generics.CreateAPIView):
     serializer_class = ServiceProviderCreateSerializer
@@ -75,14 +115,14 @@ class ProviderProfileUpdateView(generics.UpdateAPIView):
     def get_object(self):
         return self.request.user.provider_profile
 
-class ProviderServicesView(generics.ListAPIView):
+class ProviderServicesView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = ServiceSerializer
     permission_classes = [permissions.IsAuthenticated, IsServiceProvider]
     
     def get_queryset(self):
         return Service.objects.filter(provider=self.request.user.provider_profile)
 
-class ProviderDocumentsView(generics.ListCreateAPIView):
+class ProviderDocumentsView(QueryOptimizationMixin, generics.ListCreateAPIView):
     serializer_class = ProviderDocumentSerializer
     permission_classes = [permissions.IsAuthenticated, IsServiceProvider]
     
@@ -92,7 +132,7 @@ class ProviderDocumentsView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(provider=self.request.user.provider_profile)
 
-class ProviderAvailabilityView(generics.ListCreateAPIView):
+class ProviderAvailabilityView(QueryOptimizationMixin, generics.ListCreateAPIView):
     serializer_class = ProviderAvailabilitySerializer
     permission_classes = [permissions.IsAuthenticated, IsServiceProvider]
     
@@ -103,30 +143,69 @@ class ProviderAvailabilityView(generics.ListCreateAPIView):
         serializer.save(provider=self.request.user.provider_profile)
 
 class TopProvidersView(APIView):
+    """Best rated providers, read from the leaderboard (optionally ?city= and ?category=)."""
     permission_classes = [permissions.AllowAny]
     
     def get(self, request):
-        providers = ServiceProvider.objects.filter(
-            is_verified=True,
-            average_rating__gte=4.0
-        ).order_by('-average_rating', '-total_jobs_completed')[:10]
+        providers = top_providers(
+            city=request.query_params.get('city'),
+            category=request.query_params.get('category'),
+            order='jobs',
+        )
+        selection = get_field_selection(request, many=True)
+        providers = optimize_queryset(providers, ServiceProviderSerializer, selection=selection)[:get_size()]
         
-        serializer = ServiceProviderSerializer(providers, many=True)
+        serializer = ServiceProviderSerializer(providers, many=True, context={'request': request})
         return Response(serializer.data)
 
 class ProviderStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsServiceProvider]
     
     def get(self, request):
+        # Counters are maintained by apps.providers.rollups
         provider = request.user.provider_profile
         stats = {
-            'total_services': provider.services.count(),
-            'total_bookings': provider.bookings.count(),
-            'active_bookings': provider.bookings.filter(status__in=['pending', 'confirmed', 'accepted', 'in_progress']).count(),
-            'completed_bookings': provider.bookings.filter(status='completed').count(),
+            'total_services': provider.total_services,
+            'total_bookings': provider.total_bookings,
+            'active_bookings': provider.active_bookings,
+            'completed_bookings': provider.total_jobs_completed,
             'average_rating': provider.average_rating,
+            'rating_score': provider.rating_score,
+            'detailed_ratings': provider.detailed_ratings,
             'total_reviews': provider.total_reviews,
             'completion_rate': provider.completion_rate,
             'response_time_minutes': provider.response_time_minutes,
         }
-        return Response(stats)
\ No newline at end of file
+        return Response(stats)
+
+class ProviderFreeSlotsView(APIView):
+    """
+    Free time of one provider (pk in the URL) or a batch (?providers=a,b)
+    from ?start_date= to ?end_date=. With ?duration= (minutes) the start
+    times of slots that fit such a job are returned, every ?step= minutes.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, pk=None):
+        serializer = FreeSlotQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        provider_ids = [pk] if pk else query.get('providers')
+        if not provider_ids:
+            return Response({"providers": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        slots = free_slots(
+            provider_ids,
+            query['start_date'],
+            query['end_date'],
+            duration=query.get('duration'),
+            step=query['step'],
+        )
+        results = [
+            {
+                'provider': provider_id,
+                'days': [{'date': date, 'slots': day_slots} for date, day_slots in days.items()],
+            }
+            for provider_id, days in slots.items()
+        ]
+        return Response({'results': results})
@@ -78,13 +78,25 @@ class ReviewAdmin(admin.ModelAdmin):
     
     actions = ['approve_reviews', 'unapprove_reviews', 'feature_reviews', 'unfeature_reviews']
     
+    def _moderate(self, queryset, approved):
+        """Bulk (un)approval that keeps the rating aggregates in sync."""
+        from django.db import transaction
+        from apps.providers import leaderboard
+        from .ratings import apply_moderation
+        
+        with transaction.atomic():
+            changed = apply_moderation(queryset.select_for_update(), approved)
+            updated = queryset.update(is_approved=approved)
+        leaderboard.refresh_providers(changed)
+        return updated
+    
     def approve_reviews(self, request, queryset):
-        updated = queryset.update(is_approved=True)
+        updated = self._moderate(queryset, True)
         self.message_user(request, f'{updated} reviews approved.')
     approve_reviews.short_description = "Approve selected reviews"
     
     def unapprove_reviews(self, request, queryset):
-        updated = queryset.update(is_approved=False)
+        updated = self._moderate(queryset, False)
         self.message_user(request, f'{updated} reviews unapproved.')
     unapprove_reviews.short_description = "Unapprove selected reviews"
     
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.providers import leaderboard
+from apps.reviews import ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute provider and service rating sums, averages and ranking scores'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        ratings.rebuild(chunk_size=options['chunk_size'])
+        leaderboard.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS('Rating aggregates rebuilt.'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['provider', 'created_at'], name='reviews_rev_provide_7fea6b_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_review_reviews_rev_provide_7fea6b_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='WebP variants of the image, see apps.common.images'),
+        ),
+    ]
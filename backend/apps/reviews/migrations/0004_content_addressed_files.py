@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 21:54
+
+import apps.common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reviewimage',
+            name='image',
+            field=models.ImageField(storage=apps.common.storage.get_blob_storage, upload_to='review_images/'),
+        ),
+    ]
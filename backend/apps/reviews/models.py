@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from apps.common.models import BaseModel
+from apps.common.storage import get_blob_storage
 from apps.users.models import User
 # Use string references to avoid circular imports
 # REMOVE: from apps.providers.models import ServiceProvider
@@ -86,12 +87,35 @@ class Review(BaseModel):
             models.Index(fields=['customer']),
             models.Index(fields=['is_approved']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['provider', 'created_at']),
         ]
         ordering = ['-created_at']
     
+    # Rating and moderation values as last loaded or saved, used to keep
+    # the running rating aggregates in sync (see ratings.py)
+    loaded_values = None
+    
     def __str__(self):
         return f"Review #{self.id}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from .ratings import TRACKED_FIELDS
+        
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in TRACKED_FIELDS):
+            instance.loaded_values = {field: loaded[field] for field in TRACKED_FIELDS}
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from .ratings import TRACKED_FIELDS, tracked_values
+        
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(TRACKED_FIELDS) & set(update_fields):
+            self.loaded_values = tracked_values(self)
+    
     @property
     def average_detailed_rating(self):
         ratings = [
@@ -113,7 +137,13 @@ class ReviewImage(BaseModel):
         on_delete=models.CASCADE,
         related_name='images'
     )
-    image = models.ImageField(upload_to='review_images/')
+    image = models.ImageField(upload_to='review_images/', storage=get_blob_storage)
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="WebP variants of the image, see apps.common.images"
+    )
     caption = models.CharField(max_length=200, blank=True)
     display_order = models.PositiveIntegerField(default=0)
     
@@ -0,0 +1,199 @@
+"""
+Running rating aggregates.
+
+Providers keep the sum and count of their approved reviews' ratings, for
+the overall rating and each detailed dimension; services keep the overall
+sum and count of the reviews of their bookings. Creating, editing,
+moderating or deleting a review adds or removes that review's contribution
+with one UPDATE of F() expressions per row, which also re-derives
+average_rating and the Bayesian rating_score:
+
+    rating_score = (prior_weight * prior_mean + rating_sum) / (prior_weight + count)
+
+so a handful of five star reviews does not outrank a long record of good
+ones. rebuild() recomputes everything from the reviews table.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, NullIf, Round
+from django.utils import timezone
+
+DIMENSIONS = ('punctuality', 'professionalism', 'quality', 'communication')
+RATING_FIELDS = ('rating',) + tuple(f'{dimension}_rating' for dimension in DIMENSIONS)
+# Review columns whose changes move the aggregates
+TRACKED_FIELDS = ('is_approved', 'provider_id') + RATING_FIELDS
+AVERAGE_PLACES = Decimal('0.01')
+SCORE_PLACES = Decimal('0.001')
+
+
+def get_prior():
+    """(mean, weight) of the prior the rating scores are smoothed towards."""
+    return (
+        Decimal(str(getattr(settings, 'RATING_PRIOR_MEAN', 3.5))),
+        Decimal(str(getattr(settings, 'RATING_PRIOR_WEIGHT', 5))),
+    )
+
+
+def rating_score(rating_sum, count):
+    if not count:
+        return Decimal('0')
+    mean, weight = get_prior()
+    return ((weight * mean + rating_sum) / (weight + count)).quantize(SCORE_PLACES, rounding=ROUND_HALF_UP)
+
+
+def average(rating_sum, count):
+    if not count:
+        return Decimal('0')
+    return (Decimal(rating_sum) / count).quantize(AVERAGE_PLACES, rounding=ROUND_HALF_UP)
+
+
+def tracked_values(review):
+    return {field: getattr(review, field) for field in TRACKED_FIELDS}
+
+
+def contribution(values, service_id):
+    """What a review adds: (provider_id, service_id, ratings), or None when unapproved."""
+    if not values['is_approved']:
+        return None
+    return values['provider_id'], service_id, tuple(values[field] for field in RATING_FIELDS)
+
+
+def provider_deltas(ratings, sign):
+    deltas = Counter(rating_sum=sign * ratings[0], total_reviews=sign)
+    for dimension, value in zip(DIMENSIONS, ratings[1:]):
+        if value is not None:
+            deltas[f'{dimension}_rating_sum'] += sign * value
+            deltas[f'{dimension}_rating_count'] += sign
+    return deltas
+
+
+def service_deltas(ratings, sign):
+    return Counter(rating_sum=sign * ratings[0], review_count=sign)
+
+
+def _apply(model, pk, deltas, count_field):
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    mean, weight = get_prior()
+
+    def counter(name):
+        # Clamped so drift cannot push a counter below zero
+        return Greatest(F(name) + deltas.get(name, 0), 0)
+
+    values = {name: counter(name) for name in deltas}
+    if deltas.keys() & {'rating_sum', count_field}:
+        count = NullIf(counter(count_field), 0)
+        values['average_rating'] = Coalesce(
+            Round(counter('rating_sum') * Value(1.0) / count, 2),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        )
+        values['rating_score'] = Coalesce(
+            Round((Value(float(weight * mean)) + counter('rating_sum')) / (Value(float(weight)) + count), 3),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=4, decimal_places=3),
+        )
+    # updated_at too, it versions the provider's and service's ETags
+    model.objects.filter(pk=pk).update(updated_at=timezone.now(), **values)
+
+
+def apply_change(old, new):
+    """Replace one review's contribution (see contribution()) with another."""
+    ServiceProvider = django_apps.get_model('providers', 'ServiceProvider')
+    Service = django_apps.get_model('services', 'Service')
+    providers = defaultdict(Counter)
+    services = defaultdict(Counter)
+    for part, sign in ((old, -1), (new, 1)):
+        if part is None:
+            continue
+        provider_id, service_id, ratings = part
+        providers[provider_id].update(provider_deltas(ratings, sign))
+        if service_id is not None:
+            services[service_id].update(service_deltas(ratings, sign))
+    with transaction.atomic():
+        for provider_id, deltas in providers.items():
+            _apply(ServiceProvider, provider_id, deltas, 'total_reviews')
+        for service_id, deltas in services.items():
+            _apply(Service, service_id, deltas, 'review_count')
+    return set(providers)
+
+
+def apply_moderation(queryset, approved):
+    """
+    Add (approved=True) or remove the contributions of reviews whose
+    is_approved is about to change through queryset.update().
+    """
+    rows = queryset.filter(is_approved=not approved).values_list(
+        'provider_id', 'booking__service_id', *RATING_FIELDS
+    )
+    ServiceProvider = django_apps.get_model('providers', 'ServiceProvider')
+    Service = django_apps.get_model('services', 'Service')
+    sign = 1 if approved else -1
+    providers = defaultdict(Counter)
+    services = defaultdict(Counter)
+    for provider_id, service_id, *ratings in rows:
+        providers[provider_id].update(provider_deltas(ratings, sign))
+        services[service_id].update(service_deltas(ratings, sign))
+    for provider_id, deltas in providers.items():
+        _apply(ServiceProvider, provider_id, deltas, 'total_reviews')
+    for service_id, deltas in services.items():
+        _apply(Service, service_id, deltas, 'review_count')
+    return set(providers)
+
+
+def _provider_aggregates(Review):
+    annotations = {'rating_sum': Sum('rating'), 'total_reviews': Count('id')}
+    for dimension in DIMENSIONS:
+        field = f'{dimension}_rating'
+        annotations[f'{field}_sum'] = Sum(field)
+        annotations[f'{field}_count'] = Count(field)
+    rows = Review.objects.filter(is_approved=True).values('provider').annotate(**annotations)
+    return {row.pop('provider'): row for row in rows}
+
+
+def _service_aggregates(Review):
+    rows = Review.objects.filter(is_approved=True).values('booking__service').annotate(
+        rating_sum=Sum('rating'), review_count=Count('id')
+    )
+    return {row.pop('booking__service'): row for row in rows}
+
+
+def _rebuild_model(model, aggregates, counters, count_field, chunk_size):
+    fields = counters + ['average_rating', 'rating_score']
+    batch = []
+    for obj in model.objects.only('id').iterator(chunk_size=chunk_size):
+        values = dict.fromkeys(counters, 0)
+        values.update({name: value or 0 for name, value in aggregates.get(obj.pk, {}).items()})
+        values['average_rating'] = average(values['rating_sum'], values[count_field])
+        values['rating_score'] = rating_score(values['rating_sum'], values[count_field])
+        for name, value in values.items():
+            setattr(obj, name, value)
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            model.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, fields)
+
+
+def rebuild(registry=django_apps, chunk_size=500):
+    """Recompute every provider's and service's rating aggregates from the reviews."""
+    Review = registry.get_model('reviews', 'Review')
+    provider_counters = ['rating_sum', 'total_reviews'] + [
+        f'{dimension}_rating_{suffix}' for dimension in DIMENSIONS for suffix in ('sum', 'count')
+    ]
+    with transaction.atomic():
+        _rebuild_model(
+            registry.get_model('providers', 'ServiceProvider'),
+            _provider_aggregates(Review), provider_counters, 'total_reviews', chunk_size,
+        )
+        _rebuild_model(
+            registry.get_model('services', 'Service'),
+            _service_aggregates(Review), ['rating_sum', 'review_count'], 'review_count', chunk_size,
+        )
@@ -1,13 +1,16 @@
 from rest_framework import serializers
+from apps.common.serializers import DynamicFieldsModelSerializer, ImageVariantsField
 from .models import Review, ReviewImage, ReviewHelpful, ProviderReport
 from apps.bookings.serializers import BookingSerializer
 from apps.providers.serializers import ServiceProviderSerializer
 from apps.users.serializers import UserSerializer
 
 class ReviewImageSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+    
     class Meta:
         model = ReviewImage
-        fields = ['id', 'image', 'caption', 'display_order']
+        fields = ['id', 'image', 'image_variants', 'caption', 'display_order']
         read_only_fields = ['id']
 
 class ReviewHelpfulSerializer(serializers.ModelSerializer):
@@ -18,7 +21,7 @@ class ReviewHelpfulSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_name', 'is_helpful', 'created_at']
         read_only_fields = ['id', 'created_at']
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsModelSerializer):
     customer_details = UserSerializer(source='customer', read_only=True)
     provider_details = ServiceProviderSerializer(source='provider', read_only=True)
     booking_details = BookingSerializer(source='booking', read_only=True)
@@ -39,6 +42,8 @@ class ReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_verified', 'is_featured', 'helpful_count',
                            'is_approved', 'moderated_by', 'moderated_at',
                            'moderation_notes', 'created_at']
+        expandable_fields = ['customer_details', 'provider_details',
+                            'booking_details', 'helpful_votes']
 
 class ReviewCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -69,7 +74,7 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
         
         return attrs
 
-class ProviderReportSerializer(serializers.ModelSerializer):
+class ProviderReportSerializer(DynamicFieldsModelSerializer):
     reporter_details = UserSerializer(source='reporter', read_only=True)
     provider_details = ServiceProviderSerializer(source='provider', read_only=True)
     booking_details = BookingSerializer(source='booking', read_only=True)
@@ -83,4 +88,5 @@ class ProviderReportSerializer(serializers.ModelSerializer):
                  'description', 'evidence', 'status', 'status_display',
                  'resolved_by', 'resolution', 'resolved_at', 'created_at']
         read_only_fields = ['id', 'status', 'resolved_by', 'resolution',
-                           'resolved_at', 'created_at']
\ No newline at end of file
+                           'resolved_at', 'created_at']
+        expandable_fields = ['reporter_details', 'provider_details', 'booking_details']
\ No newline at end of file
@@ -0,0 +1,36 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.providers import leaderboard
+from .models import Review
+from . import ratings
+
+
+def _service_id(review):
+    try:
+        return review.booking.service_id
+    except ObjectDoesNotExist:
+        return None
+
+
+@receiver(post_save, sender=Review)
+def update_rating_aggregates(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not set(ratings.TRACKED_FIELDS) & set(update_fields):
+        return
+    if not created and instance.loaded_values is None:
+        # Loaded with deferred rating columns; the aggregates cannot tell what changed
+        return
+    service_id = _service_id(instance)
+    old = None if created else ratings.contribution(instance.loaded_values, service_id)
+    new = ratings.contribution(ratings.tracked_values(instance), service_id)
+    if old != new:
+        leaderboard.refresh_providers(ratings.apply_change(old, new))
+
+
+@receiver(post_delete, sender=Review)
+def remove_rating_aggregates(sender, instance, **kwargs):
+    values = instance.loaded_values or ratings.tracked_values(instance)
+    old = ratings.contribution(values, _service_id(instance))
+    if old is not None:
+        leaderboard.refresh_providers(ratings.apply_change(old, None))
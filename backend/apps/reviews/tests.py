@@ -1,3 +1,72 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from apps.common import testing
+from apps.providers.models import ServiceProvider
+from apps.reviews import ratings
+from apps.reviews.models import Review
+from apps.services.models import Service
+
+PROVIDER_FIELDS = [
+    'rating_sum', 'total_reviews', 'average_rating', 'rating_score',
+    'punctuality_rating_sum', 'punctuality_rating_count',
+]
+SERVICE_FIELDS = ['rating_sum', 'review_count', 'average_rating', 'rating_score']
+
+
+class RatingTests(TestCase):
+    
+    def setUp(self):
+        self.service = testing.service()
+        self.provider = self.service.provider
+        self.first = testing.review(testing.booking(service=self.service), rating=5, punctuality_rating=4)
+        self.second = testing.review(testing.booking(service=self.service), rating=3)
+    
+    def provider_ratings(self):
+        return ServiceProvider.objects.filter(pk=self.provider.pk).values(*PROVIDER_FIELDS).get()
+    
+    def service_ratings(self):
+        return Service.objects.filter(pk=self.service.pk).values(*SERVICE_FIELDS).get()
+    
+    def test_reviews_update_the_aggregates(self):
+        provider = self.provider_ratings()
+        self.assertEqual((provider['rating_sum'], provider['total_reviews']), (8, 2))
+        self.assertEqual(provider['average_rating'], Decimal('4.00'))
+        # (5 * 3.5 + 8) / (5 + 2), pulled towards the prior mean
+        self.assertEqual(provider['rating_score'], Decimal('3.643'))
+        self.assertEqual((provider['punctuality_rating_sum'], provider['punctuality_rating_count']), (4, 1))
+        service = self.service_ratings()
+        self.assertEqual((service['review_count'], service['average_rating']), (2, Decimal('4.00')))
+        
+        self.second.rating = 4
+        self.second.save()
+        self.assertEqual(self.provider_ratings()['average_rating'], Decimal('4.50'))
+        self.first.delete()
+        provider = self.provider_ratings()
+        self.assertEqual((provider['rating_sum'], provider['total_reviews'], provider['punctuality_rating_count']),
+                         (4, 1, 0))
+    
+    def moderate(self, queryset, approved):
+        # As the admin actions do
+        ratings.apply_moderation(queryset, approved)
+        queryset.update(is_approved=approved)
+    
+    def test_moderation(self):
+        self.moderate(Review.objects.filter(pk=self.first.pk), False)
+        provider = self.provider_ratings()
+        self.assertEqual((provider['rating_sum'], provider['total_reviews']), (3, 1))
+        # Approving everything only adds back the unapproved review
+        self.moderate(Review.objects.all(), True)
+        provider = self.provider_ratings()
+        self.assertEqual((provider['rating_sum'], provider['total_reviews']), (8, 2))
+    
+    def test_rebuild(self):
+        provider, service = self.provider_ratings(), self.service_ratings()
+        ServiceProvider.objects.filter(pk=self.provider.pk).update(rating_sum=77, total_reviews=0)
+        Service.objects.filter(pk=self.service.pk).update(review_count=9)
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.assertEqual(self.provider_ratings(), provider)
+        self.assertEqual(self.service_ratings(), service)
@@ -3,7 +3,6 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, Count
 
 from .models import Review, ReviewImage, ReviewHelpful, ProviderReport
 from .serializers import (
@@ -12,13 +11,23 @@ from .serializers import (
     ProviderReportSerializer
 )
 from apps.users.permissions import IsCustomer, IsServiceProvider, IsAdmin
+from apps.common.mixins import QueryOptimizationMixin, optimize_queryset
+from apps.common.serializers import get_field_selection
+from apps.common.pagination import KeysetPagination
 
-class ReviewListView(generics.ListAPIView):
+class ReviewListView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = ReviewSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['provider', 'rating', 'is_verified', 'is_featured']
     ordering_fields = ['rating', 'helpful_count', 'created_at']
+    pagination_class = KeysetPagination
+    keyset_orderings = {
+        'created_at': ('created_at',),
+        'rating': ('rating',),
+        'helpful_count': ('helpful_count',),
+    }
+    keyset_default_ordering = '-created_at'
     
     def get_queryset(self):
         queryset = Review.objects.filter(is_approved=True)
@@ -37,7 +46,7 @@ class ReviewCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         serializer.save(customer=self.request.user)
 
-class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ReviewDetailView(QueryOptimizationMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -47,7 +56,7 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [permissions.IsAuthenticated(), IsCustomer()]
         return [permissions.IsAuthenticated()]
 
-class ReviewImagesView(generics.ListCreateAPIView):
+class ReviewImagesView(QueryOptimizationMixin, generics.ListCreateAPIView):
     serializer_class = ReviewImageSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -96,7 +105,7 @@ class ReviewHelpfulView(APIView):
         except Review.DoesNotExist:
             return Response({"error": "Review not found"}, status=status.HTTP_404_NOT_FOUND)
 
-class ProviderReviewsView(generics.ListAPIView):
+class ProviderReviewsView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = ReviewSerializer
     permission_classes = [permissions.AllowAny]
     
@@ -111,14 +120,14 @@ class ProviderReportCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         serializer.save(reporter=self.request.user)
 
-class ProviderReportListView(generics.ListAPIView):
+class ProviderReportListView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = ProviderReportSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
     
     def get_queryset(self):
         return ProviderReport.objects.all()
 
-class ProviderReportDetailView(generics.RetrieveUpdateAPIView):
+class ProviderReportDetailView(QueryOptimizationMixin, generics.RetrieveUpdateAPIView):
     queryset = ProviderReport.objects.all()
     serializer_class = ProviderReportSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
@@ -130,18 +139,21 @@ class ProviderReportDetailView(generics.RetrieveUpdateAPIView):
             serializer.save()
 
 class TopRatedProvidersView(APIView):
+    """Best rated providers with enough reviews, read from the leaderboard."""
     permission_classes = [permissions.AllowAny]
+    min_reviews = 5
     
     def get(self, request):
-        providers = ServiceProvider.objects.annotate(
-            avg_rating=Avg('reviews__rating'),
-            review_count=Count('reviews')
-        ).filter(
-            avg_rating__gte=4.0,
-            review_count__gte=5,
-            is_verified=True
-        ).order_by('-avg_rating', '-review_count')[:10]
-        
+        from apps.providers.leaderboard import top_providers, get_size
         from apps.providers.serializers import ServiceProviderSerializer
-        serializer = ServiceProviderSerializer(providers, many=True)
+        
+        providers = top_providers(
+            city=request.query_params.get('city'),
+            category=request.query_params.get('category'),
+            order='reviews',
+            min_reviews=self.min_reviews,
+        )
+        selection = get_field_selection(request, many=True)
+        providers = optimize_queryset(providers, ServiceProviderSerializer, selection=selection)[:get_size()]
+        serializer = ServiceProviderSerializer(providers, many=True, context={'request': request})
         return Response(serializer.data)
\ No newline at end of file
@@ -55,9 +55,13 @@ class ServicePackageAdmin(admin.ModelAdmin):
     search_fields = ('name', 'service__title')
     readonly_fields = ('discounted_price',)
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_effective_price()
+    
     def discounted_price(self, obj):
         return obj.discounted_price
     discounted_price.short_description = 'Discounted Price'
+    discounted_price.admin_order_field = 'effective_price'
 
 @admin.register(ServiceRequest)
 class ServiceRequestAdmin(admin.ModelAdmin):
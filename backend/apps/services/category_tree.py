@@ -0,0 +1,106 @@
+"""
+Materialized ServiceCategory hierarchy.
+
+The tree is built with two queries, stored in the shared cache under a
+versioned key and memoized per process. ServiceCategory save/delete
+signals bump the version, which invalidates every copy at once.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+VERSION_KEY = 'services:category_tree:version'
+TREE_KEY = 'services:category_tree:v{version}'
+
+_local = {'version': None, 'tree': None, 'expires': 0}
+
+
+def get_cache_timeout():
+    return getattr(settings, 'CATEGORY_TREE_CACHE_TIMEOUT', 600)
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """Invalidate the cached tree in every process."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+    _local.update(version=None, tree=None, expires=0)
+
+
+def build_tree():
+    """Build the nested category list with per-node service counts."""
+    from .models import ServiceCategory, Service
+
+    service_counts = dict(
+        Service.objects.filter(is_available=True, is_active=True)
+        .values_list('category_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    nodes = {}
+    categories = ServiceCategory.objects.filter(is_active=True).only(
+        'id', 'name', 'slug', 'description', 'icon', 'image', 'parent_id', 'display_order'
+    )
+    for category in categories:
+        nodes[str(category.id)] = {
+            'id': str(category.id),
+            'name': category.name,
+            'slug': category.slug,
+            'description': category.description,
+            'icon': category.icon,
+            'image': category.image.url if category.image else None,
+            'display_order': category.display_order,
+            'parent': str(category.parent_id) if category.parent_id else None,
+            'service_count': service_counts.get(category.id, 0),
+            'total_service_count': 0,
+            'children': [],
+        }
+
+    roots = []
+    # Categories come back in Meta.ordering, so children stay ordered too
+    for node in nodes.values():
+        parent = nodes.get(node['parent']) if node['parent'] else None
+        if parent is not None:
+            parent['children'].append(node)
+        else:
+            # Orphans of an inactive parent are promoted to roots
+            roots.append(node)
+
+    def total(node):
+        node['total_service_count'] = node['service_count'] + sum(
+            total(child) for child in node['children']
+        )
+        return node['total_service_count']
+
+    for root in roots:
+        total(root)
+    return roots
+
+
+def get_tree():
+    """Return the category tree, building it at most once per version."""
+    version = get_version()
+    now = time.monotonic()
+    if _local['version'] == version and _local['expires'] > now:
+        return _local['tree']
+
+    key = TREE_KEY.format(version=version)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_tree()
+        cache.set(key, tree, timeout=get_cache_timeout())
+
+    _local.update(version=version, tree=tree, expires=now + get_cache_timeout())
+    return tree
@@ -0,0 +1,169 @@
+"""
+Facet counts for the services catalog.
+
+Each dimension is counted with one grouped query over the services that
+match every *other* active filter, so selecting a category still shows the
+counts of the sibling categories. Results are cached for a short time under
+a key derived from the normalized filter set.
+"""
+import hashlib
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Value, When
+
+from .filters import ServiceFilter
+from .models import Service
+
+CACHE_KEY = 'services:facets:{digest}'
+
+# (key, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = [
+    ('0-500', None, 500),
+    ('500-1000', 500, 1000),
+    ('1000-2500', 1000, 2500),
+    ('2500-5000', 2500, 5000),
+    ('5000+', 5000, None),
+]
+RATING_BUCKETS = [
+    ('4-5', 4, None),
+    ('3-4', 3, 4),
+    ('2-3', 2, 3),
+    ('1-2', 1, 2),
+    ('0-1', None, 1),
+]
+
+# Query parameters each facet ignores when counting its own values
+FACET_PARAMS = {
+    'category': ('category',),
+    'price_unit': ('price_unit',),
+    'price': ('min_price', 'max_price'),
+    'rating': ('min_rating',),
+}
+DECIMAL_PARAMS = ('min_price', 'max_price', 'min_rating')
+UUID_PARAMS = ('category', 'provider')
+
+
+def get_cache_timeout():
+    return getattr(settings, 'SERVICE_FACETS_CACHE_TIMEOUT', 60)
+
+
+def normalize_params(query_params):
+    """Keep the supported filters, with equivalent values spelled the same way."""
+    params = {}
+    for name in list(ServiceFilter.base_filters) + ['city', 'search']:
+        value = (query_params.get(name) or '').strip()
+        if not value:
+            continue
+        if name in DECIMAL_PARAMS:
+            try:
+                value = str(Decimal(value).normalize())
+            except InvalidOperation:
+                pass
+        elif name in UUID_PARAMS:
+            try:
+                value = str(uuid.UUID(value))
+            except ValueError:
+                pass
+        elif name in ('city', 'search', 'is_available'):
+            value = ' '.join(value.lower().split())
+        params[name] = value
+    return params
+
+
+def get_cache_key(params):
+    digest = hashlib.md5(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    return CACHE_KEY.format(digest=digest)
+
+
+def _bucket_expression(field, buckets):
+    whens = []
+    for key, lower, upper in buckets:
+        bounds = {}
+        if lower is not None:
+            bounds[f'{field}__gte'] = lower
+        if upper is not None:
+            bounds[f'{field}__lt'] = upper
+        whens.append(When(then=Value(key), **bounds))
+    return Case(*whens, output_field=CharField())
+
+
+def _bucket_counts(queryset, field, buckets):
+    counts = dict(
+        queryset.annotate(bucket=_bucket_expression(field, buckets))
+        .values_list('bucket')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    return [
+        {'value': key, 'min': lower, 'max': upper, 'count': counts.get(key, 0)}
+        for key, lower, upper in buckets
+    ]
+
+
+def category_counts(queryset):
+    rows = (
+        queryset.values('category', 'category__name', 'category__slug')
+        .annotate(count=Count('pk'))
+        .order_by('-count', 'category__name')
+    )
+    return [
+        {
+            'value': str(row['category']),
+            'label': row['category__name'],
+            'slug': row['category__slug'],
+            'count': row['count'],
+        }
+        for row in rows
+    ]
+
+
+def price_unit_counts(queryset):
+    labels = dict(Service._meta.get_field('price_unit').choices)
+    counts = dict(queryset.values_list('price_unit').annotate(count=Count('pk')).order_by())
+    return [
+        {'value': value, 'label': label, 'count': counts.get(value, 0)}
+        for value, label in labels.items()
+    ]
+
+
+def price_counts(queryset):
+    return _bucket_counts(queryset, 'base_price', PRICE_BUCKETS)
+
+
+def rating_counts(queryset):
+    return _bucket_counts(queryset, 'average_rating', RATING_BUCKETS)
+
+
+FACETS = {
+    'category': category_counts,
+    'price_unit': price_unit_counts,
+    'price': price_counts,
+    'rating': rating_counts,
+}
+
+
+def build_facets(get_queryset):
+    """
+    Compute every facet.
+
+    ``get_queryset(exclude)`` returns the filtered services, ignoring the
+    query parameters named in ``exclude``.
+    """
+    data = {'count': get_queryset(()).order_by().count()}
+    for name, count in FACETS.items():
+        data[name] = count(get_queryset(FACET_PARAMS[name]))
+    return data
+
+
+def get_facets(params, get_queryset):
+    """Cached facet counts for a normalized filter set."""
+    key = get_cache_key(params)
+    data = cache.get(key)
+    if data is None:
+        data = build_facets(get_queryset)
+        cache.set(key, data, timeout=get_cache_timeout())
+    return data
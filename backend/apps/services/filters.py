@@ -1,5 +1,8 @@
 import django_filters
+from rest_framework import filters
+
 from .models import Service
+from .search import search_queryset
 
 class ServiceFilter(django_filters.FilterSet):
     min_price = django_filters.NumberFilter(field_name='base_price', lookup_expr='gte')
@@ -8,4 +11,23 @@ class ServiceFilter(django_filters.FilterSet):
     
     class Meta:
         model = Service
-        fields = ['category', 'provider', 'price_unit', 'is_available']
\ No newline at end of file
+        fields = ['category', 'provider', 'price_unit', 'is_available']
+
+class ServiceSearchFilter(filters.SearchFilter):
+    """
+    Ranked full-text search backed by the service search index.
+    
+    Falls back to the regular LIKE based SearchFilter on databases without
+    a search index backend.
+    """
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        
+        # Matched and ranked within the filtered queryset, see search.py
+        results = search_queryset(queryset, query)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        return results.order_by('search_rank', 'pk')
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from apps.services.search import get_search_backend
+
+    backend = get_search_backend(schema_editor.connection)
+    if backend is None:
+        return
+    backend.create_index()
+
+    Service = apps.get_model('services', 'Service')
+    rows = [
+        (service.pk, service.title, service.description, service.provider.business_name)
+        for service in Service.objects.select_related('provider').iterator()
+    ]
+    if rows:
+        backend.upsert(rows)
+
+
+def drop_search_index(apps, schema_editor):
+    from apps.services.search import get_search_backend
+
+    backend = get_search_backend(schema_editor.connection)
+    if backend is not None:
+        backend.drop_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0001_initial'),
+        ('providers', '0003_alter_serviceprovider_working_days'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:26
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_service_services_se_average_725c6b_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicepackage',
+            index=models.Index(models.F('service'), models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('price'), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('price'), '*', models.F('discount_percentage')), '/', models.Value(100))), output_field=models.DecimalField(decimal_places=2, max_digits=10)), name='services_package_eff_price_idx'),
+        ),
+    ]
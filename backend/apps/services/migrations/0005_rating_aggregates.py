@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_servicepackage_effective_price_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='rating_score',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Bayesian-smoothed rating used for ranking', max_digits=4),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['rating_score'], name='services_se_rating__c04a3e_idx'),
+        ),
+    ]
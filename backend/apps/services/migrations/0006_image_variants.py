@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicecategory',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='WebP variants of the image, see apps.common.images'),
+        ),
+    ]
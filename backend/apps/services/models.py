@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F
 from django.core.validators import MinValueValidator
 from apps.common.models import BaseModel
 
@@ -18,6 +19,12 @@ class ServiceCategory(BaseModel):
         blank=True,
         null=True
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="WebP variants of the image, see apps.common.images"
+    )
     parent = models.ForeignKey(
         'self',
         on_delete=models.SET_NULL,
@@ -120,6 +127,15 @@ class Service(BaseModel):
         decimal_places=2,
         default=0.00
     )
+    # Running rating aggregates, maintained by apps.reviews.ratings
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_score = models.DecimalField(
+        max_digits=4,
+        decimal_places=3,
+        default=0,
+        help_text="Bayesian-smoothed rating used for ranking"
+    )
     
     # Media
     images = models.JSONField(
@@ -136,6 +152,9 @@ class Service(BaseModel):
             models.Index(fields=['category', 'is_available']),
             models.Index(fields=['slug']),
             models.Index(fields=['base_price']),
+            models.Index(fields=['average_rating']),
+            models.Index(fields=['rating_score']),
+            models.Index(fields=['created_at']),
         ]
         ordering = ['-created_at']
     
@@ -149,6 +168,20 @@ class Service(BaseModel):
         return self.provider.business_name if self.provider_id else ""
 
 
+# SQL version of ServicePackage.discounted_price
+EFFECTIVE_PRICE = ExpressionWrapper(
+    F('price') - F('price') * F('discount_percentage') / 100,
+    output_field=DecimalField(max_digits=10, decimal_places=2)
+)
+
+
+class ServicePackageQuerySet(models.QuerySet):
+    
+    def with_effective_price(self):
+        """Annotate effective_price (price after discount) computed in the database."""
+        return self.annotate(effective_price=EFFECTIVE_PRICE)
+
+
 class ServicePackage(BaseModel):
     """Package of services offered together."""
     service = models.ForeignKey(
@@ -181,6 +214,11 @@ class ServicePackage(BaseModel):
         verbose_name = 'Service Package'
         verbose_name_plural = 'Service Packages'
         ordering = ['price']
+        indexes = [
+            models.Index(F('service'), EFFECTIVE_PRICE, name='services_package_eff_price_idx'),
+        ]
+    
+    objects = ServicePackageQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.name} - {self.service.title}"
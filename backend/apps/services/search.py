@@ -0,0 +1,372 @@
+"""
+Full-text search index for services.
+
+On SQLite the index is an FTS5 table fed from an external-content table by
+triggers; on PostgreSQL it is a weighted tsvector column behind a GIN index.
+Rows are kept in sync from Service/ServiceProvider signals (see signals.py).
+
+search_queryset() applies a search inside a Service queryset: the match is
+a subquery and the rank a correlated lookup of the row's own index entry,
+so whatever else the queryset filters on is applied by the same query and
+nothing is capped first. search_service_ids() returns the top ranked ids
+on their own, up to SERVICE_SEARCH_MAX_RESULTS.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+CONTENT_TABLE = 'services_service_search'
+FTS_TABLE = 'services_service_search_fts'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_QUERY_TERMS = 8
+
+
+def tokenize(query):
+    """Split raw user input into safe lowercase search terms."""
+    return TOKEN_RE.findall((query or '').lower())[:MAX_QUERY_TERMS]
+
+
+class BaseSearchBackend:
+    """Common interface for the vendor specific search indexes."""
+    vendor = None
+
+    def __init__(self, conn=None):
+        self.connection = conn or connection
+
+    def create_index(self):
+        raise NotImplementedError
+
+    def drop_index(self):
+        raise NotImplementedError
+
+    def upsert(self, rows):
+        raise NotImplementedError
+
+    def remove(self, service_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, limit=None):
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, query):
+        """
+        Services of the queryset matching the query, annotated with a
+        search_rank that sorts the best match first.
+        """
+        raise NotImplementedError
+
+    def _outer_pk(self, queryset):
+        quote_name = self.connection.ops.quote_name
+        return f'{quote_name(queryset.model._meta.db_table)}.{quote_name(queryset.model._meta.pk.column)}'
+
+    def _db_id(self, service_id):
+        from .models import Service
+        return Service._meta.pk.get_db_prep_value(service_id, self.connection)
+
+    def _execute_many(self, statements):
+        with self.connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 index with BM25 ranking."""
+    vendor = 'sqlite'
+
+    # Column weights for bm25(): title, description, provider name
+    WEIGHTS = (10.0, 1.0, 5.0)
+
+    def create_index(self):
+        self._execute_many([
+            f"""CREATE TABLE IF NOT EXISTS {CONTENT_TABLE} (
+                rowid INTEGER PRIMARY KEY,
+                service_id TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                provider_name TEXT NOT NULL
+            )""",
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                title, description, provider_name,
+                content='{CONTENT_TABLE}', content_rowid='rowid',
+                tokenize='porter unicode61'
+            )""",
+            f"""CREATE TRIGGER IF NOT EXISTS {CONTENT_TABLE}_ai AFTER INSERT ON {CONTENT_TABLE} BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, title, description, provider_name)
+                VALUES (new.rowid, new.title, new.description, new.provider_name);
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {CONTENT_TABLE}_ad AFTER DELETE ON {CONTENT_TABLE} BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, provider_name)
+                VALUES ('delete', old.rowid, old.title, old.description, old.provider_name);
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {CONTENT_TABLE}_au AFTER UPDATE ON {CONTENT_TABLE} BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, provider_name)
+                VALUES ('delete', old.rowid, old.title, old.description, old.provider_name);
+                INSERT INTO {FTS_TABLE}(rowid, title, description, provider_name)
+                VALUES (new.rowid, new.title, new.description, new.provider_name);
+            END""",
+        ])
+
+    def drop_index(self):
+        self._execute_many([
+            f'DROP TABLE IF EXISTS {FTS_TABLE}',
+            f'DROP TABLE IF EXISTS {CONTENT_TABLE}',
+        ])
+
+    def upsert(self, rows):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"""INSERT INTO {CONTENT_TABLE} (service_id, title, description, provider_name)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT(service_id) DO UPDATE SET
+                    title = excluded.title,
+                    description = excluded.description,
+                    provider_name = excluded.provider_name""",
+                [(self._db_id(pk), title, description, provider_name)
+                 for pk, title, description, provider_name in rows]
+            )
+
+    def remove(self, service_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {CONTENT_TABLE} WHERE service_id = %s',
+                [(self._db_id(pk),) for pk in service_ids]
+            )
+
+    def clear(self):
+        self._execute_many([f'DELETE FROM {CONTENT_TABLE}'])
+
+    def _match(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, query, limit=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = self._match(terms)
+        weights = ', '.join(str(weight) for weight in self.WEIGHTS)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT c.service_id
+                FROM {FTS_TABLE} f
+                JOIN {CONTENT_TABLE} c ON c.rowid = f.rowid
+                WHERE {FTS_TABLE} MATCH %s
+                ORDER BY bm25({FTS_TABLE}, {weights})
+                LIMIT %s""",
+                [match, limit or get_result_limit()]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter_queryset(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        match = self._match(terms)
+        weights = ', '.join(str(weight) for weight in self.WEIGHTS)
+        matches = RawSQL(
+            f"""SELECT c.service_id
+            FROM {FTS_TABLE} f
+            JOIN {CONTENT_TABLE} c ON c.rowid = f.rowid
+            WHERE {FTS_TABLE} MATCH %s""",
+            [match]
+        )
+        # bm25() is lower for better matches
+        rank = RawSQL(
+            f"""SELECT bm25({FTS_TABLE}, {weights})
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s AND rowid = (
+                SELECT rowid FROM {CONTENT_TABLE} WHERE service_id = {self._outer_pk(queryset)}
+            )""",
+            [match],
+            output_field=FloatField()
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Weighted tsvector index with ts_rank ordering."""
+    vendor = 'postgresql'
+
+    CONFIG = 'english'
+
+    def create_index(self):
+        self._execute_many([
+            f"""CREATE TABLE IF NOT EXISTS {CONTENT_TABLE} (
+                service_id uuid PRIMARY KEY
+                    REFERENCES services_service(id) ON DELETE CASCADE,
+                document tsvector NOT NULL
+            )""",
+            f'CREATE INDEX IF NOT EXISTS {CONTENT_TABLE}_document_gin '
+            f'ON {CONTENT_TABLE} USING GIN (document)',
+        ])
+
+    def drop_index(self):
+        self._execute_many([f'DROP TABLE IF EXISTS {CONTENT_TABLE}'])
+
+    def upsert(self, rows):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"""INSERT INTO {CONTENT_TABLE} (service_id, document)
+                VALUES (
+                    %s,
+                    setweight(to_tsvector('{self.CONFIG}', %s), 'A') ||
+                    setweight(to_tsvector('{self.CONFIG}', %s), 'C') ||
+                    setweight(to_tsvector('{self.CONFIG}', %s), 'B')
+                )
+                ON CONFLICT (service_id) DO UPDATE SET document = excluded.document""",
+                [(self._db_id(pk), title, description, provider_name)
+                 for pk, title, description, provider_name in rows]
+            )
+
+    def remove(self, service_ids):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {CONTENT_TABLE} WHERE service_id = ANY(%s)',
+                [[self._db_id(pk) for pk in service_ids]]
+            )
+
+    def clear(self):
+        self._execute_many([f'TRUNCATE {CONTENT_TABLE}'])
+
+    def _tsquery(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def search(self, query, limit=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        tsquery = self._tsquery(terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT service_id
+                FROM {CONTENT_TABLE}, to_tsquery('{self.CONFIG}', %s) query
+                WHERE document @@ query
+                ORDER BY ts_rank(document, query) DESC
+                LIMIT %s""",
+                [tsquery, limit or get_result_limit()]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter_queryset(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        tsquery = self._tsquery(terms)
+        matches = RawSQL(
+            f"""SELECT service_id
+            FROM {CONTENT_TABLE}
+            WHERE document @@ to_tsquery('{self.CONFIG}', %s)""",
+            [tsquery]
+        )
+        # Negated so that, as with bm25(), lower sorts first
+        rank = RawSQL(
+            f"""SELECT -ts_rank(document, to_tsquery('{self.CONFIG}', %s))
+            FROM {CONTENT_TABLE}
+            WHERE service_id = {self._outer_pk(queryset)}""",
+            [tsquery],
+            output_field=FloatField()
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+BACKENDS = {
+    backend.vendor: backend
+    for backend in (SQLiteSearchBackend, PostgresSearchBackend)
+}
+
+
+def get_search_backend(conn=None):
+    """Return the index backend for the connection, or None if unsupported."""
+    conn = conn or connection
+    backend_class = BACKENDS.get(conn.vendor)
+    return backend_class(conn) if backend_class else None
+
+
+def get_result_limit():
+    return getattr(settings, 'SERVICE_SEARCH_MAX_RESULTS', 500)
+
+
+def _index_rows(services):
+    for service in services:
+        yield (
+            service.pk,
+            service.title,
+            service.description,
+            service.provider.business_name if service.provider_id else '',
+        )
+
+
+def index_services(services):
+    """Add or refresh index rows for the given services."""
+    backend = get_search_backend()
+    if backend is not None:
+        backend.upsert(list(_index_rows(services)))
+
+
+def remove_services(service_ids):
+    """Drop index rows for deleted services."""
+    backend = get_search_backend()
+    if backend is not None and service_ids:
+        backend.remove(service_ids)
+
+
+def index_provider_services(provider):
+    """Refresh the provider name on every service of a provider."""
+    from .models import Service
+
+    services = Service.objects.filter(provider=provider).only('id', 'title', 'description', 'provider_id')
+    for service in services:
+        service.provider = provider
+    index_services(services)
+
+
+def rebuild_index(chunk_size=1000):
+    """Repopulate the whole index from the services table."""
+    from .models import Service
+
+    backend = get_search_backend()
+    if backend is None:
+        return 0
+    backend.create_index()
+    backend.clear()
+
+    count = 0
+    batch = []
+    services = Service.objects.select_related('provider').only(
+        'id', 'title', 'description', 'provider__business_name'
+    )
+    for service in services.iterator(chunk_size=chunk_size):
+        batch.append(service)
+        if len(batch) >= chunk_size:
+            backend.upsert(list(_index_rows(batch)))
+            count += len(batch)
+            batch = []
+    if batch:
+        backend.upsert(list(_index_rows(batch)))
+        count += len(batch)
+    return count
+
+
+def search_queryset(queryset, query):
+    """
+    Services of the queryset matching the query, annotated with search_rank
+    (best match lowest), or None if the database has no index backend.
+    """
+    backend = get_search_backend()
+    if backend is None:
+        return None
+    return backend.filter_queryset(queryset, query)
+
+
+def search_service_ids(query, limit=None):
+    """Ranked service ids matching the query, best match first."""
+    backend = get_search_backend()
+    if backend is None:
+        return None
+    return backend.search(query, limit)
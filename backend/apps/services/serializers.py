@@ -1,16 +1,18 @@
 from rest_framework import serializers
+from apps.common.serializers import DynamicFieldsModelSerializer, ImageVariantsField
 from .models import ServiceCategory, Service, ServicePackage, ServiceRequest
 
-class ServiceCategorySerializer(serializers.ModelSerializer):
+class ServiceCategorySerializer(DynamicFieldsModelSerializer):
     has_subcategories = serializers.BooleanField(read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = ServiceCategory
-        fields = ['id', 'name', 'slug', 'description', 'icon', 'image', 
+        fields = ['id', 'name', 'slug', 'description', 'icon', 'image', 'image_variants',
                  'parent', 'display_order', 'has_subcategories', 'is_active']
         read_only_fields = ['id', 'slug', 'has_subcategories']
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(DynamicFieldsModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     provider_name = serializers.CharField(source='provider.business_name', read_only=True)
     price_display = serializers.CharField(read_only=True)
@@ -22,10 +24,11 @@ class ServiceSerializer(serializers.ModelSerializer):
                  'price_display', 'is_price_negotiable', 'estimated_duration_minutes',
                  'warranty_months', 'requirements', 'tools_needed', 'is_available',
                  'available_from', 'available_to', 'total_bookings', 'average_rating',
-                 'images', 'created_at']
-        read_only_fields = ['id', 'slug', 'total_bookings', 'average_rating', 'created_at']
+                 'review_count', 'rating_score', 'images', 'created_at']
+        read_only_fields = ['id', 'slug', 'total_bookings', 'average_rating', 'review_count',
+                           'rating_score', 'created_at']
 
-class ServicePackageSerializer(serializers.ModelSerializer):
+class ServicePackageSerializer(DynamicFieldsModelSerializer):
     discounted_price = serializers.DecimalField(read_only=True, max_digits=10, decimal_places=2)
     service_title = serializers.CharField(source='service.title', read_only=True)
     
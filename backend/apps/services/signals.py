@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Service, ServiceCategory
+from . import category_tree, search
+
+
+@receiver(post_save, sender=Service)
+def index_service(sender, instance, **kwargs):
+    search.index_services([instance])
+
+
+@receiver(post_delete, sender=Service)
+def unindex_service(sender, instance, **kwargs):
+    search.remove_services([instance.pk])
+
+
+@receiver(post_save, sender='providers.ServiceProvider')
+def reindex_provider_services(sender, instance, created, update_fields=None, **kwargs):
+    """Provider names are part of the service index."""
+    if created:
+        return
+    if update_fields is not None and 'business_name' not in update_fields:
+        return
+    search.index_provider_services(instance)
+
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def invalidate_category_tree(sender, **kwargs):
+    category_tree.bump_version()
@@ -1,3 +1,148 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.common import testing
+from apps.services import category_tree, search
+from apps.services.models import Service
+
+
+class SearchTests(TestCase):
+    
+    def setUp(self):
+        self.client = APIClient()
+    
+    def titles(self, **params):
+        response = self.client.get('/api/services/services/', params)
+        self.assertEqual(response.status_code, 200)
+        return [service['title'] for service in response.data['results']]
+    
+    def indexed(self, query):
+        return set(Service.objects.filter(pk__in=search.search_service_ids(query)).values_list('title', flat=True))
+    
+    def test_search_matches_words_and_prefixes(self):
+        provider = testing.provider(business_name='Sparkle Plumbing')
+        testing.service(provider=provider, title='Leaky tap repair', description='Fix taps')
+        testing.service(title='Wall painting', description='Paint plumbing rooms')
+        testing.service(title='Garden', description='Lawn care')
+        # The title outranks the provider's name and the description
+        self.assertEqual(self.titles(search='plumb'), ['Leaky tap repair', 'Wall painting'])
+        self.assertEqual(self.titles(search='paint rooms'), ['Wall painting'])
+        self.assertEqual(self.titles(search='"; drop table'), [])
+        
+        # Cursor pages keep the rank order
+        response = self.client.get('/api/services/services/', {'search': 'plumb', 'cursor': '', 'page_size': 1})
+        self.assertEqual([service['title'] for service in response.data['results']], ['Leaky tap repair'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([service['title'] for service in response.data['results']], ['Wall painting'])
+        self.assertIsNone(response.data['next'])
+    
+    def test_index_follows_changes(self):
+        provider = testing.provider(business_name='Acme')
+        service = testing.service(provider=provider, title='Tap repair')
+        self.assertEqual(self.indexed('acme'), {'Tap repair'})
+        
+        provider.business_name = 'Zeta'
+        provider.save()
+        self.assertEqual(self.indexed('acme'), set())
+        self.assertEqual(self.titles(search='zeta'), ['Tap repair'])
+        
+        service.title = 'Boiler service'
+        service.save()
+        self.assertEqual(self.titles(search='boiler'), ['Boiler service'])
+        service.delete()
+        self.assertEqual(self.titles(search='boiler'), [])
+    
+    @override_settings(SERVICE_SEARCH_MAX_RESULTS=2)
+    def test_filters_apply_before_ranking(self):
+        for number in range(3):
+            testing.service(title=f'Boiler repair {number}')
+        heating = testing.category(name='Heating')
+        testing.service(category=heating, title='Radiator bleed', description='Also checks the boiler')
+        # Outranked by the other categories' titles, so not among the top ids
+        self.assertNotIn('Radiator bleed', self.indexed('boiler'))
+        self.assertEqual(self.titles(search='boiler', category=str(heating.pk)), ['Radiator bleed'])
+        self.assertEqual(len(self.titles(search='boiler')), 4)
+    
+    def test_rebuild_index(self):
+        service = testing.service(title='Tap repair')
+        search.remove_services([service.pk])
+        self.assertEqual(self.indexed('tap'), set())
+        search.rebuild_index()
+        self.assertEqual(self.indexed('tap'), {'Tap repair'})
+
+
+class CategoryTreeTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        category_tree.bump_version()
+        self.client = APIClient()
+    
+    def test_tree(self):
+        home = testing.category(name='Home', display_order=1)
+        plumbing = testing.category(name='Plumbing', parent=home)
+        testing.service(category=plumbing)
+        testing.service(category=plumbing)
+        testing.service(category=home)
+        testing.service(category=home, is_available=False)
+        
+        response = self.client.get('/api/services/categories/tree/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([node['name'] for node in response.data], ['Home'])
+        self.assertEqual((response.data[0]['service_count'], response.data[0]['total_service_count']), (1, 3))
+        self.assertEqual([node['name'] for node in response.data[0]['children']], ['Plumbing'])
+        self.assertEqual(response.data[0]['children'][0]['service_count'], 2)
+        
+        with self.assertNumQueries(0):
+            self.client.get('/api/services/categories/tree/')
+    
+    def test_category_changes_invalidate_the_tree(self):
+        home = testing.category(name='Home')
+        self.assertEqual(len(self.client.get('/api/services/categories/tree/').data), 1)
+        testing.category(name='Garden')
+        self.assertEqual(len(self.client.get('/api/services/categories/tree/').data), 2)
+        home.is_active = False
+        home.save()
+        self.assertEqual([node['name'] for node in self.client.get('/api/services/categories/tree/').data], ['Garden'])
+
+
+class FacetTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+    
+    def test_facet_counts(self):
+        pune = testing.provider(city='Pune')
+        goa = testing.provider(city='Goa')
+        plumbing = testing.category(name='Plumbing')
+        electrical = testing.category(name='Electrical')
+        testing.service(provider=pune, category=plumbing, title='Pipe fix',
+                        base_price=Decimal('200'), average_rating=Decimal('4.5'))
+        testing.service(provider=pune, category=plumbing, title='Pipe relay',
+                        base_price=Decimal('1200'), average_rating=Decimal('3.2'))
+        testing.service(provider=pune, category=electrical, title='Wiring', base_price=Decimal('700'))
+        testing.service(provider=goa, category=electrical, title='Wiring', base_price=Decimal('700'))
+        
+        params = {'city': 'pune', 'category': str(plumbing.pk)}
+        response = self.client.get('/api/services/services/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        # A facet is counted without its own filter, so other categories stay selectable
+        self.assertEqual({row['label']: row['count'] for row in response.data['category']},
+                         {'Plumbing': 2, 'Electrical': 1})
+        prices = {row['value']: row['count'] for row in response.data['price']}
+        self.assertEqual((prices['0-500'], prices['1000-2500']), (1, 1))
+        ratings = {row['value']: row['count'] for row in response.data['rating']}
+        self.assertEqual((ratings['4-5'], ratings['3-4']), (1, 1))
+        
+        # Equivalent filters share the cached counts
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/services/services/facets/', {'city': ' PUNE ', 'category': str(plumbing.pk).upper()})
+        self.assertEqual(cached.data, response.data)
+        
+        self.assertEqual(self.client.get('/api/services/services/facets/', {'search': 'pipe'}).data['count'], 2)
+        self.assertEqual(self.client.get('/api/services/services/facets/', {'min_price': 'abc'}).status_code, 400)
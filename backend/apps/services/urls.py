@@ -4,11 +4,15 @@ from . import views
 urlpatterns = [
     # Categories
     path('categories/', views.ServiceCategoryListView.as_view(), name='category-list'),
-    path('categories/<int:pk>/', views.ServiceCategoryDetailView.as_view(), name='category-detail'),
+    path('categories/tree/', views.ServiceCategoryTreeView.as_view(), name='category-tree'),
+    path('categories/<uuid:pk>/', views.ServiceCategoryDetailView.as_view(), name='category-detail'),
     
     # Services
     path('services/', views.ServiceListView.as_view(), name='service-list'),
-    path('services/<int:pk>/', views.ServiceDetailView.as_view(), name='service-detail'),
+    path('services/facets/', views.ServiceFacetsView.as_view(), name='service-facets'),
+    path('services/nearby/', views.ServiceNearbyView.as_view(), name='services-nearby'),
+    path('services/within/', views.ServiceWithinBoxView.as_view(), name='services-within'),
+    path('services/<uuid:pk>/', views.ServiceDetailView.as_view(), name='service-detail'),
     path('services/create/', views.ServiceCreateView.as_view(), name='service-create'),
     path('services/<int:pk>/update/', views.ServiceUpdateView.as_view(), name='service-update'),
     
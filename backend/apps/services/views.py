@@ -4,34 +4,56 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
+from django_filters.utils import translate_validation
 
 from .models import ServiceCategory, Service, ServicePackage, ServiceRequest
 from .serializers import (
     ServiceCategorySerializer, ServiceSerializer,
     ServicePackageSerializer, ServiceRequestSerializer
 )
-from .filters import ServiceFilter
+from .filters import ServiceFilter, ServiceSearchFilter
+from .category_tree import get_tree
+from . import facets
 from apps.users.permissions import IsCustomer, IsServiceProvider
+from apps.common.mixins import ConditionalGetMixin, QueryOptimizationMixin
+from apps.common.pagination import KeysetPagination
+from apps.common.views import GeoSearchView
 
-class ServiceCategoryListView(generics.ListAPIView):
+class ServiceCategoryListView(QueryOptimizationMixin, generics.ListAPIView):
     queryset = ServiceCategory.objects.filter(is_active=True)
     serializer_class = ServiceCategorySerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'description']
 
-class ServiceCategoryDetailView(generics.RetrieveAPIView):
+class ServiceCategoryDetailView(ConditionalGetMixin, QueryOptimizationMixin, generics.RetrieveAPIView):
     queryset = ServiceCategory.objects.filter(is_active=True)
     serializer_class = ServiceCategorySerializer
     permission_classes = [permissions.AllowAny]
+    conditional_related = ['subcategories']
 
-class ServiceListView(generics.ListAPIView):
+class ServiceCategoryTreeView(APIView):
+    """Whole category hierarchy with service counts in one response."""
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        return Response(get_tree())
+
+class ServiceListView(QueryOptimizationMixin, generics.ListAPIView):
     serializer_class = ServiceSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ServiceSearchFilter, filters.OrderingFilter]
     filterset_class = ServiceFilter
     search_fields = ['title', 'description', 'provider__business_name']
-    ordering_fields = ['base_price', 'average_rating', 'created_at']
+    ordering_fields = ['base_price', 'average_rating', 'rating_score', 'created_at']
+    pagination_class = KeysetPagination
+    keyset_orderings = {
+        'created_at': ('created_at',),
+        'base_price': ('base_price',),
+        'average_rating': ('average_rating',),
+        'rating_score': ('rating_score',),
+    }
+    keyset_default_ordering = '-created_at'
     
     def get_queryset(self):
         queryset = Service.objects.filter(is_available=True)
@@ -48,10 +70,58 @@ class ServiceListView(generics.ListAPIView):
         
         return queryset
 
-class ServiceDetailView(generics.RetrieveAPIView):
+class ServiceFacetsView(APIView):
+    """Facet counts for the services matching the ServiceListView filters."""
+    permission_classes = [permissions.AllowAny]
+    search_fields = ServiceListView.search_fields
+    
+    def get(self, request):
+        params = facets.normalize_params(request.query_params)
+        filterset = None
+        
+        def get_queryset(exclude):
+            nonlocal filterset
+            if filterset is None:
+                filterset = ServiceFilter(params, queryset=self.get_base_queryset(params), request=request)
+                if not filterset.is_valid():
+                    raise translate_validation(filterset.errors)
+            # Same as FilterSet.filter_queryset(), minus the facet's own filters
+            queryset = filterset.queryset
+            for name, value in filterset.form.cleaned_data.items():
+                if name not in exclude:
+                    queryset = filterset.filters[name].filter(queryset, value)
+            return queryset
+        
+        return Response(facets.get_facets(params, get_queryset))
+    
+    def get_base_queryset(self, params):
+        queryset = Service.objects.filter(is_available=True)
+        if params.get('city'):
+            queryset = queryset.filter(provider__city__iexact=params['city'])
+        # Search is never a facet, so the index is queried once per request
+        return ServiceSearchFilter().filter_queryset(self.request, queryset, self)
+
+class ServiceNearbyView(GeoSearchView):
+    """Available services whose provider is within radius_km of a point."""
+    serializer_class = ServiceSerializer
+    location = 'provider'
+    
+    def get_queryset(self):
+        queryset = Service.objects.filter(is_available=True, provider__is_available=True)
+        category_id = self.request.query_params.get('category')
+        if category_id:
+            queryset = queryset.filter(category_id=category_id)
+        return queryset
+
+class ServiceWithinBoxView(ServiceNearbyView):
+    """Available services whose provider is inside a bounding box."""
+    mode = 'box'
+
+class ServiceDetailView(ConditionalGetMixin, QueryOptimizationMixin, generics.RetrieveAPIView):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = [permissions.AllowAny]
+    conditional_related = ['category', 'provider']
 
 class ServiceCreateView(generics.CreateAPIView):
     serializer_class = ServiceSerializer
@@ -67,18 +137,21 @@ class ServiceUpdateView(generics.UpdateAPIView):
     def get_queryset(self):
         return Service.objects.filter(provider=self.request.user.provider_profile)
 
-class ServicePackageListView(generics.ListAPIView):
-    queryset = ServicePackage.objects.all()
+class ServicePackageListView(QueryOptimizationMixin, generics.ListAPIView):
+    queryset = ServicePackage.objects.with_effective_price()
     serializer_class = ServicePackageSerializer
     permission_classes = [permissions.AllowAny]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['price', 'effective_price', 'validity_days']
     
     def get_queryset(self):
+        queryset = super().get_queryset()
         service_id = self.request.query_params.get('service_id')
         if service_id:
-            return ServicePackage.objects.filter(service_id=service_id)
-        return super().get_queryset()
+            queryset = queryset.filter(service_id=service_id)
+        return queryset
 
-class ServiceRequestListView(generics.ListCreateAPIView):
+class ServiceRequestListView(QueryOptimizationMixin, generics.ListCreateAPIView):
     serializer_class = ServiceRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -97,7 +170,7 @@ class ServiceRequestListView(generics.ListCreateAPIView):
             raise permissions.PermissionDenied("Only customers can create service requests")
         serializer.save(customer=self.request.user)
 
-class ServiceRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ServiceRequestDetailView(QueryOptimizationMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ServiceRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
     
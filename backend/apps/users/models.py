@@ -52,6 +52,14 @@ class User(AbstractUser):
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default=CUSTOMER)
     phone = models.CharField(max_length=15, blank=True, null=True)
     profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    profile_image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="WebP variants of the profile image, see apps.common.images"
+    )
+    # Part of the ETag of the provider and booking details that embed the user
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Use email as username
     email = models.EmailField(_("email address"), unique=True)
@@ -3,13 +3,18 @@ from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.password_validation import validate_password
 
+from apps.common.serializers import ImageVariantsField
+
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_image_variants = ImageVariantsField()
+    
     class Meta:
         model = User
-        fields = ['id', 'email', 'first_name', 'last_name', 'phone', 'role', 'is_active']
-        read_only_fields = ['id', 'is_active']
+        fields = ['id', 'email', 'first_name', 'last_name', 'phone', 'role', 'is_active',
+                 'profile_image', 'profile_image_variants']
+        read_only_fields = ['id', 'is_active', 'profile_image']
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
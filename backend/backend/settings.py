@@ -263,9 +263,67 @@ LOGGING = {
     },
 }
 
+# ============== CACHE SETTINGS ==============
+# Local memory cache for development. In production point this at Redis
+# (django.core.cache.backends.redis.RedisCache) so all workers share it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'service-marketplace',
+    }
+}
+
+CATEGORY_TREE_CACHE_TIMEOUT = 600  # seconds; also bounds staleness of service counts
+SERVICE_FACETS_CACHE_TIMEOUT = 60  # seconds; facet counts are keyed on the normalized filters
+
+# ============== SEARCH SETTINGS ==============
+SERVICE_SEARCH_MAX_RESULTS = 500  # Max ranked matches taken from the full-text index
+GEO_SEARCH_MAX_RESULTS = 100  # Max results of a radius/bounding-box search
+GEO_SEARCH_MAX_BOX_DEGREES = 2  # Max latitude/longitude span of a bounding-box search
+
+# ============== BOOKING SETTINGS ==============
+BOOKING_NUMBER_BLOCK_SIZE = 1  # Booking numbers each process reserves at a time
+BOOKING_CALENDAR_PAST_DAYS = 90  # Days of past bookings kept in iCalendar feeds
+BOOKING_CALENDAR_CACHE_TIMEOUT = 86400  # seconds a rendered feed is kept without polls
+
+# ============== AVAILABILITY SETTINGS ==============
+SLOT_MAX_DAYS = 31  # Longest date range of a free-slot query
+SLOT_MAX_PROVIDERS = 50  # Providers per free-slot query
+
+# ============== LEADERBOARD SETTINGS ==============
+LEADERBOARD_SIZE = 10  # Places returned by the top provider endpoints
+LEADERBOARD_MIN_RATING = 4.0  # Average rating a provider needs to be on the leaderboards
+
+# ============== RATING SETTINGS ==============
+RATING_PRIOR_MEAN = 3.5  # Rating scores are smoothed towards this mean...
+RATING_PRIOR_WEIGHT = 5  # ...as if every provider/service had this many extra reviews at it
+
+# ============== EXPORT SETTINGS ==============
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per database round trip when exporting
+
+# ============== IMPORT SETTINGS ==============
+IMPORT_CHUNK_SIZE = 500  # CSV rows validated and written per transaction
+IMPORT_MAX_ERRORS = 1000  # Row errors kept on an import job
+IMPORT_JOB_TIMEOUT = 86400  # seconds a finished import job is kept
+IMPORT_STALE_TIMEOUT = 600  # seconds without progress before an unfinished import is marked failed
+IMPORT_UPLOAD_ROOT = BASE_DIR / 'import_uploads'  # CSV files of imports in progress
+IMPORT_RUN_IN_BACKGROUND = True
+IMPORT_WORKERS = 2
+
 # ============== FILE UPLOAD SETTINGS ==============
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
+UPLOAD_SESSION_ROOT = BASE_DIR / 'upload_sessions'  # Chunks of resumable uploads in progress
+UPLOAD_CHUNK_SIZE = 4194304  # 4MB; chunks are streamed to disk
+UPLOAD_MAX_SIZE = 524288000  # 500MB per resumable upload
+UPLOAD_SESSION_TIMEOUT = 86400  # seconds an unfinished upload can be resumed
+BLOB_GC_GRACE_SECONDS = 3600  # Unreferenced content-addressed blobs are kept this long
+
+# ============== IMAGE SETTINGS ==============
+IMAGE_VARIANTS = {'thumb': 160, 'medium': 640}  # WebP variant name -> longest side in pixels
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANTS_IN_BACKGROUND = True  # Render in a process pool after upload
+IMAGE_WORKERS = 2
 
 # ============== SECURITY SETTINGS ==============
 if not DEBUG:
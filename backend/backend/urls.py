@@ -16,6 +16,7 @@ urlpatterns = [
     path('api/reviews/', include('apps.reviews.urls')),
     path('api/payments/', include('apps.payments.urls')),
     path('api/notifications/', include('apps.notifications.urls')),
+    path('api/common/', include('apps.common.urls')),
 ]
 
 # Serve media files in development